@@ -1,16 +1,14 @@
+import time
+
+# Start of the process, before the imports, for --profile-startup
+STARTED = time.perf_counter()
+
+import argparse
 import logging
+import multiprocessing
 import sys
 from pathlib import Path
 
-import PySide6
-from PySide6.QtGui import QShortcut
-from PySide6.QtWidgets import QApplication, QMainWindow
-
-from core.show import Show
-from ui.uic.ui_mainWindow import Ui_MainWindow
-
-STYLE_SHEET_PATH = Path(__name__).parent / "styleSheet.css"
-
 # Logging
 log = logging.getLogger(__name__)
 log.root.setLevel(logging.DEBUG)
@@ -20,35 +18,165 @@ logging_formatter = logging.Formatter('%(asctime)s - %(name)s: %(levelname)s: %(
 logging_stream_handler.setFormatter(logging_formatter)
 log.root.addHandler(logging_stream_handler)
 
+if __name__ == "__main__":
+    from core.headless import isHeadless, main
+    if isHeadless(sys.argv[1:]):
+        # Plays without any window, the widget modules below are never imported
+        multiprocessing.freeze_support()
+        sys.exit(main(sys.argv[1:]))
+
+import PySide6
+from PySide6.QtGui import QShortcut
+from PySide6.QtCore import QSettings, QTimer, Slot
+from PySide6.QtWidgets import QApplication, QLabel, QMainWindow, QProgressBar
+
+from core.latencyDialog import LatencyDialog
+from core.show import Show
+from core.startupProfile import StartupProfile
+from core.triggerServer import DEFAULT_HOST, DEFAULT_OSC_PORT, DEFAULT_TCP_PORT, TriggerServer
+from ui.uic.ui_mainWindow import Ui_MainWindow
+
+STYLE_SHEET_PATH = Path(__name__).parent / "styleSheet.css"
+
+# QSettings key of the show open when the app was closed, it is opened on the next start
+LAST_SHOW_SETTING = "lastShow"
+
+
 
 # ===============================
 #           MainWindow
 # ===============================
 class MainWindow(QMainWindow):
     
-    def __init__(self) -> None:
+    def __init__(
+            self, profile: StartupProfile, printProfile: bool = False, quitAfterStartup: bool = False,
+            listen: tuple = None) -> None:
+        """
+        Only builds the window. The audio output and the last show are loaded
+        after the first paint, see startDeferred.
+        listen is (host, oscPort, tcpPort) of the trigger server, None keeps it off.
+        """
         super(MainWindow, self).__init__()
-
+        self._profile = profile
+        self._printProfile = printProfile
+        self._quitAfterStartup = quitAfterStartup
+        self._painted = False
+        self._listen = listen
 
         # Setup generated ui
-        self.ui = Ui_MainWindow()
-        self.ui.setupUi(self)
+        with profile.phase("setupUi"):
+            self.ui = Ui_MainWindow()
+            self.ui.setupUi(self)
 
         # Create Show object
-        self.show_ = Show(self.ui.keyboardHolder)
+        with profile.phase("Keyboard"):
+            self.show_ = Show(self.ui.keyboardHolder)
 
         self.ui.actionOpenShow.triggered.connect(self.show_.load_gui)
         self.ui.actionSaveShow.triggered.connect(self.show_.save)
         self.ui.actionSaveShowAs.triggered.connect(self.show_.save_gui)
         self.ui.actionNewShow.triggered.connect(self.show_.new)
         self.ui.actionExit.triggered.connect(self.close)
+        self.ui.actionLatencyStatistics.triggered.connect(self.openLatencyDialog)
+        self.ui.actionNormalizeLoudness.triggered.connect(self.show_.engine.analyzeLoudness)
 
         shortcut_reload_stylesheet = QShortcut("F5", self)
         shortcut_reload_stylesheet.activated.connect(self.reloadStyleSheet)
 
+        # Show loading progress
+        self.loadProgressBar = QProgressBar(self)
+        self.loadProgressBar.setMaximumWidth(200)
+        self.loadProgressBar.setFormat("Loading %v / %m")
+        self.loadProgressBar.hide()
+        self.ui.statusbar.addPermanentWidget(self.loadProgressBar)
+        self.show_.engine.loader.progress.connect(self.updateLoadProgress)
+        self.show_.engine.loudness.progress.connect(self.updateLoudnessProgress)
+
+        # Current bank, switched with page up and page down
+        self.bankLabel = QLabel(self)
+        self.ui.statusbar.addPermanentWidget(self.bankLabel)
+        self.show_.engine.bankChanged.connect(self.updateBankLabel)
+        self.updateBankLabel(self.show_.engine.bank, self.show_.engine.bankCount)
+
+        # Keys fired over the network
+        self.triggerServer = TriggerServer(self.show_.engine, self)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._painted:
+            # Children are painted in the same pass, the window is usable now
+            self._painted = True
+            self._profile.milestone("first paint")
+            QTimer.singleShot(0, self.startDeferred)
+
+    @Slot()
+    def startDeferred(self):
+        """Loads the multimedia backend and opens the last show, once the window is visible."""
+        with self._profile.phase("multimedia"):
+            self.show_.engine.mixer.prepare()
+
+        path = QSettings().value(LAST_SHOW_SETTING, "")
+        if path and Path(path).is_file():
+            with self._profile.phase("last show"):
+                try:
+                    self.show_.load(path, asynchronous=True)
+                except (OSError, ValueError) as e:
+                    log.error(f"Could not open the last show '{path}': {e}")
+        if self._listen is not None:
+            with self._profile.phase("trigger server"):
+                try:
+                    self.triggerServer.start(*self._listen)
+                except OSError as e:
+                    log.error(f"Could not start the trigger server on {self._listen}: {e}")
+        if self.show_.engine.loader.is_loading:
+            self.show_.engine.loader.finished.connect(self._startupFinished)
+        else:
+            self._startupFinished()
+
+    @Slot()
+    def _startupFinished(self):
+        """Reports the startup, once the last show is decoded."""
+        if "ready" in self._profile.milestones:
+            return
+        self._profile.milestone("ready")
+        if self._printProfile:
+            print(self._profile.format(), flush=True)
+        if self._quitAfterStartup:
+            self.close()
+
+    @Slot(int, int)
+    def updateLoadProgress(self, done, total, format="Loading %v / %m"):
+        self.loadProgressBar.setFormat(format)
+        self.loadProgressBar.setMaximum(total)
+        self.loadProgressBar.setValue(done)
+        self.loadProgressBar.setVisible(done < total)
+
+    @Slot(int, int)
+    def updateLoudnessProgress(self, done, total):
+        self.updateLoadProgress(done, total, "Analyzing loudness %v / %m")
+
+    @Slot(int, int)
+    def updateBankLabel(self, bank, count):
+        self.bankLabel.setText(f"Bank {bank + 1} / {count}")
+
     def reloadStyleSheet(self):
         pass
 
+    def closeEvent(self, event):
+        if self.show_.can_save:
+            QSettings().setValue(LAST_SHOW_SETTING, str(self.show_.path))
+        self.triggerServer.stop()
+        self.show_.engine.mixer.release()
+        # Let a save still running finish
+        self.show_.writer.waitForDone()
+        self.show_.engine.loudness.shutdown()
+        return super().closeEvent(event)
+
+    @Slot()
+    def openLatencyDialog(self):
+        dlg = LatencyDialog(self, self.show_.engine.latency)
+        dlg.show()
+
 
 
 
@@ -58,7 +186,8 @@ class MainWindow(QMainWindow):
 class App(QApplication):
     def __init__(self, argv):
         super().__init__(argv)
-        self.loadStyleSheet()
+        self.setOrganizationName("9qUmV4")
+        self.setApplicationName("SoundKey2")
 
 
     def loadStyleSheet(self):
@@ -70,15 +199,40 @@ class App(QApplication):
 #           __MAIN__
 # ===============================
 if __name__ == "__main__":
+    # Loudness analysis runs in worker processes, also in the frozen build
+    multiprocessing.freeze_support()
+    profile = StartupProfile(STARTED)
+    profile.addPhase("imports", STARTED)
+
+    parser = argparse.ArgumentParser(description="SoundKey 2 soundboard")
+    parser.add_argument("--profile-startup", action="store_true", help="print the time spent per startup phase")
+    parser.add_argument("--quit-after-startup", action="store_true", help="quit once the startup is done")
+    parser.add_argument(
+        "--listen", nargs="?", const=DEFAULT_HOST, metavar="HOST",
+        help=f"fire keys over OSC and TCP, listening on HOST (default {DEFAULT_HOST})",
+    )
+    parser.add_argument("--headless", metavar="SHOW", help="play SHOW without any window, see core/headless.py")
+    parser.add_argument("--osc-port", type=int, default=DEFAULT_OSC_PORT, help="UDP port for OSC, 0 disables it")
+    parser.add_argument("--tcp-port", type=int, default=DEFAULT_TCP_PORT, help="TCP port for lines, 0 disables it")
+    args, qt_args = parser.parse_known_args()
+    listen = None
+    if args.listen is not None:
+        listen = (args.listen, args.osc_port or None, args.tcp_port or None)
+
     # Start Logging
     log.info("App starting.")
     log.info(f"PySide version: {PySide6.__version__}")
 
-    # Create Application
-    app = App(sys.argv)
+    # Create Application, the style sheet is set before any widget exists
+    with profile.phase("QApplication"):
+        app = App(sys.argv[:1] + qt_args)
+    with profile.phase("stylesheet"):
+        app.loadStyleSheet()
 
     # Create main Window
-    main_window = MainWindow()
+    main_window = MainWindow(
+        profile, printProfile=args.profile_startup, quitAfterStartup=args.quit_after_startup, listen=listen,
+    )
     main_window.show()
 
 
@@ -0,0 +1,92 @@
+# Generated audio fixtures and measuring helpers for the benchmarks.
+# Author 9qUmV4
+
+import os
+import sys
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+
+def writeWave(
+        path: Path,
+        seconds: float,
+        frequency: float = 440.0,
+        sampleRate: int = 48000,
+        channels: int = 2,
+    ) -> Path:
+    """Writes a 16 bit sine wave file and returns its path."""
+    path = Path(path)
+    t = np.arange(int(seconds * sampleRate)) / sampleRate
+    tone = (np.sin(2 * np.pi * frequency * t) * 0.25 * 32767).astype('<i2')
+    with wave.open(str(path), 'wb') as f_wave:
+        f_wave.setnchannels(channels)
+        f_wave.setsampwidth(2)
+        f_wave.setframerate(sampleRate)
+        f_wave.writeframes(np.repeat(tone, channels).tobytes())
+    return path
+
+
+def writeWaves(directory: Path, count: int, seconds: float) -> list[Path]:
+    """Writes count wave files with different tones."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    return [
+        writeWave(directory / f"tone_{i:03d}.wav", seconds, 220.0 + 20.0 * i)
+        for i in range(count)
+    ]
+
+
+def residentMemory() -> int:
+    """Returns the resident memory of this process in bytes."""
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb
+        )
+        return counters.WorkingSetSize
+
+    with open(f"/proc/{os.getpid()}/status") as f_status:
+        for line in f_status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class CpuTimer:
+    """Measures CPU and wall time of a block."""
+
+    def __enter__(self):
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.cpu = time.process_time() - self._cpu
+        self.wall = time.perf_counter() - self._wall
+        return False
+
+    @property
+    def load(self) -> float:
+        """CPU time per wall time, 1.0 is one fully used core."""
+        return self.cpu / self.wall if self.wall else 0.0
@@ -0,0 +1,56 @@
+# Measures the loudness analysis of a show's files with one worker process and with one per core.
+# Run from the repository root:
+#   python -m benchmarks.loudnessBenchmark [--files 16] [--seconds 60]
+# Author 9qUmV4
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from core.loudness import analyzeFile
+
+from .fixtures import writeWaves
+
+
+def _workerPid(_) -> int:
+    return os.getpid()
+
+
+def analyzeAll(files: list[Path], workers: int) -> float:
+    """Analyzes all files with workers processes and returns the wall time in seconds, without the process start."""
+    # Spawned like the analyzer of the keyboard
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # Start the workers before timing
+        list(pool.map(_workerPid, range(workers)))
+        start = time.perf_counter()
+        list(pool.map(analyzeFile, [str(path) for path in files]))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the parallel loudness analysis.")
+    parser.add_argument("--files", type=int, default=16, help="number of files analyzed")
+    parser.add_argument("--seconds", type=float, default=60.0, help="length of every file")
+    args = parser.parse_args()
+
+    cores = os.cpu_count()
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        files = writeWaves(Path(directory), args.files, args.seconds)
+        audio = args.files * args.seconds
+        print(f"{args.files} files of {args.seconds} s, {cores} cores")
+        print(f"{'workers':>8}{'wall time':>12}{'real-time factor':>20}")
+        for workers in sorted({1, cores}):
+            wall = analyzeAll(files, workers)
+            results[workers] = {"wall_s": wall, "realtime_factor": audio / wall}
+            print(f"{workers:>8}{wall:>10.3f} s{audio / wall:>19.1f}x")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
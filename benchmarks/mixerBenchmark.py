@@ -0,0 +1,106 @@
+# Compares one QMediaPlayer + QAudioOutput per key with the shared mixer.
+# Run from the repository root:
+#   python -m benchmarks.mixerBenchmark [--keys 12] [--seconds 10]
+# Author 9qUmV4
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from .fixtures import CpuTimer, residentMemory, writeWaves
+
+KEY_COUNT = 43
+
+
+def runPlayers(files: list[Path], seconds: float) -> dict:
+    """One QMediaPlayer and QAudioOutput for every key, like before the mixer."""
+    from PySide6.QtCore import QEventLoop, QTimer, QUrl
+    from PySide6.QtMultimedia import QAudioOutput, QMediaPlayer
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication([])
+    players = []
+    for i in range(KEY_COUNT):
+        output = QAudioOutput()
+        player = QMediaPlayer()
+        player.setAudioOutput(output)
+        if i < len(files):
+            player.setSource(QUrl.fromLocalFile(str(files[i])))
+        players.append((player, output))
+    idle = residentMemory()
+
+    with CpuTimer() as timer:
+        for player, _ in players[:len(files)]:
+            player.play()
+        loop = QEventLoop()
+        QTimer.singleShot(int(seconds * 1000), loop.quit)
+        loop.exec()
+    return {"idle_rss": idle, "playing_rss": residentMemory(), "cpu_load": timer.load}
+
+
+def runMixer(files: list[Path], seconds: float) -> dict:
+    """The Keyboard with its shared mixer."""
+    from PySide6.QtCore import QEventLoop, QTimer
+    from PySide6.QtWidgets import QApplication, QWidget
+
+    from core.keyboard import Keyboard
+
+    app = QApplication([])
+    parent = QWidget()
+    keyboard = Keyboard(parent)
+    keys = keyboard._key_list[:len(files)]
+    keyboard.updateSettings(**{key: {"path": path} for key, path in zip(keys, files)})
+    idle = residentMemory()
+
+    with CpuTimer() as timer:
+        for key in keys:
+            keyboard.engine.cue(key).play()
+        loop = QEventLoop()
+        QTimer.singleShot(int(seconds * 1000), loop.quit)
+        loop.exec()
+    return {"idle_rss": idle, "playing_rss": residentMemory(), "cpu_load": timer.load}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares per key players with the shared mixer.")
+    parser.add_argument("--keys", type=int, default=12, help="number of keys playing at once")
+    parser.add_argument("--seconds", type=float, default=10.0, help="playing time per run")
+    parser.add_argument("--mode", choices=("players", "mixer"), help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        # Child process, measures one mode
+        files = sorted(Path(args.dir).glob("*.wav"))[:args.keys]
+        run = runPlayers if args.mode == "players" else runMixer
+        print(json.dumps(run(files, args.seconds)))
+        return
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    with tempfile.TemporaryDirectory() as directory:
+        writeWaves(Path(directory), args.keys, args.seconds + 5.0)
+        results = {}
+        for mode in ("players", "mixer"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.mixerBenchmark", "--mode", mode,
+                 "--keys", str(args.keys), "--seconds", str(args.seconds), "--dir", directory],
+                check=True, capture_output=True, text=True, cwd=Path(__file__).parents[1],
+            ).stdout
+            results[mode] = json.loads(out.strip().splitlines()[-1])
+
+    print(f"{args.keys} keys playing for {args.seconds} s")
+    print(f"{'':10}{'idle RSS':>14}{'playing RSS':>14}{'CPU load':>10}")
+    for mode, r in results.items():
+        print(
+            f"{mode:10}{r['idle_rss'] / 2**20:>11.1f} MB{r['playing_rss'] / 2**20:>11.1f} MB"
+            f"{r['cpu_load'] * 100:>9.1f}%"
+        )
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
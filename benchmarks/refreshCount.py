@@ -0,0 +1,85 @@
+# Counts the refreshes of the keyboard grid caused by bulk operations.
+# Every operation must refresh the keys in one pass of the update scheduler.
+# Run from the repository root:
+#   python -m benchmarks.refreshCount [--keys 43]
+# Author 9qUmV4
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from .fixtures import writeWaves
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Counts keyboard refreshes of bulk operations.")
+    parser.add_argument("--keys", type=int, default=43, help="number of keys assigned in the show")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    with tempfile.TemporaryDirectory() as directory:
+        results = count(args, Path(directory))
+
+    print(f"{'operation':24}{'changes':>9}{'passes':>8}{'buttons':>9}{'repolish':>10}{'layouts':>9}{'time':>12}")
+    for name, r in results.items():
+        print(
+            f"{name:24}{r['changes']:>9}{r['passes']:>8}{r['buttons']:>9}{r['repolishes']:>10}"
+            f"{r['layouts']:>9}{r['ms']:>9.2f} ms"
+        )
+    passed = all(r["passes"] == 1 for r in results.values())
+    print(json.dumps({"results": results, "passed": passed}))
+    print("Every operation refreshed once" if passed else "Some operation refreshed more than once")
+    return 0 if passed else 1
+
+
+def count(args, directory: Path) -> dict:
+    """Runs every operation, lets the event loop refresh and returns the scheduler statistics."""
+    from PySide6.QtWidgets import QApplication, QWidget
+
+    from core.show import Show, ShowEncoder
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    window = QWidget()
+    show = Show(window, offline=True, journal=False)
+    keyboard = show.keyboard
+    window.show()
+
+    files = writeWaves(directory, 8, 1.0)
+    names = keyboard._key_list[:args.keys]
+    settings = {
+        name: {"path": files[i % len(files)], "label": f"Cue {i}"} for i, name in enumerate(names)
+    }
+    path = directory / "show.SoundKey"
+    with path.open('w') as f_show:
+        f_show.write(ShowEncoder().encode({"version": "0.2.0", "banks": [settings, {}]}))
+
+    operations = {
+        "show_load": lambda: show.load(path),
+        "bank_switch": lambda: keyboard.engine.setBank(1),
+        "bank_switch_back": lambda: keyboard.engine.setBank(0),
+        "keyboard_update_settings": lambda: keyboard.updateSettings(**settings),
+        "keyboard_new": keyboard.engine.new,
+        "show_new": show.new,
+    }
+    results = {}
+    for name, operation in operations.items():
+        app.processEvents()
+        keyboard.updates.resetStats()
+        start = time.perf_counter()
+        operation()
+        # The first round runs the pass, the second the layout it requested
+        app.processEvents()
+        elapsed = time.perf_counter() - start
+        app.processEvents()
+        keyboard.updates.flush()
+        results[name] = {**keyboard.updates.stats, "ms": elapsed * 1000}
+    window.close()
+    return results
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# Triggers overlapping keys 1000 times per second and checks trigger time and memory stay flat.
+# Run from the repository root:
+#   python -m benchmarks.retriggerBenchmark [--seconds 10] [--rate 1000] [--stealing oldest]
+# Author 9qUmV4
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .fixtures import residentMemory, writeWaves
+
+# Allowed growth of the last second over the first one
+MAX_TIME_GROWTH = 1.5
+MAX_BLOCK_GROWTH = 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress tests retriggering keys with overlapping voices.")
+    parser.add_argument("--seconds", type=float, default=10.0, help="simulated playing time")
+    parser.add_argument("--rate", type=int, default=1000, help="triggers per second")
+    parser.add_argument("--keys", type=int, default=8, help="number of keys triggered")
+    parser.add_argument("--polyphony", type=int, default=32, help="voices of the mixer")
+    parser.add_argument("--stealing", default="oldest", help="oldest or quietest")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    with tempfile.TemporaryDirectory() as directory:
+        files = writeWaves(Path(directory), args.keys, 2.0)
+        seconds = stress(args, files)
+
+    print(f"{args.rate} triggers/s on {args.keys} keys, {args.polyphony} voices, stealing {args.stealing}")
+    print(f"{'second':>6}{'trigger p50':>14}{'trigger p99':>14}{'render p99':>14}{'voices':>8}{'blocks':>10}{'RSS':>10}")
+    for i, s in enumerate(seconds):
+        print(
+            f"{i:>6}{s['trigger_p50_us']:>11.1f} us{s['trigger_p99_us']:>11.1f} us{s['render_p99_us']:>11.1f} us"
+            f"{s['voices']:>8}{s['blocks']:>10}{s['rss'] / 2**20:>7.1f} MB"
+        )
+
+    # The first second warms up, compare the second one with the last
+    first, last = seconds[min(1, len(seconds) - 1)], seconds[-1]
+    flat = (
+        last["trigger_p50_us"] <= first["trigger_p50_us"] * MAX_TIME_GROWTH
+        and last["blocks"] - first["blocks"] <= MAX_BLOCK_GROWTH
+    )
+    print(json.dumps({"seconds": seconds, "flat": flat}))
+    print("Trigger time and memory stay flat" if flat else "Trigger time or memory grows")
+    return 0 if flat else 1
+
+
+def stress(args, files: list[Path]) -> list[dict]:
+    """Triggers random keys set to overlap, renders like the sink and returns the statistics of every second."""
+    from PySide6.QtWidgets import QApplication, QWidget
+
+    from core.engine import Cue
+    from core.keyboard import Keyboard
+    from core.mixer import Mixer
+    from core.sampleCache import SAMPLE_RATE
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    parent = QWidget()
+    keyboard = Keyboard(parent, offline=True)
+    names = keyboard._key_list[:args.keys]
+    keyboard.updateSettings(**{
+        name: {"path": path, "retrigger": Cue.RETRIGGER_OVERLAP} for name, path in zip(names, files)
+    })
+    mixer = keyboard.mixer
+    mixer.polyphony = args.polyphony
+    mixer.stealing = args.stealing
+    keys = [keyboard.engine.cue(name) for name in names]
+    rng = random.Random(5)
+
+    # Triggers are spread over the rendered blocks like a real sink pulling them
+    triggersPerBlock = args.rate * Mixer.BLOCK_FRAMES / SAMPLE_RATE
+    blocksPerSecond = SAMPLE_RATE // Mixer.BLOCK_FRAMES
+    seconds = []
+    due = 0.0
+    for second in range(int(args.seconds)):
+        triggerTimes = []
+        renderTimes = []
+        for _ in range(blocksPerSecond):
+            due += triggersPerBlock
+            while due >= 1.0:
+                due -= 1.0
+                key = rng.choice(keys)
+                start = time.perf_counter_ns()
+                key.togglePlay()
+                triggerTimes.append(time.perf_counter_ns() - start)
+            start = time.perf_counter_ns()
+            mixer.render(Mixer.BLOCK_FRAMES)
+            renderTimes.append(time.perf_counter_ns() - start)
+        app.processEvents()
+        triggerTimes = np.array(triggerTimes) / 1000.0
+        seconds.append({
+            "triggers": len(triggerTimes),
+            "trigger_p50_us": float(np.percentile(triggerTimes, 50)),
+            "trigger_p99_us": float(np.percentile(triggerTimes, 99)),
+            "render_p99_us": float(np.percentile(renderTimes, 99)) / 1000.0,
+            "voices": mixer.voiceCount,
+            "steals": mixer.steals,
+            "blocks": sys.getallocatedblocks(),
+            "rss": residentMemory(),
+        })
+    return seconds
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# Hammers all keys of a generated show with random play, stop and toggle for a long run
+# and checks for underruns, trigger latency, heap growth, leaked Qt objects and CPU load.
+# The mixer plays into a null output, or a wave file with --wav, no sound hardware is needed.
+# Run from the repository root:
+#   python -m benchmarks.soak [--seconds 60 | --hours 4] [--rate 20] [--interval 60] [--wav out.wav]
+# Author 9qUmV4
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+from .fixtures import residentMemory, writeWaves
+
+# Thresholds of the report
+MAX_UNDERRUNS = 0
+MAX_TRIGGER_P99_MS = 25.0
+MAX_CPU_LOAD = 0.5
+# Allowed growth of the last interval over the first one
+MAX_BLOCK_GROWTH = 20000
+MAX_OBJECT_GROWTH = 0
+
+OPERATIONS = ("togglePlay", "play", "stop")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak tests random triggers of all keys.")
+    parser.add_argument("--seconds", type=float, default=60.0, help="length of the run")
+    parser.add_argument("--hours", type=float, help="length of the run in hours, overrides --seconds")
+    parser.add_argument("--rate", type=float, default=20.0, help="operations per second")
+    parser.add_argument("--interval", type=float, default=10.0, help="seconds per row of the report")
+    parser.add_argument("--keys", type=int, default=43, help="number of keys assigned in the show")
+    parser.add_argument("--wav", type=Path, help="write the output to this wave file instead of the null sink")
+    parser.add_argument("--seed", type=int, default=5, help="seed of the random operations")
+    args = parser.parse_args()
+    if args.hours is not None:
+        args.seconds = args.hours * 3600
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    # Every operation logs, hours of them would only fill the console
+    logging.getLogger("core").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as directory:
+        intervals = soak(args, Path(directory))
+
+    print(f"{args.seconds:.0f} s, {args.rate:g} operations/s on {args.keys} keys")
+    print(
+        f"{'time':>8}{'operations':>12}{'underruns':>11}{'longest gap':>14}{'trigger p50':>14}{'trigger p99':>14}"
+        f"{'blocks':>10}{'objects':>9}{'CPU':>7}{'RSS':>10}"
+    )
+    for s in intervals:
+        print(
+            f"{s['time']:>6.0f} s{s['operations']:>12}{s['underruns']:>11}{s['longest_gap_ms']:>11.2f} ms"
+            f"{s['trigger_p50_ms']:>11.2f} ms{s['trigger_p99_ms']:>11.2f} ms"
+            f"{s['blocks']:>10}{s['objects']:>9}{s['cpu_load']:>6.0%}{s['rss'] / 2**20:>7.1f} MB"
+        )
+
+    checks = evaluate(intervals)
+    passed = all(checks.values())
+    print(json.dumps({"intervals": intervals, "checks": checks, "passed": passed}))
+    for name, ok in checks.items():
+        print(f"{'pass' if ok else 'FAIL'}  {name}")
+    return 0 if passed else 1
+
+
+def evaluate(intervals: list[dict]) -> dict[str, bool]:
+    """Checks the intervals against the thresholds, the first one warms up and only counts as reference."""
+    steady = intervals[1:] or intervals
+    first, last = steady[0], steady[-1]
+    measured = [s["trigger_p99_ms"] for s in steady if s["triggers"]]
+    return {
+        f"underruns <= {MAX_UNDERRUNS}": sum(s["underruns"] for s in steady) <= MAX_UNDERRUNS,
+        f"trigger p99 < {MAX_TRIGGER_P99_MS} ms": max(measured, default=0.0) < MAX_TRIGGER_P99_MS,
+        f"CPU load < {MAX_CPU_LOAD:.0%}": max(s["cpu_load"] for s in steady) < MAX_CPU_LOAD,
+        f"heap growth <= {MAX_BLOCK_GROWTH} blocks": last["blocks"] - first["blocks"] <= MAX_BLOCK_GROWTH,
+        f"Qt object growth <= {MAX_OBJECT_GROWTH}": last["objects"] - first["objects"] <= MAX_OBJECT_GROWTH,
+    }
+
+
+def soak(args, directory: Path) -> list[dict]:
+    """Runs the show on the event loop with random operations and returns the statistics of every interval."""
+    from PySide6.QtCore import QObject, QTimer, Qt
+    from PySide6.QtWidgets import QApplication, QWidget
+
+    from core.engine import Cue
+    from core.latency import GLOBAL
+    from core.mixer import NullOutput
+    from core.show import Show, ShowEncoder
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    window = QWidget()
+    show = Show(window, journal=False)
+    keyboard = show.keyboard
+    engine = show.engine
+    window.show()
+    engine.mixer.prepare(partial(NullOutput, path=args.wav))
+
+    # Short and long files in every retrigger mode, so keys end by themselves and get stopped
+    files = writeWaves(directory, 4, 0.5) + writeWaves(directory / "long", 4, 8.0)
+    rng = random.Random(args.seed)
+    names = keyboard._key_list[:args.keys]
+    settings = {
+        name: {
+            "path": files[i % len(files)],
+            "label": f"Cue {i}",
+            "fadeOut": rng.choice((0, 200)),
+            "retrigger": Cue.RETRIGGER_MODES[i % len(Cue.RETRIGGER_MODES)],
+        }
+        for i, name in enumerate(names)
+    }
+    path = directory / "soak.SoundKey"
+    with path.open('w') as f_show:
+        f_show.write(ShowEncoder().encode({"version": "0.2.0", "banks": [settings]}))
+    show.load(path)
+    cues = [engine.cue(name) for name in names]
+    while engine.mixer.output is None:
+        app.processEvents()
+    output = engine.mixer.output
+    stats = {"operations": 0, "triggers": 0}
+
+    def operate():
+        cue = rng.choice(cues)
+        operation = rng.choice(OPERATIONS)
+        stats["operations"] += 1
+        if operation == "stop":
+            cue.stop(fade=rng.random() < 0.5)
+            return
+        # Measured like a key press, from the trigger until the mixer renders the voice
+        keyboard.latency.trigger(cue.voice)
+        stats["triggers"] += 1
+        getattr(cue, operation)()
+
+    intervals = []
+    start = time.perf_counter()
+    mark = {"wall": start, "cpu": time.process_time(), "underruns": 0}
+
+    def report():
+        now = time.perf_counter()
+        cpu = time.process_time()
+        queued = keyboard.latency.summary()[GLOBAL]["queued"]
+        intervals.append({
+            "time": now - start,
+            "operations": stats["operations"],
+            "triggers": stats["triggers"],
+            "underruns": output.underruns - mark["underruns"],
+            "longest_gap_ms": output.longestGap * 1000,
+            "trigger_p50_ms": queued["p50"] or 0.0,
+            "trigger_p99_ms": queued["p99"] or 0.0,
+            "voices": engine.mixer.voiceCount,
+            "blocks": sys.getallocatedblocks(),
+            "objects": len(window.findChildren(QObject)) + len(QApplication.allWidgets()),
+            "cpu_load": (cpu - mark["cpu"]) / (now - mark["wall"]),
+            "rss": residentMemory(),
+        })
+        stats["operations"] = stats["triggers"] = 0
+        keyboard.latency.reset()
+        output.longestGap = 0.0
+        mark.update(wall=time.perf_counter(), cpu=time.process_time(), underruns=output.underruns)
+        if len(intervals) >= max(1, round(args.seconds / args.interval)):
+            app.quit()
+
+    operationTimer = QTimer(timerType=Qt.PreciseTimer, interval=max(1, round(1000 / args.rate)))
+    operationTimer.timeout.connect(operate)
+    reportTimer = QTimer(interval=round(args.interval * 1000))
+    reportTimer.timeout.connect(report)
+
+    operationTimer.start()
+    reportTimer.start()
+    app.exec()
+    operationTimer.stop()
+    reportTimer.stop()
+    engine.mixer.release()
+    window.close()
+    return intervals
+
+
+if __name__ == "__main__":
+    sys.exit(main())
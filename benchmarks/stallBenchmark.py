@@ -0,0 +1,143 @@
+# Stalls the GUI thread while keys play and counts the underruns of the audio thread.
+# A sleeping stall is like a blocking dialog waiting in native code, a busy one keeps running Python.
+# The mixer plays into a null output, or a wave file with --wav, no sound hardware is needed.
+# Run from the repository root:
+#   python -m benchmarks.stallBenchmark [--stall-ms 500] [--stalls 5] [--wav out.wav]
+# Author 9qUmV4
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+from .fixtures import writeWaves
+
+MAX_UNDERRUNS = 0
+
+
+def sleepStall(seconds: float):
+    time.sleep(seconds)
+
+
+def busyStall(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+STALLS = {"sleep": sleepStall, "busy": busyStall}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Counts audio underruns caused by stalls of the GUI thread.")
+    parser.add_argument("--stall-ms", type=int, default=500, help="length of one stall")
+    parser.add_argument("--stalls", type=int, default=5, help="stalls per kind")
+    parser.add_argument("--keys", type=int, default=8, help="number of keys playing")
+    parser.add_argument("--rate", type=float, default=20.0, help="triggers per second between the stalls")
+    parser.add_argument("--wav", type=Path, help="write the output to this wave file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    with tempfile.TemporaryDirectory() as directory:
+        results = measure(args, Path(directory))
+
+    print(f"{args.stalls} stalls of {args.stall_ms} ms per kind, {args.keys} keys playing")
+    print(f"{'stall':8}{'underruns':>11}{'longest gap':>14}{'trigger p99':>14}{'in sync':>9}")
+    for name, r in results.items():
+        print(
+            f"{name:8}{r['underruns']:>11}{r['longest_gap_ms']:>11.2f} ms"
+            f"{r['trigger_p99_ms']:>11.2f} ms{'yes' if r['in_sync'] else 'no':>9}"
+        )
+    passed = all(r["underruns"] <= MAX_UNDERRUNS and r["in_sync"] for r in results.values())
+    print(json.dumps({"results": results, "passed": passed}))
+    print("No underruns while the GUI stalled" if passed else "The GUI stalls reached the audio output")
+    return 0 if passed else 1
+
+
+def measure(args, directory: Path) -> dict:
+    """Plays keys on the audio thread, stalls the GUI thread with every kind and returns the statistics."""
+    from PySide6.QtCore import QEventLoop, QTimer
+    from PySide6.QtWidgets import QApplication, QWidget
+
+    from core.engine import Cue
+    from core.latency import GLOBAL
+    from core.mixer import NullOutput
+    from core.show import Show
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    window = QWidget()
+    show = Show(window, journal=False)
+    keyboard = show.keyboard
+    engine = show.engine
+    window.show()
+    mixer = engine.mixer
+    # Before any sample loads, those prepare the default output
+    mixer.prepare(partial(NullOutput, path=args.wav))
+
+    files = writeWaves(directory, args.keys, 4.0)
+    names = keyboard._key_list[:args.keys]
+    keyboard.updateSettings(**{
+        name: {"path": path, "retrigger": Cue.RETRIGGER_RESTART} for name, path in zip(names, files)
+    })
+    cues = [engine.cue(name) for name in names]
+    rng = random.Random(5)
+
+    def spin(ms: int):
+        loop = QEventLoop()
+        QTimer.singleShot(ms, loop.quit)
+        loop.exec()
+
+    def trigger():
+        cue = rng.choice(cues)
+        keyboard.latency.trigger(cue.voice)
+        cue.play()
+
+    triggerTimer = QTimer(interval=max(1, round(1000 / args.rate)))
+    triggerTimer.timeout.connect(trigger)
+    while mixer.output is None:
+        app.processEvents()
+
+    results = {}
+    for name, stall in STALLS.items():
+        for cue in cues:
+            cue.play()
+        spin(200)
+        output = mixer.output
+        underruns = output.underruns
+        output.longestGap = 0.0
+        keyboard.latency.reset()
+        triggerTimer.start()
+        for _ in range(args.stalls):
+            spin(1000)
+            # Commands and events wait in their queues during the stall
+            trigger()
+            stall(args.stall_ms / 1000)
+        spin(200)
+        triggerTimer.stop()
+        results[name] = {
+            "underruns": output.underruns - underruns,
+            "longest_gap_ms": output.longestGap * 1000,
+            "trigger_p99_ms": keyboard.latency.summary()[GLOBAL]["queued"]["p99"] or 0.0,
+        }
+
+        # Keys ending while the GUI stalled must be reported afterwards
+        mixer.stopAll()
+        spin(50)
+        for cue in cues:
+            cue.play()
+            cue.stop()
+        spin(50)
+        results[name]["in_sync"] = mixer.voiceCount == 0 and not any(cue.is_plaing for cue in cues)
+
+    mixer.release()
+    window.close()
+    return results
+
+
+if __name__ == "__main__":
+    sys.exit(main())
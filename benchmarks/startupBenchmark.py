@@ -0,0 +1,116 @@
+# Compares the cold start of the keyboard with eagerly created
+# per key players against the lazily created mixer output.
+# Run from the repository root:
+#   python -m benchmarks.startupBenchmark [--runs 5]
+# Author 9qUmV4
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from .fixtures import residentMemory
+
+KEY_COUNT = 43
+
+
+def runEager() -> dict:
+    """Buttons plus one QMediaPlayer and QAudioOutput per key, like before."""
+    start = time.perf_counter()
+    from PySide6.QtGui import QShortcut
+    from PySide6.QtMultimedia import QAudioOutput, QMediaPlayer
+    from PySide6.QtWidgets import QApplication, QGridLayout, QPushButton, QWidget
+    imported = time.perf_counter()
+
+    app = QApplication([])
+    window = QWidget()
+    layout = QGridLayout(window)
+    keys = []
+    for i in range(KEY_COUNT):
+        button = QPushButton(str(i), window)
+        layout.addWidget(button, i // 11, i % 11)
+        output = QAudioOutput()
+        player = QMediaPlayer()
+        player.setAudioOutput(output)
+        keys.append((button, QShortcut(str(i), window), output, player))
+    built = time.perf_counter()
+
+    window.show()
+    app.processEvents()
+    shown = time.perf_counter()
+    return {
+        "imports": imported - start,
+        "construction": built - imported,
+        "first_paint": shown - built,
+        "total": shown - start,
+        "rss": residentMemory(),
+    }
+
+
+def runLazy() -> dict:
+    """The Keyboard, which creates its audio output on the first playable key."""
+    start = time.perf_counter()
+    from PySide6.QtWidgets import QApplication, QWidget
+
+    from core.keyboard import Keyboard
+    imported = time.perf_counter()
+
+    app = QApplication([])
+    window = QWidget()
+    keyboard = Keyboard(window)
+    built = time.perf_counter()
+
+    window.show()
+    app.processEvents()
+    shown = time.perf_counter()
+    return {
+        "imports": imported - start,
+        "construction": built - imported,
+        "first_paint": shown - built,
+        "total": shown - start,
+        "rss": residentMemory(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares the keyboard startup time.")
+    parser.add_argument("--runs", type=int, default=5, help="cold starts per mode")
+    parser.add_argument("--mode", choices=("eager", "lazy"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        # Child process, measures one cold start
+        run = runEager if args.mode == "eager" else runLazy
+        print(json.dumps(run()))
+        return
+
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    results = {}
+    for mode in ("eager", "lazy"):
+        runs = []
+        for _ in range(args.runs):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.startupBenchmark", "--mode", mode],
+                check=True, capture_output=True, text=True, env=env, cwd=Path(__file__).parents[1],
+            ).stdout
+            runs.append(json.loads(out.strip().splitlines()[-1]))
+        results[mode] = {
+            phase: statistics.median(run[phase] for run in runs) for phase in runs[0]
+        }
+
+    print(f"Median of {args.runs} cold starts (QT_QPA_PLATFORM=offscreen)")
+    print(f"{'':8}{'imports':>10}{'build':>10}{'paint':>10}{'total':>10}{'RSS':>12}")
+    for mode, r in results.items():
+        print(
+            f"{mode:8}{r['imports'] * 1000:>7.1f} ms{r['construction'] * 1000:>7.1f} ms"
+            f"{r['first_paint'] * 1000:>7.1f} ms{r['total'] * 1000:>7.1f} ms{r['rss'] / 2**20:>9.1f} MB"
+        )
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Checks that keys play exactly the frames between startTime and stopTime.
+# Renders every window through an offline mixer and compares the rendered
+# length and first frame with the requested times.
+# Run from the repository root:
+#   python -m benchmarks.stopAccuracy
+# Author 9qUmV4
+
+import argparse
+import sys
+import tempfile
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from core.mixer import Mixer
+from core.sampleCache import SAMPLE_RATE, SampleCache, msToFrames
+
+# (startTime, stopTime) in ms, 0 means end of file
+WINDOWS = [
+    (0, 0),
+    (0, 1000),
+    (250, 1250),
+    (1, 2),
+    (333, 2777),
+    (1999, 2001),
+    (1234, 0),
+]
+FILE_SECONDS = 3.0
+
+
+def writeRamp(path: Path, sampleRate: int) -> int:
+    """Writes a 32 bit wave file whose samples hold their frame index."""
+    frames = int(FILE_SECONDS * sampleRate)
+    ramp = (np.arange(1, frames + 1, dtype=np.int64) * 1000).astype('<i4')
+    with wave.open(str(path), 'wb') as f_wave:
+        f_wave.setnchannels(2)
+        f_wave.setsampwidth(4)
+        f_wave.setframerate(sampleRate)
+        f_wave.writeframes(np.repeat(ramp, 2).tobytes())
+    return frames
+
+
+def renderWindow(mixer: Mixer, samples: np.ndarray) -> np.ndarray:
+    """Renders one voice until it ends and returns the left channel."""
+    mixer.start("check", samples)
+    blocks = []
+    while mixer.isPlaying("check"):
+        blocks.append(mixer.render(Mixer.BLOCK_FRAMES)[:, 0])
+    return np.concatenate(blocks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks the start and stop accuracy.")
+    parser.add_argument("--tolerance", type=int, default=0, help="allowed deviation in frames")
+    args = parser.parse_args()
+
+    mixer = Mixer(offline=True)
+    cache = SampleCache(dtype=np.float32)
+    failed = False
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "ramp.wav"
+        frames = writeRamp(path, SAMPLE_RATE)
+
+        print(f"{'start':>7}{'stop':>7}{'expected':>10}{'rendered':>10}{'length':>8}{'offset':>8}")
+        for startTime, stopTime in WINDOWS:
+            rendered = renderWindow(mixer, cache.get(path, startTime, stopTime))
+            played = rendered[rendered != 0]
+
+            first = msToFrames(startTime)
+            last = frames if stopTime == 0 else msToFrames(stopTime)
+            expected = last - first
+            # Every sample holds its 1 based frame index
+            index = np.rint(played.astype(np.float64) * 2147483648.0 / 1000).astype(np.int64) - 1
+            length_error = len(played) - expected
+            offset_error = int(index[0]) - first if len(index) else 0
+
+            ok = abs(length_error) <= args.tolerance and abs(offset_error) <= args.tolerance
+            failed |= not ok
+            print(
+                f"{startTime:>7}{stopTime:>7}{expected:>10}{len(played):>10}"
+                f"{length_error:>+8}{offset_error:>+8}  {'ok' if ok else 'FAIL'}"
+            )
+
+    print(f"Tolerance {args.tolerance} frames ({args.tolerance / SAMPLE_RATE * 1000:.3f} ms)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# Plays a long wave file streamed from disk with a few voices and restarts,
+# and checks the memory it takes and the frames not read ahead in time.
+# The mixer plays into a null output, no sound hardware is needed.
+# Run from the repository root:
+#   python -m benchmarks.streamBenchmark [--minutes 60] [--seconds 20] [--voices 2] [--prefetch 4000]
+# Author 9qUmV4
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from .fixtures import CpuTimer, residentMemory
+
+MAX_UNDERRUNS = 0
+# Memory growth while loading and playing the stream
+MAX_RSS_GROWTH = 64 * 2**20
+
+
+def writeLongWave(path: Path, minutes: float, sampleRate: int = 48000) -> Path:
+    """Writes a 16 bit stereo sine wave file minute by minute, without holding it in memory."""
+    t = np.arange(sampleRate * 60) / sampleRate
+    minute = np.repeat((np.sin(2 * np.pi * 440.0 * t) * 0.25 * 32767).astype('<i2'), 2).tobytes()
+    with wave.open(str(path), 'wb') as f_wave:
+        f_wave.setnchannels(2)
+        f_wave.setsampwidth(2)
+        f_wave.setframerate(sampleRate)
+        whole, rest = divmod(minutes, 1)
+        for _ in range(int(whole)):
+            f_wave.writeframes(minute)
+        f_wave.writeframes(minute[:int(rest * sampleRate * 60) * 4])
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures memory and underruns of a streamed long file.")
+    parser.add_argument("--minutes", type=float, default=60.0, help="length of the generated file")
+    parser.add_argument("--seconds", type=float, default=20.0, help="playing time")
+    parser.add_argument("--voices", type=int, default=2, help="voices playing the file at once")
+    parser.add_argument("--prefetch", type=int, default=4000, help="read-ahead in ms")
+    parser.add_argument("--restart", type=float, default=5.0, help="seconds between restarts of a voice")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = writeLongWave(Path(directory) / "long.wav", args.minutes)
+        r = measure(args, path)
+
+    print(f"{args.minutes:g} min file, {args.voices} voices for {args.seconds:g} s, {args.prefetch} ms prefetch")
+    print(f"decoded size      {r['decoded_bytes'] / 2**20:>9.1f} MB")
+    print(f"held in cache     {r['cache_bytes'] / 2**20:>9.1f} MB")
+    print(f"read-ahead rings  {r['ring_bytes'] / 2**20:>9.1f} MB")
+    print(f"RSS growth        {r['rss_growth'] / 2**20:>9.1f} MB")
+    print(f"load time         {r['load_ms']:>9.1f} ms")
+    print(f"stream underruns  {r['stream_underruns']:>9}")
+    print(f"output underruns  {r['output_underruns']:>9}")
+    print(f"CPU load          {r['cpu_load']:>9.1%}")
+    passed = (
+        r["streamed"] and r["stream_underruns"] + r["output_underruns"] <= MAX_UNDERRUNS
+        and r["rss_growth"] <= MAX_RSS_GROWTH
+    )
+    print(json.dumps({"results": r, "passed": passed}))
+    print(
+        "Streamed without underruns in bounded memory" if passed
+        else "Not streamed, underruns or memory above the bound"
+    )
+    return 0 if passed else 1
+
+
+def measure(args, path: Path) -> dict:
+    """Loads path through the sample cache and plays it in real time, restarting one voice after another."""
+    from PySide6.QtCore import QCoreApplication, QEventLoop, QTimer
+
+    from core.mixer import Mixer, NullOutput
+    from core.sampleCache import CHANNELS, SampleCache, StreamReader, StreamSource
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    mixer = Mixer()
+    mixer.polyphony = max(mixer.polyphony, args.voices)
+    mixer.prepare(NullOutput)
+    while mixer.output is None:
+        app.processEvents()
+    cache = SampleCache(prefetch=args.prefetch)
+    before = residentMemory()
+
+    start = time.perf_counter()
+    source = cache.get(path)
+    load = time.perf_counter() - start
+    streamed = isinstance(source, StreamSource)
+    keys = [f"voice{i}" for i in range(args.voices)]
+    restarts = {"next": 0}
+
+    def restart():
+        mixer.start(keys[restarts["next"] % len(keys)], source)
+        restarts["next"] += 1
+
+    timer = QTimer(interval=round(args.restart * 1000))
+    timer.timeout.connect(restart)
+    underruns = mixer.output.underruns
+    with CpuTimer() as cpu:
+        for key in keys:
+            mixer.start(key, source)
+        timer.start()
+        loop = QEventLoop()
+        QTimer.singleShot(round(args.seconds * 1000), loop.quit)
+        loop.exec()
+        timer.stop()
+    playing = residentMemory()
+    output = mixer.output
+    mixer.release()
+
+    rings = StreamReader.HISTORY_FRAMES + source.prefetch if streamed else 0
+    return {
+        "streamed": streamed,
+        "decoded_bytes": len(source) * CHANNELS * source.dtype.itemsize,
+        "cache_bytes": cache.bytes_used,
+        "ring_bytes": args.voices * rings * CHANNELS * source.dtype.itemsize,
+        "rss_growth": playing - before,
+        "load_ms": load * 1000,
+        "stream_underruns": source.underruns if streamed else 0,
+        "output_underruns": output.underruns - underruns,
+        "restarts": restarts["next"],
+        "cpu_load": cpu.load,
+    }
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,382 @@
+# Headless benchmark suite for the show, keyboard and playback paths.
+# Compares the results with a stored baseline and fails on slowdowns.
+# Run from the repository root:
+#   python -m benchmarks.suite [--output results.json]
+#   python -m benchmarks.suite --update-baseline
+# Author 9qUmV4
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication, QWidget
+
+from core.bundle import BUNDLE_SUFFIX
+from core.engine import Cue
+from core.keyboard import Keyboard
+from core.library import Library
+from core.loudness import analyzeFile
+from core.mixer import Mixer
+from core.sampleCache import SAMPLE_RATE, decodeFile
+from core.show import Show, ShowEncoder
+from core.timeStretch import timeStretch
+
+from .fixtures import writeWaves
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+# Relative slowdown of the median allowed before a benchmark fails
+DEFAULT_TOLERANCE = 0.25
+SHOW_SIZES = (5, 20, 43)
+LIBRARY_SIZE = 50000
+
+
+
+# ########################################
+#               HELPERS
+# ########################################
+def measure(func, repeat: int, setup=None) -> list[float]:
+    """Calls setup and func repeat times and returns the durations of func in ms."""
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def summarize(durations: list[float], operations: int = 1) -> dict:
+    """Returns median, min and max per operation in ms."""
+    return {
+        "median_ms": statistics.median(durations) / operations,
+        "min_ms": min(durations) / operations,
+        "max_ms": max(durations) / operations,
+        "runs": len(durations),
+    }
+
+
+def showSettings(keyboard: Keyboard, files: list[Path], size: int) -> dict:
+    """Returns keyboard settings with the first size keys assigned."""
+    return {
+        key: {"path": files[i % len(files)], "label": f"Cue {i}", "startTime": 100, "stopTime": 1500}
+        for i, key in enumerate(keyboard._key_list[:size])
+    }
+
+
+def loadShow(show: Show, path: Path):
+    """Loads path including the refresh of the keys, which runs on the next event loop tick."""
+    show.load(path)
+    show.keyboard.updates.flush()
+
+
+def writeShow(path: Path, settings: dict) -> Path:
+    with path.open('w') as f_show:
+        f_show.write(ShowEncoder().encode({"version": "0.1.0", "keyboard": settings}))
+    return path
+
+
+
+# ########################################
+#               BENCHMARKS
+# ########################################
+def benchKeyboardInit(parent, files, directory, repeat) -> dict:
+    keyboards = []
+    results = {"keyboard_init": summarize(measure(
+        lambda: keyboards.append(Keyboard(parent, offline=True)), repeat,
+    ))}
+    for keyboard in keyboards:
+        keyboard.deleteLater()
+    return results
+
+
+def benchShowLoadSave(parent, files, directory, repeat) -> dict:
+    results = {}
+    show = Show(parent, offline=True)
+    for size in SHOW_SIZES:
+        path = writeShow(directory / f"show_{size}.SoundKey", showSettings(show.keyboard, files, size))
+
+        # Cold: the sample cache is emptied before every load
+        results[f"show_load_cold_{size}"] = summarize(measure(
+            lambda: loadShow(show, path), repeat, setup=show.new,
+        ))
+        results[f"show_load_warm_{size}"] = summarize(measure(lambda: loadShow(show, path), repeat))
+        results[f"show_save_{size}"] = summarize(measure(lambda: (show.save(), show.writer.waitForDone()), repeat))
+    return results
+
+
+def benchBundleLoad(parent, files, directory, repeat) -> dict:
+    show = Show(parent, offline=True)
+    size = SHOW_SIZES[-1]
+    show.load(writeShow(directory / f"bundle_{size}.SoundKey", showSettings(show.keyboard, files, size)))
+    path = directory / f"bundle_{size}{BUNDLE_SUFFIX}"
+    show._path = path
+    show.save()
+    show.writer.waitForDone()
+    # Cold: nothing is cached, the audio is only mapped
+    return {f"show_load_bundle_{size}": summarize(measure(lambda: loadShow(show, path), repeat, setup=show.new))}
+
+
+def benchJournal(parent, files, directory, repeat) -> dict:
+    show = Show(parent, offline=True)
+    size = SHOW_SIZES[-1]
+    path = writeShow(directory / f"journal_{size}.SoundKey", showSettings(show.keyboard, files, size))
+    show.load(path)
+    settings = show.engine.cue("a").getSettings()
+    # Time on the GUI thread for a single edit, the journal is written in the background
+    results = {"show_journal_edit": summarize(measure(
+        lambda: show.keyboard.updateSettings("a", settings), repeat,
+    ))}
+    show.writer.waitForDone()
+    results[f"show_load_journal_{size}"] = summarize(measure(
+        lambda: (show.load(path), show.writer.waitForDone()), repeat,
+    ))
+    return results
+
+
+def benchUpdateSettings(parent, files, directory, repeat) -> dict:
+    keyboard = Keyboard(parent, offline=True)
+    settings = showSettings(keyboard, files, len(keyboard._key_list))
+    keyboard.updateSettings(**settings)
+    return {
+        "keyboard_update_settings": summarize(measure(
+            lambda: (keyboard.updateSettings(**settings), keyboard.updates.flush()), repeat,
+        )),
+        "keyboard_update_single_key": summarize(measure(
+            lambda: keyboard.updateSettings("a", settings["a"]), repeat,
+        )),
+    }
+
+
+def benchBankSwitch(parent, files, directory, repeat) -> dict:
+    keyboard = Keyboard(parent, offline=True)
+    size = len(keyboard._key_list)
+    banks = [showSettings(keyboard, files[i:] + files[:i], size) for i in range(3)]
+    keyboard.engine.setBanks(banks)
+    keyboard.updateSettings(**banks[0])
+    # Let the neighbouring banks preload like during a show
+    for bank in (1, 2, 1):
+        keyboard.engine.setBank(bank)
+        keyboard.engine.preloadBanks()
+        keyboard.bankLoader._pool.waitForDone()
+        QApplication.processEvents()
+    operations = 100
+
+    def switches():
+        for i in range(operations):
+            keyboard.engine.setBank(i % 3)
+            keyboard.updates.flush()
+
+    return {"bank_switch": summarize(measure(switches, repeat), operations)}
+
+
+def benchPlayStop(parent, files, directory, repeat) -> dict:
+    keyboard = Keyboard(parent, offline=True)
+    keyboard.updateSettings(a={"path": files[0]})
+    key = keyboard.engine.cue("a")
+    operations = 1000
+
+    def roundTrips():
+        for _ in range(operations):
+            key.play()
+            keyboard.mixer.render(256)
+            key.stop()
+
+    return {"play_stop_roundtrip": summarize(measure(roundTrips, repeat), operations)}
+
+
+def benchToggleStorm(parent, files, directory, repeat) -> dict:
+    keyboard = Keyboard(parent, offline=True)
+    keyboard.updateSettings(**showSettings(keyboard, files, len(keyboard._key_list)))
+    keys = [keyboard.engine.cue(k) for k in keyboard._key_list]
+    operations = 2000
+    rng = random.Random(7)
+    sequence = [rng.choice(keys) for _ in range(operations)]
+
+    def storm():
+        for i, key in enumerate(sequence):
+            key.togglePlay()
+            if i % 16 == 0:
+                keyboard.mixer.render(256)
+        keyboard.mixer.stopAll()
+
+    return {"toggle_storm": summarize(measure(storm, repeat), operations)}
+
+
+def benchRetriggerStorm(parent, files, directory, repeat) -> dict:
+    keyboard = Keyboard(parent, offline=True)
+    settings = showSettings(keyboard, files, 8)
+    for values in settings.values():
+        values["retrigger"] = Cue.RETRIGGER_OVERLAP
+    keyboard.updateSettings(**settings)
+    keys = [keyboard.engine.cue(k) for k in settings]
+    operations = 2000
+    rng = random.Random(11)
+    sequence = [rng.choice(keys) for _ in range(operations)]
+
+    def storm():
+        # About 1000 triggers per second of rendered audio, the voice pool is full most of the time
+        for i, key in enumerate(sequence):
+            key.togglePlay()
+            if i % 10 == 0:
+                keyboard.mixer.render(512)
+        keyboard.mixer.stopAll()
+
+    return {"retrigger_storm": summarize(measure(storm, repeat), operations)}
+
+
+def benchMeters(parent, files, directory, repeat) -> dict:
+    keyboard = Keyboard(parent, offline=True)
+    names = keyboard._key_list[:Mixer.DEFAULT_POLYPHONY]
+    keyboard.updateSettings(**{name: {"path": files[i % len(files)]} for i, name in enumerate(names)})
+    keys = [keyboard.engine.cue(name) for name in names]
+    blocks = SAMPLE_RATE * Keyboard.METER_INTERVAL_MS // 1000 // Mixer.BLOCK_FRAMES
+
+    def render():
+        # What the sink pulls between two meter updates, keys which ended start again
+        for key in keys:
+            if not key.is_plaing:
+                key.play()
+        for _ in range(blocks):
+            keyboard.mixer.render(Mixer.BLOCK_FRAMES)
+
+    results = {f"meters_tick_{len(keys)}": summarize(measure(keyboard._updateMeters, repeat, setup=render))}
+    keyboard.mixer.stopAll()
+    return results
+
+
+def benchTimeStretch(parent, files, directory, repeat) -> dict:
+    samples = decodeFile(files[0])
+    return {
+        f"time_stretch_{rate}": summarize(measure(lambda: timeStretch(samples, rate), repeat))
+        for rate in (0.8, 1.25)
+    }
+
+
+def benchLoudness(parent, files, directory, repeat) -> dict:
+    # One file in this process, without the worker pool
+    return {"loudness_analyze_file": summarize(measure(lambda: analyzeFile(str(files[0])), repeat))}
+
+
+def benchLibrarySearch(parent, files, directory, repeat) -> dict:
+    # Rows are inserted directly, scanning as many files would dominate the suite
+    library = Library(path=directory / "library.sqlite")
+    rng = random.Random(17)
+    words = ("door", "slam", "whoosh", "crowd", "applause", "thunder", "rain", "bell", "phone", "step")
+    connection = library._connection()
+    with connection:
+        connection.executemany(
+            "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (f"/library/{i}.wav", "/library", f"{rng.choice(words)}/{rng.choice(words)}_{rng.choice(words)}_{i}.wav",
+                 1.0, 48000, 2, 100000, 0)
+                for i in range(LIBRARY_SIZE)
+            ),
+        )
+    results = {
+        f"library_search_{name}": summarize(measure(lambda: library.search(text), repeat))
+        for name, text in (("word", "thunder"), ("words", "rain bell 12"), ("none", "zzz"))
+    }
+    library.close()
+    return results
+
+
+BENCHMARKS = [
+    benchKeyboardInit,
+    benchShowLoadSave,
+    benchBundleLoad,
+    benchJournal,
+    benchUpdateSettings,
+    benchBankSwitch,
+    benchPlayStop,
+    benchToggleStorm,
+    benchRetriggerStorm,
+    benchMeters,
+    benchTimeStretch,
+    benchLoudness,
+    benchLibrarySearch,
+]
+
+
+
+# ########################################
+#               BASELINE
+# ########################################
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Prints results next to the baseline. Returns the names of slower benchmarks."""
+    failures = []
+    print(f"{'benchmark':32}{'median':>12}{'baseline':>12}{'change':>10}")
+    for name, result in results.items():
+        median = result["median_ms"]
+        base = baseline.get(name, {}).get("median_ms")
+        if base is None:
+            print(f"{name:32}{median:>9.3f} ms{'-':>12}{'new':>10}")
+            continue
+        change = median / base - 1 if base else 0.0
+        failed = change > tolerance
+        if failed:
+            failures.append(name)
+        print(f"{name:32}{median:>9.3f} ms{base:>9.3f} ms{change * 100:>+9.1f}%{'  SLOWER' if failed else ''}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the benchmark suite headless.")
+    parser.add_argument("--repeat", type=int, default=7, help="runs per benchmark")
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="baseline to compare with")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed relative slowdown")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as new baseline")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    parent = QWidget()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        files = writeWaves(directory, 8, 2.0)
+        for bench in BENCHMARKS:
+            results.update(bench(parent, files, directory, args.repeat))
+            app.processEvents()
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=4))
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(report, indent=4))
+        print(f"Stored baseline '{args.baseline}'")
+        return 0
+
+    if not args.baseline.is_file():
+        compare(results, {}, args.tolerance)
+        print(f"No baseline at '{args.baseline}', run with --update-baseline to store one")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())["results"]
+    failures = compare(results, baseline, args.tolerance)
+    if failures:
+        print(f"{len(failures)} benchmark(s) slower than the baseline by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# Measures the real-time factor of the time stretch with several keys stretched at once
+# and checks the peak memory of stretching one long key.
+# Run from the repository root:
+#   python -m benchmarks.timeStretchBenchmark [--keys 8] [--seconds 30] [--long-seconds 600]
+# Author 9qUmV4
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from core.sampleCache import CHANNELS, SAMPLE_RATE
+from core.timeStretch import timeStretch
+
+RATES = (0.5, 0.8, 1.25, 2.0)
+
+# Memory allowed on top of the padded input, its mono mix and the output
+MAX_PEAK_OVERHEAD = 16 * 2**20
+
+
+def tones(count: int, seconds: float) -> list[np.ndarray]:
+    """Returns count stereo tones with some noise, like the keys of a show."""
+    rng = np.random.default_rng(3)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    result = []
+    for i in range(count):
+        tone = 0.3 * np.sin(2 * np.pi * (220.0 + 20.0 * i) * t) + 0.05 * rng.standard_normal(len(t))
+        result.append(np.repeat(tone[:, None], CHANNELS, axis=1).astype(np.float32))
+    return result
+
+
+def stretchAll(samples: list[np.ndarray], rate: float, workers: int) -> float:
+    """Stretches all samples at once and returns the wall time in seconds."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda s: timeStretch(s, rate), samples))
+    return time.perf_counter() - start
+
+
+def peakMemory(seconds: float, rate: float) -> dict:
+    """Stretches seconds of int16 noise, like a long key from the sample cache, and returns the peak memory."""
+    rng = np.random.default_rng(5)
+    samples = (rng.standard_normal((int(seconds * SAMPLE_RATE), CHANNELS)) * 3000).astype(np.int16)
+    tracemalloc.start()
+    out = timeStretch(samples, rate)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # float32 padded input, float32 mono mix and the output
+    expected = samples.size * 4 + len(samples) * 4 + out.base.nbytes
+    return {"peak_bytes": peak, "expected_bytes": expected, "output_bytes": out.nbytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the real-time factor of the time stretch.")
+    parser.add_argument("--keys", type=int, default=8, help="number of keys stretched at once")
+    parser.add_argument("--seconds", type=float, default=30.0, help="length of every key")
+    parser.add_argument("--workers", type=int, default=4, help="threads stretching, like the show loader")
+    parser.add_argument("--long-seconds", type=float, default=600.0, help="length of the key checked for peak memory")
+    args = parser.parse_args()
+
+    samples = tones(args.keys, args.seconds)
+    audio = args.keys * args.seconds
+
+    results = {}
+    print(f"{args.keys} keys of {args.seconds} s, {args.workers} workers")
+    print(f"{'rate':>6}{'wall time':>12}{'real-time factor':>20}")
+    for rate in RATES:
+        wall = stretchAll(samples, rate, args.workers)
+        # Seconds of input audio processed per second of wall time
+        results[str(rate)] = {"wall_s": wall, "realtime_factor": audio / wall}
+        print(f"{rate:>6}{wall:>10.3f} s{audio / wall:>19.1f}x")
+
+    memory = {}
+    print(f"Peak memory stretching one key of {args.long_seconds:g} s")
+    print(f"{'rate':>6}{'output':>12}{'peak':>12}{'bound':>12}")
+    for rate in (0.5, 2.0):
+        r = memory[str(rate)] = peakMemory(args.long_seconds, rate)
+        print(
+            f"{rate:>6}{r['output_bytes'] / 2**20:>9.1f} MB{r['peak_bytes'] / 2**20:>9.1f} MB"
+            f"{(r['expected_bytes'] + MAX_PEAK_OVERHEAD) / 2**20:>9.1f} MB"
+        )
+    passed = all(r["peak_bytes"] <= r["expected_bytes"] + MAX_PEAK_OVERHEAD for r in memory.values())
+    print(json.dumps({"results": results, "memory": memory, "passed": passed}))
+    print("Peak memory within the bound" if passed else "Peak memory above the bound")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
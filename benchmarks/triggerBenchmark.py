@@ -0,0 +1,196 @@
+# Fires keys through the trigger server from a loopback client and measures the dispatch latency.
+# Run from the repository root:
+#   python -m benchmarks.triggerBenchmark [--rate 500] [--count 2000]
+# Author 9qUmV4
+
+import argparse
+import json
+import select
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from .fixtures import writeWaves
+
+# Received until executed on the GUI thread
+MAX_DISPATCH_P99_MS = 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the latency of keys fired over OSC and TCP.")
+    parser.add_argument("--rate", type=int, default=500, help="messages per second")
+    parser.add_argument("--count", type=int, default=2000, help="messages per protocol")
+    parser.add_argument("--keys", type=int, default=16, help="number of keys fired")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = measure(args, writeWaves(Path(directory), args.keys, 1.0))
+
+    print(f"{args.count} messages per protocol at {args.rate}/s on {args.keys} keys")
+    print(f"{'protocol':10}{'received':>10}{'dispatch p50':>15}{'dispatch p99':>15}{'round trip p50':>17}{'round trip p99':>17}")
+    for name, r in results.items():
+        print(
+            f"{name:10}{r['received']:>10}{r['dispatch_p50_ms']:>12.3f} ms{r['dispatch_p99_ms']:>12.3f} ms"
+            f"{r['rtt_p50_ms']:>14.3f} ms{r['rtt_p99_ms']:>14.3f} ms"
+        )
+    passed = all(
+        r["received"] == args.count and r["dispatch_p99_ms"] < MAX_DISPATCH_P99_MS for r in results.values()
+    )
+    print(json.dumps({"results": results, "passed": passed}))
+    print(
+        f"Dispatch p99 below {MAX_DISPATCH_P99_MS} ms" if passed
+        else f"Dispatch p99 above {MAX_DISPATCH_P99_MS} ms or messages lost"
+    )
+    return 0 if passed else 1
+
+
+def measure(args, files: list[Path]) -> dict:
+    """Runs the loopback client once per protocol while the event loop executes the commands."""
+    from PySide6.QtCore import QCoreApplication, QEventLoop, QTimer
+
+    from core.engine import Cue, Engine
+    from core.latency import LatencyRing
+    from core.triggerServer import TriggerServer
+
+    # Headless like on a backstage box
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    engine = Engine(offline=True)
+    names = engine.keys[:args.keys]
+    # Every play restarts the key and broadcasts its state, the client waits for it
+    engine.updateSettings(**{
+        name: {"path": path, "retrigger": Cue.RETRIGGER_RESTART} for name, path in zip(names, files)
+    })
+    for name in names:
+        engine.cue(name).play()
+    engine.mixer.polyphony = max(engine.mixer.polyphony, args.keys)
+    app.processEvents()
+
+    server = TriggerServer(engine)
+    oscPort, tcpPort = server.start("127.0.0.1", 0, 0)
+    results = {}
+    try:
+        for name, client in (("osc", OscClient(oscPort)), ("tcp", TcpClient(tcpPort))):
+            server.dispatch = LatencyRing(args.count)
+            rtts = []
+            thread = threading.Thread(target=lambda: rtts.extend(client.run(names, args.count, args.rate)))
+            thread.start()
+            # Commands wake the event loop like in the app, the timer only ends it
+            loop = QEventLoop()
+            timer = QTimer(interval=20)
+            timer.timeout.connect(lambda: thread.is_alive() or loop.quit())
+            timer.start()
+            loop.exec()
+            timer.stop()
+            thread.join()
+            client.close()
+            dispatch = server.dispatch.values()
+            rtts = np.array(rtts or [np.nan]) * 1000
+            results[name] = {
+                "received": int(np.count_nonzero(~np.isnan(rtts))),
+                "dispatch_p50_ms": float(np.percentile(dispatch, 50)),
+                "dispatch_p99_ms": float(np.percentile(dispatch, 99)),
+                "rtt_p50_ms": float(np.percentile(rtts, 50)),
+                "rtt_p99_ms": float(np.percentile(rtts, 99)),
+            }
+    finally:
+        server.stop()
+    return results
+
+
+
+# ########################################
+#               CLIENTS
+# ########################################
+class _Client:
+    """Sends play commands paced at rate and times each until its state broadcast arrives."""
+
+    TIMEOUT = 2.0
+
+    def run(self, names: list[str], count: int, rate: int) -> list[float]:
+        self.subscribe()
+        sent = deque()
+        rtts = []
+        interval = 1.0 / rate
+        due = time.perf_counter()
+        i = 0
+        while len(rtts) < count:
+            now = time.perf_counter()
+            if i < count and now >= due:
+                sent.append(now)
+                self.play(names[i % len(names)])
+                i += 1
+                due += interval
+            timeout = max(0.0, due - time.perf_counter()) if i < count else self.TIMEOUT
+            if not select.select([self.sock], [], [], timeout)[0]:
+                if i >= count:
+                    # Lost, stop waiting
+                    break
+                continue
+            for playing in self.states():
+                if playing and sent:
+                    rtts.append(time.perf_counter() - sent.popleft())
+        return rtts
+
+    def close(self):
+        self.sock.close()
+
+
+class OscClient(_Client):
+
+    def __init__(self, port: int) -> None:
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.connect(("127.0.0.1", port))
+
+    def subscribe(self):
+        from core.triggerServer import oscMessage
+        self.sock.send(oscMessage("/subscribe"))
+        # The pong passes the GUI thread, the subscription is registered by then
+        self.sock.send(oscMessage("/ping"))
+        self.sock.settimeout(self.TIMEOUT)
+        self.sock.recv(1024)
+
+    def play(self, name: str):
+        from core.triggerServer import oscMessage
+        self.sock.send(oscMessage(f"/key/{name}/play"))
+
+    def states(self):
+        from core.triggerServer import parseOsc
+        for address, args in parseOsc(self.sock.recv(1024)):
+            if address.endswith("/state"):
+                yield bool(args[0])
+
+
+class TcpClient(_Client):
+
+    def __init__(self, port: int) -> None:
+        self.sock = socket.create_connection(("127.0.0.1", port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._buffer = b""
+
+    def subscribe(self):
+        self.sock.sendall(b"subscribe\n")
+        self.sock.settimeout(self.TIMEOUT)
+        while b"\n" not in self._buffer:
+            self._buffer += self.sock.recv(4096)
+        self._buffer = self._buffer.split(b"\n", 1)[1]
+
+    def play(self, name: str):
+        self.sock.sendall(f"play {name}\n".encode())
+
+    def states(self):
+        self._buffer += self.sock.recv(65536)
+        *lines, self._buffer = self._buffer.split(b"\n")
+        for line in lines:
+            words = line.split()
+            if words and words[0] == b"state":
+                yield words[2] == b"1"
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+# Self-contained show file holding the settings and the decoded audio of every key.
+# Author 9qUmV4
+#
+# Layout:
+#   header        magic, version, length of the show JSON, length of the index JSON
+#   show JSON     the same dict a .SoundKey file holds
+#   index JSON    sample format and per key settings, offset and frame count
+#   data          samples of every key, uncompressed, each starting at an ALIGNMENT boundary
+
+import json
+import logging
+import mmap
+import os
+import struct
+from os import PathLike
+from pathlib import Path
+
+import numpy as np
+
+from .sampleCache import CHANNELS, SAMPLE_RATE, StreamSource
+
+log = logging.getLogger(__name__)
+
+
+MAGIC = b"SKBUNDLE"
+BUNDLE_VERSION = 1
+BUNDLE_SUFFIX = ".SoundKeyBundle"
+
+# Page size, so every key starts on its own page of the mapping
+ALIGNMENT = 4096
+
+_HEADER = struct.Struct("<8sIII")
+
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def isBundle(path: PathLike | str) -> bool:
+    """Returns True, if path is a show bundle."""
+    try:
+        with Path(path).open('rb') as f_bundle:
+            return f_bundle.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def writeBundle(path: PathLike | str, show: str, samples: dict[str, tuple[tuple, np.ndarray]]):
+    """
+    Writes a bundle with the encoded show and the samples of every key to path and syncs it to disk.
+    samples maps a key to (settings, samples) where settings are the arguments
+    of SampleCache.get the samples were created with.
+    Keys with the same settings share their samples.
+    Streamed samples are written chunk by chunk, they are never held in memory as a whole.
+    path is written in place, write to a temporary file and rename it to replace a bundle.
+    """
+    path = Path(path)
+    cues = {}
+    written = {}    # settings: (offset, samples)
+    offset = 0
+    for key, (settings, data) in samples.items():
+        source, startTime, stopTime, playbackRate = settings
+        settings = (str(source), int(startTime), int(stopTime), float(playbackRate))
+        if settings not in written:
+            written[settings] = (offset, data)
+            offset = _align(offset + len(data) * CHANNELS * data.dtype.itemsize)
+        cues[key] = {
+            "settings": list(settings),
+            "dtype": data.dtype.str,
+            "offset": written[settings][0],
+            "frames": len(data),
+        }
+
+    show = show.encode()
+    index = json.dumps({"sampleRate": SAMPLE_RATE, "channels": CHANNELS, "cues": cues}).encode()
+    start = _align(_HEADER.size + len(show) + len(index))
+
+    with path.open('wb') as f_bundle:
+        f_bundle.write(_HEADER.pack(MAGIC, BUNDLE_VERSION, len(show), len(index)))
+        f_bundle.write(show)
+        f_bundle.write(index)
+        end = start
+        for dataOffset, data in written.values():
+            f_bundle.seek(start + dataOffset)
+            if isinstance(data, StreamSource):
+                for chunk in data.chunks():
+                    f_bundle.write(chunk.data)
+            else:
+                f_bundle.write(np.ascontiguousarray(data).data)
+            end = f_bundle.tell()
+        f_bundle.truncate(end)
+        f_bundle.flush()
+        os.fsync(f_bundle.fileno())
+    log.info(f"Wrote bundle '{path}' with {len(cues)} keys and {len(written)} samples ({end} bytes)")
+
+
+
+# ########################################
+#               BUNDLE
+# ########################################
+class Bundle:
+    """
+    A show bundle mapped into memory.
+    Samples are read-only views of the mapping, nothing is read or copied
+    until the audio is played. The mapping stays open while any view exists.
+    """
+
+    def __init__(self, path: PathLike | str) -> None:
+        self.path = Path(path)
+        with self.path.open('rb') as f_bundle:
+            self._map = mmap.mmap(f_bundle.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"'{self.path}' is no show bundle")
+        magic, version, showLength, indexLength = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"'{self.path}' is no show bundle")
+        if version != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported bundle version {version}")
+
+        position = _HEADER.size
+        self.show = json.loads(self._map[position:position + showLength])
+        position += showLength
+        index = json.loads(self._map[position:position + indexLength])
+        if index["sampleRate"] != SAMPLE_RATE or index["channels"] != CHANNELS:
+            raise ValueError(
+                f"Bundle holds {index['channels']} channels at {index['sampleRate']} Hz, "
+                f"expected {CHANNELS} channels at {SAMPLE_RATE} Hz"
+            )
+        self._start = _align(position + indexLength)
+        self._cues: dict[str, dict] = index["cues"]
+        # Keys by the address of their samples, to find the settings of a view
+        address = np.frombuffer(self._map, dtype=np.uint8).ctypes.data
+        self._keys = {address + self._start + cue["offset"]: key for key, cue in self._cues.items() if cue["frames"]}
+
+
+    def keys(self) -> list[str]:
+        """Returns the keys holding audio."""
+        return list(self._cues)
+
+
+    def settings(self, key: str) -> tuple:
+        """Returns the arguments of SampleCache.get the samples of key were created with."""
+        path, startTime, stopTime, playbackRate = self._cues[key]["settings"]
+        return (Path(path), startTime, stopTime, playbackRate)
+
+
+    def samples(self, key: str) -> np.ndarray:
+        """Returns the samples of key as read-only view of the mapping."""
+        cue = self._cues[key]
+        dtype = np.dtype(cue["dtype"])
+        if cue["frames"] == 0:
+            return np.zeros((0, CHANNELS), dtype=dtype)
+        return np.frombuffer(
+            self._map, dtype=dtype, count=cue["frames"] * CHANNELS, offset=self._start + cue["offset"],
+        ).reshape(-1, CHANNELS)
+
+
+    def settingsOf(self, samples) -> tuple | None:
+        """Returns the settings of samples, None if they are no view of this bundle."""
+        if not isinstance(samples, np.ndarray) or samples.size == 0 or self._map.closed:
+            return None
+        key = self._keys.get(samples.ctypes.data)
+        return None if key is None else self.settings(key)
+
+
+    def close(self):
+        """
+        Unmaps the file, so it can be replaced. Every view must be dropped before,
+        else BufferError is raised and the mapping stays open.
+        """
+        self._map.close()
+
+
+
+class DetachedSamples:
+    """
+    Stands in for the samples of a bundle while its mapping is closed to replace the file.
+    Reads as silence of the same length, settings tell which samples of the new bundle replace it.
+    """
+
+    def __init__(self, settings: tuple, samples: np.ndarray) -> None:
+        self.settings = settings
+        self.dtype = samples.dtype
+        self.shape = samples.shape
+        self.nbytes = 0
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, index: slice) -> np.ndarray:
+        start, stop, _ = index.indices(len(self))
+        return np.zeros((max(stop - start, 0), CHANNELS), dtype=self.dtype)
@@ -0,0 +1,972 @@
+# Playback model of a show: the cues of every key and bank and the mixer playing them.
+# Only uses QtCore, so a show can run headless without any widget.
+# Author 9qUmV4
+
+import logging
+from os import PathLike
+from pathlib import Path
+
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+
+from .latency import LatencyTracker
+from .loudness import MAX_GAIN, MIN_GAIN, LoudnessAnalyzer, normalizationGain
+from .mixer import Mixer
+from .sampleCache import SampleCache, msToFrames
+from .showLoader import ShowLoader
+from .timeStretch import MAX_RATE, MIN_RATE
+
+log = logging.getLogger(__name__)
+
+
+
+KEYBOARD_LAYOUT = [
+    ["1", "2", "3", "4", "5", "6", "7", "8", "9", "0"],
+    ["q", "w", "e", "r", "t", "z", "u", "i", "o", "p", "ü", ],
+    ["a", "s", "d", "f", "g", "h", "j", "k", "l", "ö", "ä", ],
+    [None, "y", "x", "c", "v", "b", "n", "m", ",", ".", "-"],
+]
+
+
+
+def voiceId(key: str, bank: int) -> str:
+    """Returns the mixer voice of key in bank. Keys of the first bank play as their letter."""
+    return key if bank == 0 else f"{key}@{bank}"
+
+
+def splitVoice(voice: str) -> tuple[str, int]:
+    """Returns key and bank of a mixer voice."""
+    key, _, bank = voice.partition("@")
+    return key, int(bank or 0)
+
+
+
+# ########################################
+#               CUE
+# ########################################
+class Cue:
+    """
+    Settings and playback of one key, without any widget.
+    The keys of the GUI show and trigger their cue, see KeyButton.
+    """
+
+    END_OF_FILE_TIME = 0.0
+
+    DEFAULT_LABEL = ""
+    DEFAULT_PATH = Path()
+    DEFAULT_START_TIME = 0
+    DEFAULT_STOP_TIME = 0
+    DEFAULT_FADE_IN = 0
+    DEFAULT_FADE_OUT = 0
+    DEFAULT_PLAYBACK_RATE = 1.0
+    DEFAULT_GAIN = 0.0
+
+    # What triggering a playing key does: stop it, start it over or start it once more on top
+    RETRIGGER_TOGGLE = "toggle"
+    RETRIGGER_RESTART = "restart"
+    RETRIGGER_OVERLAP = "overlap"
+    RETRIGGER_MODES = (RETRIGGER_TOGGLE, RETRIGGER_RESTART, RETRIGGER_OVERLAP)
+    DEFAULT_RETRIGGER = RETRIGGER_TOGGLE
+
+
+
+    def __init__(
+        self,
+        key: str,
+        sampleCache: SampleCache,
+        mixer: Mixer,
+        latency: LatencyTracker,
+        ) -> None:
+
+        # Shown by at most one view, e.g. a KeyButton, told about changes through its methods
+        self.view = None
+
+        # Audio Output
+        # Samples come from the cache and are played by the shared mixer.
+        # Nothing is allocated for the key until it gets a playable file.
+        self._sampleCache = sampleCache
+        self._mixer = mixer
+        self._latency = latency
+        self._sample = None
+
+        # Argument parsing
+        self._key = key.lower()
+        self._bank = 0
+
+        # Set attributes to the defaults directly, the setters used by new()
+        # would log every setting of every key while the show is built
+        self._path = Cue.DEFAULT_PATH
+        self._label = Cue.DEFAULT_LABEL
+        self._startTime = Cue.DEFAULT_START_TIME
+        self._stopTime = Cue.DEFAULT_STOP_TIME
+        self._fadeIn = Cue.DEFAULT_FADE_IN
+        self._fadeOut = Cue.DEFAULT_FADE_OUT
+        self._playbackRate = Cue.DEFAULT_PLAYBACK_RATE
+        self._gain = Cue.DEFAULT_GAIN
+        self._gainFactor = 10 ** (Cue.DEFAULT_GAIN / 20)
+        self._retrigger = Cue.DEFAULT_RETRIGGER
+        self.__can_play = False
+
+
+
+
+    #  PROPERTIES
+    # ------------
+    # key
+    @property
+    def key(self) -> str:
+        """
+        The letter of the key stored as string. 
+        This attribute is read only, because the key must be set when initalizing.
+        """
+        return self._key
+
+    # bank
+    @property
+    def bank(self) -> int:
+        """Index of the bank the settings of the key belong to. Set by bind."""
+        return self._bank
+
+    # voice
+    @property
+    def voice(self) -> str:
+        """
+        The mixer voice of the key in its bank. Playback and latency are tracked per voice,
+        so a key keeps playing when the bank is switched.
+        """
+        return voiceId(self._key, self._bank)
+
+    # label
+    @property
+    def label(self) -> str:
+        """The label of the key. Stored as string. Defaults to ''."""
+        return self._label
+
+    @label.setter
+    def label(self, new: str):
+        log.debug(f"Setting label of key '{self.key}' to '{new}'")
+        self._label = new
+        if self.view is not None:
+            self.view.labelChanged()
+
+    # path
+    @property
+    def path(self) -> Path:
+        """
+        The path to the media file. 
+        Accepts any PathLike or string and returns a pathlib.Path. Defaults to Path().
+        """
+        return self._path
+    
+    @path.setter
+    def path(self, new: PathLike | str):
+        new = Path(new)
+        log.debug(f"Setting path of key '{self.key}' to '{new}'")
+        self._path = new
+        self._setSample(None)
+        self._can_play = new.is_file()
+
+    # _can_play
+    @property
+    def _can_play(self) -> bool:
+        """Check, if the file is playable."""
+        return self.__can_play
+    
+    @_can_play.setter
+    def _can_play(self, new: bool):
+        self.__can_play = new
+        if self.view is not None:
+            self.view.playableChanged()
+
+    # can_play
+    @property
+    def can_play(self) -> bool:
+        """Returns True, if the file exists or samples are loaded."""
+        return self.__can_play
+
+    # sample
+    @property
+    def sample(self):
+        """The samples played on the next trigger or None, if they are not loaded yet."""
+        return self._sample
+
+    # is_plaing
+    @property
+    def is_plaing(self) -> bool:
+        """Returns True, if playing a media file else False."""
+        return self._mixer.isPlaying(self.voice)
+
+    # startTime
+    @property
+    def startTime(self) -> int:
+        """
+        Controls where to start on the media file. 
+        Holds the start time in milliseconds. Must be a int greater or equal to 0.
+        Defaults to 0, the start of the media file.
+        """
+        return self._startTime
+
+    @startTime.setter
+    def startTime(self, new: int):
+        if isinstance(new, int):
+            if new >= 0:
+                log.debug(f"Setting start time of key '{self.key}' to '{new}' ms.")
+                self._startTime = new
+            else:
+                log.error(f"Start time must be a positive int.")
+        else:
+            log.error(f"Start time must be a positive int.")
+
+
+    # stopTime
+    @property
+    def stopTime(self) -> int:
+        """
+        Controls when to stop the playback.
+        Must be a int in milliseconds greater or equal to 0 where 0 means end of file.
+        Defaults to 0.
+        """
+        return self._stopTime
+
+    @stopTime.setter
+    def stopTime(self, new: int):
+        if isinstance(new, int):
+            if new >= 0:
+                log.debug(f"Setting stop time of key '{self.key}' to '{new}' ms.")
+                self._stopTime = new
+            else:
+                log.error(f"Stop time must be a positive int or 0 for end of file.")
+        else:
+            log.error(f"Stop time must be a positive int or 0 for end of file.")
+
+
+    # fadeIn
+    @property
+    def fadeIn(self) -> int:
+        """
+        Duration of the fade in when starting, in milliseconds.
+        Must be a int greater or equal to 0 where 0 means no fade. Defaults to 0.
+        """
+        return self._fadeIn
+
+    @fadeIn.setter
+    def fadeIn(self, new: int):
+        if isinstance(new, int) and new >= 0:
+            log.debug(f"Setting fade in of key '{self.key}' to '{new}' ms.")
+            self._fadeIn = new
+        else:
+            log.error(f"Fade in must be a positive int or 0 for no fade.")
+
+
+    # fadeOut
+    @property
+    def fadeOut(self) -> int:
+        """
+        Duration of the fade out when stopped with the fade modifier, in milliseconds.
+        Must be a int greater or equal to 0 where 0 means no fade. Defaults to 0.
+        """
+        return self._fadeOut
+
+    @fadeOut.setter
+    def fadeOut(self, new: int):
+        if isinstance(new, int) and new >= 0:
+            log.debug(f"Setting fade out of key '{self.key}' to '{new}' ms.")
+            self._fadeOut = new
+        else:
+            log.error(f"Fade out must be a positive int or 0 for no fade.")
+
+
+    # playbackRate
+    @property
+    def playbackRate(self) -> float:
+        """
+        Speed the file is played at, keeping its pitch. 1.0 is the original speed.
+        Must be a number between MIN_RATE and MAX_RATE. Defaults to 1.0.
+        """
+        return self._playbackRate
+
+    @playbackRate.setter
+    def playbackRate(self, new: float):
+        if isinstance(new, (int, float)) and MIN_RATE <= new <= MAX_RATE:
+            log.debug(f"Setting playback rate of key '{self.key}' to '{new}'.")
+            self._playbackRate = float(new)
+        else:
+            log.error(f"Playback rate must be a number between {MIN_RATE} and {MAX_RATE}.")
+
+
+    # gain
+    @property
+    def gain(self) -> float:
+        """
+        Gain in dB the key is played with, e.g. the normalization gain of its file.
+        Must be a number between MIN_GAIN and MAX_GAIN. Defaults to 0.0.
+        """
+        return self._gain
+
+    @gain.setter
+    def gain(self, new: float):
+        if isinstance(new, (int, float)) and MIN_GAIN <= new <= MAX_GAIN:
+            log.debug(f"Setting gain of key '{self.key}' to '{new}' dB.")
+            self._gain = float(new)
+            # Converted here, the trigger only passes it on
+            self._gainFactor = 10 ** (self._gain / 20)
+        else:
+            log.error(f"Gain must be a number between {MIN_GAIN} and {MAX_GAIN} dB.")
+
+
+    # retrigger
+    @property
+    def retrigger(self) -> str:
+        """
+        What triggering the key while it plays does, one of RETRIGGER_MODES.
+        Defaults to RETRIGGER_TOGGLE, stopping the key.
+        """
+        return self._retrigger
+
+    @retrigger.setter
+    def retrigger(self, new: str):
+        if new in Cue.RETRIGGER_MODES:
+            log.debug(f"Setting retrigger of key '{self.key}' to '{new}'.")
+            self._retrigger = new
+        else:
+            log.error(f"Retrigger must be one of {', '.join(Cue.RETRIGGER_MODES)}.")
+
+
+
+
+    #  METHODES
+    # ----------
+    def play(self) -> bool:
+        """
+        Trys to start playing. Returns True and plays when possible, else returns False.
+        A playing key starts over or plays once more on top, depending on retrigger.
+        """
+        self._latency.mark(self.voice, "play")
+        if self._can_play:
+            if self._retrigger != Cue.RETRIGGER_TOGGLE or not self.is_plaing:
+                if self._sample is None:
+                    self.loadSample()
+                    if self._sample is None:
+                        self._latency.cancel(self.voice)
+                        return False
+                log.info(f"Key '{self.key}' starts playing (file: '{self.path}')")
+                return self._mixer.start(
+                    self.voice, self._sample, msToFrames(self.fadeIn), msToFrames(self.fadeOut),
+                    overlap=self._retrigger == Cue.RETRIGGER_OVERLAP, gain=self._gainFactor,
+                )
+            else:
+                log.warning(f"Key '{self.key}' is already playing")
+        else:
+            log.warning(f"Key '{self.key}' cannot play because no file to play is given")
+        self._latency.cancel(self.voice)
+        return False
+
+
+    def stop(self, fade: bool = False):
+        """
+        Trys to stop playing. Returns True if suceccfull and False, if not.
+        With fade the key fades out over fadeOut before it stops.
+        """
+        if self._mixer.stop(self.voice, fade):
+            log.info(f"Key '{self.key}' {'fades out' if fade and self.fadeOut else 'stopped playing'}")
+            return True
+        else:
+            log.warning(f"Key '{self.key}' cannot stop playing, nothing is playing")
+            return False
+
+    def loadSample(self):
+        """
+        Fetches the samples between startTime and stopTime at the playback rate from the sample cache.
+        The file is decoded and stretched here, if it is not cached yet.
+        Cached samples, e.g. from a show bundle, play even if the file is gone.
+        """
+        settings = self.sampleSettings()
+        if not self._can_play and not self._sampleCache.contains(*settings):
+            self._setSample(None)
+            return
+        sample = self._sampleCache.get(*settings)
+        if sample is None:
+            log.error(f"Key '{self.key}' cannot play, decoding '{self.path}' failed")
+        self._can_play = sample is not None
+        self._setSample(sample)
+
+
+    def sampleSettings(self) -> tuple:
+        """Returns the arguments of SampleCache.get for the samples of this key."""
+        return (self.path, self.startTime, self.stopTime, self.playbackRate)
+
+
+    @staticmethod
+    def sampleSettingsOf(settings: dict) -> tuple:
+        """Returns the arguments of SampleCache.get for settings as returned by getSettings."""
+        path = settings.get("path", Cue.DEFAULT_PATH)
+        return (
+            path if isinstance(path, Path) else Path(path),
+            settings.get("startTime", Cue.DEFAULT_START_TIME),
+            settings.get("stopTime", Cue.DEFAULT_STOP_TIME),
+            settings.get("playbackRate", Cue.DEFAULT_PLAYBACK_RATE),
+        )
+
+
+    def sampleKey(self) -> tuple | None:
+        """Returns the sample cache key of the loaded samples or None."""
+        if self._sample is None:
+            return None
+        return SampleCache.entryKey(*self.sampleSettings())
+
+
+    def _setSample(self, sample):
+        """Sets the samples played on the next trigger."""
+        if self._sample is sample:
+            return
+        self._mixer.stop(self.voice)
+        self._sample = sample
+        if sample is not None:
+            # First playable key creates the audio output
+            self._mixer.prepare()
+        if self.view is not None:
+            self.view.sampleChanged()
+
+
+    def togglePlay(self, fade: bool = False):
+        """
+        Toggles playing. With fade a playing key fades out.
+        Keys retriggering by restart or overlap only stop with fade, else they play again.
+        """
+        if self.is_plaing and (fade or self._retrigger == Cue.RETRIGGER_TOGGLE):
+            self._latency.cancel(self.voice)
+            self.stop(fade)
+        else:
+            self.play()
+
+
+    def trigger(self, fade: bool = False):
+        """Toggles like a click on the key and starts the latency measurement."""
+        self._latency.trigger(self.voice)
+        self.togglePlay(fade)
+
+
+    def updateSettings(
+        self,
+        *,
+        path = DEFAULT_PATH,
+        label = DEFAULT_LABEL,
+        startTime = DEFAULT_START_TIME,
+        stopTime = DEFAULT_STOP_TIME,
+        fadeIn = DEFAULT_FADE_IN,
+        fadeOut = DEFAULT_FADE_OUT,
+        playbackRate = DEFAULT_PLAYBACK_RATE,
+        gain = DEFAULT_GAIN,
+        retrigger = DEFAULT_RETRIGGER,
+        load = True,
+        **kwargs):
+        """
+        Updates the object according to given settings.
+        If settings are not given, uses the defaults.
+        With load=False the file is neither checked nor decoded,
+        the key stays unplayable until setLoadedSample is called.
+        """
+        if load:
+            self.path = path
+        else:
+            self._path = Path(path)
+            self._setSample(None)
+            self._can_play = False
+        self.label = label
+        self.startTime = startTime
+        self.stopTime = stopTime
+        self.fadeIn = fadeIn
+        self.fadeOut = fadeOut
+        self.playbackRate = playbackRate
+        self.gain = gain
+        self.retrigger = retrigger
+        if load:
+            self.loadSample()
+
+
+    def setLoadedSample(self, settings: tuple, sample):
+        """
+        Takes samples loaded in the background for settings as returned by sampleSettings.
+        They are dropped, if the settings changed in the meantime.
+        """
+        if SampleCache.entryKey(*settings) != SampleCache.entryKey(*self.sampleSettings()):
+            log.debug(f"Dropping outdated samples for key '{self.key}'")
+            return
+        self._can_play = sample is not None
+        self._setSample(sample)
+
+
+    def bind(self, bank: int, settings: dict, sample):
+        """
+        Shows the key with settings of another bank, as returned by getSettings.
+        sample are the preloaded samples or None, then they are loaded on the first play.
+        Nothing is checked, decoded or logged, so switching banks stays fast.
+        A voice still playing from the previous bank keeps playing.
+        """
+        self._bank = bank
+        path = settings.get("path", Cue.DEFAULT_PATH)
+        self._path = path if isinstance(path, Path) else Path(path)
+        self._label = settings.get("label", Cue.DEFAULT_LABEL)
+        self._startTime = settings.get("startTime", Cue.DEFAULT_START_TIME)
+        self._stopTime = settings.get("stopTime", Cue.DEFAULT_STOP_TIME)
+        self._fadeIn = settings.get("fadeIn", Cue.DEFAULT_FADE_IN)
+        self._fadeOut = settings.get("fadeOut", Cue.DEFAULT_FADE_OUT)
+        self._playbackRate = settings.get("playbackRate", Cue.DEFAULT_PLAYBACK_RATE)
+        self._retrigger = settings.get("retrigger", Cue.DEFAULT_RETRIGGER)
+        self._gain = settings.get("gain", Cue.DEFAULT_GAIN)
+        self._gainFactor = 10 ** (self._gain / 20)
+        self._sample = sample
+        self._can_play = sample is not None or self._path != Cue.DEFAULT_PATH
+        if self.view is not None:
+            self.view.bound()
+
+
+    def getSettings(self):
+        """Returns attributes changeble by the user as a dict."""
+        return {
+            "path": self.path,
+            "label": self.label,
+            "startTime": self.startTime,
+            "stopTime": self.stopTime,
+            "fadeIn": self.fadeIn,
+            "fadeOut": self.fadeOut,
+            "playbackRate": self.playbackRate,
+            "gain": self.gain,
+            "retrigger": self.retrigger,
+        }
+
+    def new(self):
+        """Sets everything to default values."""
+        self.path = Cue.DEFAULT_PATH
+        self.label = Cue.DEFAULT_LABEL
+        self.startTime = Cue.DEFAULT_START_TIME
+        self.stopTime = Cue.DEFAULT_STOP_TIME
+        self.fadeIn = Cue.DEFAULT_FADE_IN
+        self.fadeOut = Cue.DEFAULT_FADE_OUT
+        self.playbackRate = Cue.DEFAULT_PLAYBACK_RATE
+        self.gain = Cue.DEFAULT_GAIN
+        self.retrigger = Cue.DEFAULT_RETRIGGER
+
+
+
+# ########################################
+#               ENGINE
+# ########################################
+class Engine(QObject):
+    """
+    Cues of every key and bank, their samples and the mixer playing them, without any widget.
+    The GUI shows an engine with a Keyboard, headless the cues are triggered over the network or stdin.
+    """
+
+    # Signals
+    settingsChanged = Signal(
+        int,    # bank
+        str,    # key
+        dict,   # settings
+    )
+    bankChanged = Signal(
+        int,    # bank
+        int,    # number of banks
+    )
+
+    def __init__(self, parent: QObject = None, offline: bool = False) -> None:
+        """With offline=True the mixer has no audio output and is rendered by the caller."""
+        super().__init__(parent)
+
+        # Set attributes
+        self._lastDir = Path()
+        self.sampleCache = SampleCache()
+        self.latency = LatencyTracker()
+        self.mixer = Mixer(self, offline=offline, latency=self.latency)
+        self.loader = ShowLoader(self.sampleCache, self)
+        self.loudness = LoudnessAnalyzer(self)
+
+        # Banks: settings of every bank by key, the cues hold the current bank.
+        # Samples of the current and the neighbouring banks are preloaded.
+        self._banks: list[dict[str, dict]] = [{}]
+        self._bank = 0
+        self._bankSamples: dict[int, dict[str, tuple]] = {}
+        self._mappedSamples: dict[str, tuple] = {}
+        self.bankLoader = ShowLoader(self.sampleCache, self)
+
+        # Cache entries of playing voices by voice, they stay pinned until the voice ends
+        self._playingEntries: dict[str, tuple] = {}
+        self._pinTimer = QTimer(self)
+        self._pinTimer.setSingleShot(True)
+        self._pinTimer.timeout.connect(self._pinSampleCache)
+
+        self._keys = [char for row in KEYBOARD_LAYOUT for char in row if char is not None]
+        self._cues = {
+            char: Cue(char, self.sampleCache, self.mixer, self.latency) for char in self._keys
+        }
+
+        self.mixer.voiceStateChanged.connect(self._voiceStateChanged)
+        self.loader.batchLoaded.connect(self._applyLoadedBatch)
+        self.loader.finished.connect(self._pinSampleCache)
+        self.loader.finished.connect(self.preloadBanks)
+        self.bankLoader.batchLoaded.connect(self._applyBankBatch)
+        self.bankLoader.finished.connect(self._pinSampleCache)
+        self.loudness.analyzed.connect(self._applyLoudness)
+
+
+    #  CUES
+    # ------
+    @property
+    def keys(self) -> list[str]:
+        """The keys in the order of the keyboard layout."""
+        return self._keys
+
+
+    def cue(self, key: str) -> Cue:
+        """Returns the cue of key. Raises KeyError for keys not on the keyboard."""
+        return self._cues[key]
+
+
+    @property
+    def lastDir(self) -> Path:
+        """Directory of the file set last, file dialogs start there."""
+        return self._lastDir
+
+
+    @Slot(str, bool)
+    def _voiceStateChanged(self, voice, playing):
+        """Remembers the cache entry of a playing voice, pinning follows outside the trigger."""
+        key, bank = splitVoice(voice)
+        if playing:
+            if bank == self._bank:
+                settings = self._cues[key].sampleSettings()
+            else:
+                settings = Cue.sampleSettingsOf(self._banks[bank].get(key, {}))
+            self._playingEntries[voice] = SampleCache.entryKey(*settings)
+        elif self._playingEntries.pop(voice, None) is None:
+            return
+        self._pinTimer.start(0)
+
+
+    def setShowPath(self, showPath):
+        """Stores the loudness next to the show file at showPath."""
+        self.loudness.setShowPath(showPath)
+
+
+    @Slot()
+    def analyzeLoudness(self):
+        """
+        Measures the loudness of every file of every bank in the background.
+        Each key gets the normalization gain of its file, once the file is measured.
+        """
+        paths = {
+            Cue.sampleSettingsOf(settings)[0]
+            for keys in self.getBanks() for settings in keys.values()
+        }
+        self.loudness.analyze(path for path in paths if not path == Path())
+
+
+    @Slot(str, dict)
+    def _applyLoudness(self, path, loudness):
+        """Sets the normalization gain of all keys playing the file at path."""
+        gain = normalizationGain(loudness)
+        log.info(f"'{path}' measures {loudness['integrated']} LUFS, normalization gain {gain} dB")
+        for k in self._keys:
+            key = self._cues[k]
+            if str(key.path) == path and key.gain != gain:
+                key.gain = gain
+                self.settingsChanged.emit(self._bank, k, key.getSettings())
+        for bank, keys in enumerate(self._banks):
+            if bank == self._bank:
+                continue
+            for k, settings in keys.items():
+                if str(settings.get("path", Cue.DEFAULT_PATH)) == path and settings.get("gain") != gain:
+                    settings["gain"] = gain
+                    self.settingsChanged.emit(bank, k, settings)
+
+
+    def getSettings(self):
+        """Returns the settings of every key of the current bank."""
+        return {key: self._cues[key].getSettings() for key in self._keys}
+
+
+    def getSamples(self) -> dict:
+        """
+        Returns {voice: (settings, samples)} for every key of every bank with a file,
+        settings being the arguments of SampleCache.get. Nothing is decoded, samples are
+        those mapped from the show bundle or None, SampleCache.get returns them in the background.
+        """
+        samples = {}
+        for bank, keys in enumerate(self.getBanks()):
+            for k, values in keys.items():
+                settings = Cue.sampleSettingsOf(values)
+                if settings[0] == Path():
+                    continue
+                voice = voiceId(k, bank)
+                mapped = self._mappedSamples.get(voice)
+                if mapped is not None and SampleCache.entryKey(*mapped[0]) == SampleCache.entryKey(*settings):
+                    samples[voice] = mapped
+                else:
+                    samples[voice] = (settings, None)
+        return samples
+
+
+    def replaceSamples(self, replace, done=None):
+        """
+        Replaces the samples held by the keys, the banks, the sample cache and the playing voices
+        by replace(samples), unless it returns None. The voices keep playing at their position.
+        done is called once the audio thread took the new ones, see Mixer.replaceSamples.
+        """
+        def replaced(samples):
+            new = replace(samples) if samples is not None else None
+            return samples if new is None else new
+
+        for key in self._cues.values():
+            key._sample = replaced(key._sample)
+        for samples in (self._mappedSamples, *self._bankSamples.values()):
+            for k, (settings, sample) in samples.items():
+                samples[k] = (settings, replaced(sample))
+        self.sampleCache.replace(replace)
+        self.mixer.replaceSamples(replace, done)
+
+
+    #  BANKS
+    # -------
+    @property
+    def bank(self) -> int:
+        """Index of the bank the keys show."""
+        return self._bank
+
+    @property
+    def bankCount(self) -> int:
+        return len(self._banks)
+
+
+    def getBanks(self) -> list[dict]:
+        """Returns the settings of every bank, empty banks at the end are left out."""
+        self._banks[self._bank] = self.getSettings()
+        banks = list(self._banks)
+        while len(banks) > 1 and Engine._isEmptyBank(banks[-1]):
+            banks.pop()
+        return banks
+
+
+    @staticmethod
+    def _isEmptyBank(bank: dict) -> bool:
+        return all(
+            Path(settings.get("path", Cue.DEFAULT_PATH)) == Path() and not settings.get("label")
+            for settings in bank.values()
+        )
+
+
+    def setBanks(self, banks: list[dict], mappedSamples: dict = None):
+        """
+        Replaces all banks and shows the first one. The keys are only rebound,
+        apply the settings of the first bank with one of the updateSettings methods.
+        mappedSamples are samples by voice, like getSamples returns, that stay available,
+        e.g. mapped from a show bundle.
+        """
+        self.bankLoader.cancel()
+        # Paths are converted once here, switching banks compares them often
+        self._banks = [
+            {k: {**settings, "path": Path(settings.get("path", Cue.DEFAULT_PATH))} for k, settings in bank.items()}
+            for bank in banks
+        ] or [{}]
+        self._bankSamples = {}
+        self._mappedSamples = dict(mappedSamples or {})
+        self._bank = 0
+        for k in self._keys:
+            self._cues[k].bind(0, self._banks[0].get(k, {}), None)
+        self.bankChanged.emit(self._bank, len(self._banks))
+
+
+    @Slot(int)
+    def setBank(self, bank: int):
+        """
+        Shows bank on the keys, a bank after the last one is created empty.
+        Only rebinds the keys, audio not preloaded yet is loaded in the background.
+        Banks further behind are refused.
+        """
+        if bank == self._bank or bank < 0:
+            return
+        if bank > len(self._banks):
+            log.error(f"Bank {bank + 1} does not exist, there are {len(self._banks)} banks")
+            return
+        # Keep the current bank, including its samples, for switching back
+        self._banks[self._bank] = self.getSettings()
+        current = self._bankSamples[self._bank] = {}
+        for k in self._keys:
+            key = self._cues[k]
+            if key._sample is not None:
+                current[k] = (key.sampleSettings(), key._sample)
+        if bank == len(self._banks):
+            self._banks.append({})
+
+        self._bank = bank
+        samples = self._bankSamples.get(bank, {})
+        for k in self._keys:
+            key = self._cues[k]
+            settings = self._banks[bank].get(k, {})
+            loaded = samples.get(k) or self._mappedSamples.get(voiceId(k, bank))
+            if loaded is not None and loaded[0] == Cue.sampleSettingsOf(settings):
+                key.bind(bank, settings, loaded[1])
+            else:
+                key.bind(bank, settings, None)
+        log.info(f"Switched to bank {bank + 1} of {len(self._banks)}")
+        self.bankChanged.emit(self._bank, len(self._banks))
+
+        # Pinning and preloading follow, once the switch is shown
+        QTimer.singleShot(0, self.preloadBanks)
+        self._pinTimer.start(0)
+
+
+    @Slot()
+    def nextBank(self):
+        self.setBank(self._bank + 1)
+
+
+    @Slot()
+    def previousBank(self):
+        self.setBank(self._bank - 1)
+
+
+    @Slot()
+    def preloadBanks(self):
+        """
+        Loads the samples of the current bank's keys still missing them and
+        of the previous and next bank in the background. Samples of other banks are dropped.
+        """
+        keep = {b for b in (self._bank - 1, self._bank, self._bank + 1) if 0 <= b < len(self._banks)}
+        for bank in list(self._bankSamples):
+            if bank not in keep:
+                del self._bankSamples[bank]
+
+        requests = {}
+        if not self.loader.is_loading:
+            for k in self._keys:
+                key = self._cues[k]
+                if key._sample is None and not key.path == Path():
+                    requests[(self._bank, k)] = key.sampleSettings()
+
+        for bank in keep - {self._bank}:
+            loaded = self._bankSamples.setdefault(bank, {})
+            for k, values in self._banks[bank].items():
+                settings = Cue.sampleSettingsOf(values)
+                entry = SampleCache.entryKey(*settings)
+                if settings[0] == Path() or (k in loaded and SampleCache.entryKey(*loaded[k][0]) == entry):
+                    continue
+                mapped = self._mappedSamples.get(voiceId(k, bank))
+                if mapped is not None and SampleCache.entryKey(*mapped[0]) == entry:
+                    loaded[k] = mapped
+                    continue
+                requests[(bank, k)] = settings
+
+        if requests:
+            self.bankLoader.load(requests)
+
+
+    @Slot(list)
+    def _applyBankBatch(self, batch):
+        """Stores preloaded samples and hands those of the current bank to their keys."""
+        for (bank, k), settings, sample in batch:
+            if bank == self._bank:
+                self._cues[k].setLoadedSample(settings, sample)
+            elif sample is not None and bank in self._bankSamples:
+                self._bankSamples[bank][k] = (settings, sample)
+
+
+    @Slot(str, dict)
+    @Slot(str, dict, dict)
+    @Slot(dict)
+    def updateSettings(self, key=None, values=None, **kwargs):
+        """Updates the settings accordingly"""
+        for k, v in kwargs.items():
+            self._cues[k].updateSettings(**v)
+            self._updateLastDir(v)
+        if key is not None:
+            if values is not None:
+                self._cues[key].updateSettings(**values)
+                self._updateLastDir(values)
+                self.settingsChanged.emit(self._bank, key, self._cues[key].getSettings())
+            else:
+                raise SyntaxError("Setting key and value without the other is not allowed")
+        self._pinSampleCache()
+
+
+    def updateSettingsWithSamples(self, samples: dict, **kwargs):
+        """
+        Updates the settings like updateSettings. Keys in samples, mapping a key
+        to (settings, samples) like getSamples, take them without checking or decoding their file.
+        """
+        for k, v in kwargs.items():
+            key = self._cues[k]
+            key.updateSettings(**v, load=False)
+            if k in samples and SampleCache.entryKey(*samples[k][0]) == SampleCache.entryKey(*key.sampleSettings()):
+                key.setLoadedSample(*samples[k])
+            else:
+                # Settings changed since the samples were stored
+                key.updateSettings(**v)
+            self._updateLastDir(v)
+        self._pinSampleCache()
+
+
+    def updateSettingsAsync(self, **kwargs):
+        """
+        Updates the settings like updateSettings, but checks and decodes 
+        the files in the background. Keys become playable one by one.
+        Progress is reported by the loader signals.
+        """
+        requests = {}
+        for k, v in kwargs.items():
+            key = self._cues[k]
+            key.updateSettings(**v, load=False)
+            self._updateLastDir(v)
+            if not key.path == Path():
+                requests[k] = key.sampleSettings()
+        self.loader.load(requests)
+
+
+    @Slot(list)
+    def _applyLoadedBatch(self, batch):
+        """Hands samples loaded in the background to their keys."""
+        for k, settings, sample in batch:
+            self._cues[k].setLoadedSample(settings, sample)
+
+
+    def _updateLastDir(self, values):
+        """Remembers the directory of the path in values for the file dialog."""
+        try:
+            path = Path(values["path"])
+            if not path == Path():
+                self._lastDir = path.parent
+        except KeyError:
+            pass
+
+
+    def new(self):
+        """Sets everything to default values."""
+        self.loader.cancel()
+        self.loudness.cancel()
+        self.setBanks([{}])
+        for k in self._keys:
+            self._cues[k].new()
+        self.mixer.release()
+        self._playingEntries.clear()
+        self.sampleCache.clear()
+        self._pinSampleCache()
+
+
+    def _pinSampleCache(self):
+        """
+        Pins the samples of the current and the neighbouring banks, of the show bundle
+        and of playing voices. Other samples stay cached, until the budget is exceeded.
+        """
+        keys = [
+            SampleCache.entryKey(*self._cues[k].sampleSettings())
+            for k in self._keys
+            if not self._cues[k].path == Path()
+        ]
+        for bank in (self._bank - 1, self._bank + 1):
+            if 0 <= bank < len(self._banks):
+                keys.extend(
+                    SampleCache.entryKey(*Cue.sampleSettingsOf(settings))
+                    for settings in self._banks[bank].values()
+                )
+        keys.extend(SampleCache.entryKey(*settings) for settings, _ in self._mappedSamples.values())
+        keys.extend(self._playingEntries.values())
+        self.sampleCache.pin(keys)
+        log.info(f"Sample cache: {self.sampleCache.report()}")
@@ -0,0 +1,84 @@
+# Plays a show without any window, its cues are triggered over stdin, OSC or TCP.
+# Author 9qUmV4
+
+import argparse
+import logging
+import signal
+import sys
+from pathlib import Path
+
+from PySide6.QtCore import QCoreApplication, QTimer
+
+from .show import Show
+from .triggerServer import DEFAULT_HOST, DEFAULT_OSC_PORT, DEFAULT_TCP_PORT, TriggerServer
+
+log = logging.getLogger(__name__)
+
+# Python only runs signal handlers between bytecodes, a timer lets it handle Ctrl+C
+SIGNAL_POLL_MS = 200
+
+
+def isHeadless(argv: list[str]) -> bool:
+    """Returns True, if argv asks for the headless mode."""
+    return any(arg == "--headless" or arg.startswith("--headless=") for arg in argv)
+
+
+def main(argv: list[str]) -> int:
+    """Runs 'SoundKey2.py --headless show.SoundKey' with a QCoreApplication only. Returns the exit code."""
+    parser = argparse.ArgumentParser(
+        prog="SoundKey2.py", description="Plays a show without any window, cues are triggered over stdin, OSC or TCP."
+    )
+    parser.add_argument("--headless", metavar="SHOW", type=Path, required=True, help="show file or bundle to play")
+    parser.add_argument(
+        "--listen", nargs="?", const=DEFAULT_HOST, metavar="HOST",
+        help=f"also listen for OSC and TCP on HOST (default {DEFAULT_HOST})",
+    )
+    parser.add_argument("--osc-port", type=int, default=DEFAULT_OSC_PORT, help="UDP port for OSC, 0 disables it")
+    parser.add_argument("--tcp-port", type=int, default=DEFAULT_TCP_PORT, help="TCP port for lines, 0 disables it")
+    parser.add_argument("--no-stdin", action="store_true", help="do not read commands from stdin")
+    args, qt_args = parser.parse_known_args(argv)
+
+    app = QCoreApplication(sys.argv[:1] + qt_args)
+    app.setOrganizationName("9qUmV4")
+    app.setApplicationName("SoundKey2")
+
+    show = Show()
+    try:
+        show.load(args.headless)
+    except (OSError, ValueError) as e:
+        log.error(f"Could not open the show '{args.headless}': {e}")
+        return 1
+    engine = show.engine
+    engine.mixer.prepare()
+
+    # Without --listen the server only executes the lines read from stdin
+    server = TriggerServer(engine)
+    listen = args.listen is not None
+    try:
+        server.start(
+            args.listen or DEFAULT_HOST,
+            args.osc_port or None if listen else None,
+            args.tcp_port or None if listen else None,
+        )
+    except OSError as e:
+        log.error(f"Could not start the trigger server on {args.listen}: {e}")
+        return 1
+    server.quitRequested.connect(app.quit)
+    if not args.no_stdin:
+        server.readStdin()
+
+    signal.signal(signal.SIGINT, lambda *_: app.quit())
+    signalTimer = QTimer()
+    signalTimer.timeout.connect(lambda: None)
+    signalTimer.start(SIGNAL_POLL_MS)
+
+    log.info(f"Playing '{args.headless}' headless, {engine.bankCount} banks")
+    exit_code = app.exec()
+
+    server.stop()
+    engine.mixer.release()
+    # Let a save of the journal still running finish
+    show.writer.waitForDone()
+    engine.loudness.shutdown()
+    log.info(f"Headless playback ended with code {exit_code}")
+    return exit_code
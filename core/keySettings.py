@@ -7,12 +7,27 @@ from os import PathLike
 from pathlib import Path
 
 from PySide6.QtCore import Signal, Slot
-from PySide6.QtWidgets import QDialog, QFileDialog, QWidget
+from PySide6.QtWidgets import QDialog, QFileDialog, QHBoxLayout, QVBoxLayout, QWidget
 from ui.uic.ui_keySettingsDialog import Ui_Dialog
 
+from .library import Library
+from .libraryPicker import LibraryPicker
+from .loudness import MAX_GAIN, MIN_GAIN
+from .timeStretch import MAX_RATE, MIN_RATE
+from .waveform import WaveformCache
+from .waveView import WaveView
+
 log = logging.getLogger(__name__)
 
 
+# Shown for the retrigger modes of KeyButton
+RETRIGGER_TEXTS = {
+    "toggle": "Stop",
+    "restart": "Start over",
+    "overlap": "Play on top",
+}
+
+
 class KeySettingsDialog(QDialog):
     # Propterties
     _file_path = Path('')
@@ -27,22 +42,33 @@ class KeySettingsDialog(QDialog):
             parent: QWidget, 
             key: str,
             lastDir: Path,
+            waveforms: WaveformCache,
+            library: Library,
             *,
             path: Path,
             label: str,
             startTime: int,
             stopTime: int,
+            fadeIn: int,
+            fadeOut: int,
+            playbackRate: float,
+            retrigger: str,
+            gain: float,
         ) -> None:
         
         super().__init__(parent)
 
-        # self._decoder = QAudioDecoder(self)
+        self._waveforms = waveforms
 
         self.ui = Ui_Dialog()
         self.ui.setupUi(self)
-        # layout = QHBoxLayout(self.ui.waveViewHolder)
-        # self.ui.waveView = WaveView()
-        # layout.addWidget(self.ui.waveView)
+        layout = QHBoxLayout(self.ui.waveViewHolder)
+        self.ui.waveView = WaveView(self.ui.waveViewHolder)
+        layout.addWidget(self.ui.waveView)
+        layout = QVBoxLayout(self.ui.libraryHolder)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.ui.libraryPicker = LibraryPicker(self.ui.libraryHolder, library)
+        layout.addWidget(self.ui.libraryPicker)
 
         # Title
         self.setWindowTitle(f"Settings for key {key.upper()}")
@@ -59,7 +85,30 @@ class KeySettingsDialog(QDialog):
         self.ui.stopTimeDoubleSpinBox.setSuffix(" s")
         self.ui.stopTimeDoubleSpinBox.setSpecialValueText("END")
 
+        for spinBox in (self.ui.fadeInDoubleSpinBox, self.ui.fadeOutDoubleSpinBox):
+            spinBox.setDecimals(3)
+            spinBox.setRange(0.0, 600.0) # Set max to 10 min
+            spinBox.setSingleStep(0.5)
+            spinBox.setSuffix(" s")
+            spinBox.setSpecialValueText("OFF")
+
+        self.ui.playbackRateDoubleSpinBox.setDecimals(2)
+        self.ui.playbackRateDoubleSpinBox.setRange(MIN_RATE, MAX_RATE)
+        self.ui.playbackRateDoubleSpinBox.setSingleStep(0.05)
+        self.ui.playbackRateDoubleSpinBox.setSuffix(" x")
+
+        self.ui.gainDoubleSpinBox.setDecimals(1)
+        self.ui.gainDoubleSpinBox.setRange(MIN_GAIN, MAX_GAIN)
+        self.ui.gainDoubleSpinBox.setSingleStep(0.5)
+        self.ui.gainDoubleSpinBox.setSuffix(" dB")
+
+        for mode, text in RETRIGGER_TEXTS.items():
+            self.ui.retriggerComboBox.addItem(text, mode)
+
         self._update_path.connect(self.ui.pathDisplay.setText)
+        self._waveforms.peaksReady.connect(self._peaksReady)
+        self.ui.startTimeDoubleSpinBox.valueChanged.connect(self._updateWaveWindow)
+        self.ui.stopTimeDoubleSpinBox.valueChanged.connect(self._updateWaveWindow)
 
         self.lastDir = lastDir
 
@@ -68,18 +117,26 @@ class KeySettingsDialog(QDialog):
         self.label = label
         self.startTime = startTime
         self.stopTime = stopTime
+        self.fadeIn = fadeIn
+        self.fadeOut = fadeOut
+        self.playbackRate = playbackRate
+        self.retrigger = retrigger
+        self.gain = gain
         
         self.ui.selectFileButton.clicked.connect(self.selectFile)
+        self.ui.libraryPicker.fileSelected.connect(self.selectLibraryFile)
         self.accepted.connect(self.dialogAccepted)
-    #     self._decoder.bufferReady.connect(self.readBuffer())
 
 
-    # def readBuffer(self):
-    #     buf = self._decoder.read()
-    #     print("Format: \t", buf.format())
-    #     print("Lenght: \t", buf.duration() * (10**-6), "s")
-    #     print("data: \t", type(buf.data()))
-    #     print("constData: \t", type(buf.constData()))
+    @Slot(str)
+    def _peaksReady(self, path):
+        if path == str(self.path):
+            self.ui.waveView.setPyramid(self._waveforms.get(self.path))
+
+
+    @Slot()
+    def _updateWaveWindow(self):
+        self.ui.waveView.setWindow(self.startTime, self.stopTime)
 
     
     def selectFile(self):
@@ -103,6 +160,14 @@ class KeySettingsDialog(QDialog):
             self.path = file_path
 
 
+    @Slot(str)
+    def selectLibraryFile(self, path: str):
+        """Takes a file picked from the library. A label empty or naming the previous file becomes its name."""
+        if self.label == "" or self.label == self.path.stem:
+            self.label = Path(path).stem
+        self.path = path
+
+
     @Slot()
     def dialogAccepted(self):
         self.dialog_accepted.emit(
@@ -112,6 +177,11 @@ class KeySettingsDialog(QDialog):
                 "label": self.label,
                 "startTime": self.startTime,
                 "stopTime": self.stopTime,
+                "fadeIn": self.fadeIn,
+                "fadeOut": self.fadeOut,
+                "playbackRate": self.playbackRate,
+                "retrigger": self.retrigger,
+                "gain": self.gain,
             }
         )
         
@@ -132,8 +202,7 @@ class KeySettingsDialog(QDialog):
     def path(self, new_path: PathLike):
         new_path = Path(new_path)
         self._file_path = new_path
-        # self._decoder.setSource(QUrl.fromLocalFile(str(self.path)))
-        # self._decoder.start()
+        self.ui.waveView.setPyramid(self._waveforms.get(new_path))
         self._update_path.emit(str(self._file_path))
 
 
@@ -162,3 +231,48 @@ class KeySettingsDialog(QDialog):
     @stopTime.setter
     def stopTime(self, new: int):
         self.ui.stopTimeDoubleSpinBox.setValue(new / 1000)
+
+
+    @property
+    def fadeIn(self) -> int:
+        return int(self.ui.fadeInDoubleSpinBox.value() * 1000)
+
+    @fadeIn.setter
+    def fadeIn(self, new: int):
+        self.ui.fadeInDoubleSpinBox.setValue(new / 1000)
+
+
+    @property
+    def fadeOut(self) -> int:
+        return int(self.ui.fadeOutDoubleSpinBox.value() * 1000)
+
+    @fadeOut.setter
+    def fadeOut(self, new: int):
+        self.ui.fadeOutDoubleSpinBox.setValue(new / 1000)
+
+
+    @property
+    def playbackRate(self) -> float:
+        return round(self.ui.playbackRateDoubleSpinBox.value(), 2)
+
+    @playbackRate.setter
+    def playbackRate(self, new: float):
+        self.ui.playbackRateDoubleSpinBox.setValue(new)
+
+
+    @property
+    def retrigger(self) -> str:
+        return self.ui.retriggerComboBox.currentData()
+
+    @retrigger.setter
+    def retrigger(self, new: str):
+        self.ui.retriggerComboBox.setCurrentIndex(self.ui.retriggerComboBox.findData(new))
+
+
+    @property
+    def gain(self) -> float:
+        return round(self.ui.gainDoubleSpinBox.value(), 1)
+
+    @gain.setter
+    def gain(self, new: float):
+        self.ui.gainDoubleSpinBox.setValue(new)
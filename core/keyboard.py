@@ -1,275 +1,120 @@
-
 import logging
-from os import PathLike
-from pathlib import Path
+import math
 
-from PySide6.QtCore import Qt, QUrl, Signal, Slot
-from PySide6.QtGui import QMouseEvent, QShortcut
-from PySide6.QtMultimedia import QAudioOutput, QMediaPlayer
+from PySide6.QtCore import QLineF, QRectF, Qt, QTimer, Signal, Slot
+from PySide6.QtGui import QColor, QGuiApplication, QMouseEvent, QPainter, QPaintEvent, QShortcut
 from PySide6.QtWidgets import QFrame, QGridLayout, QPushButton, QWidget
 
-from .keySettings import KeySettingsDialog
+from .engine import KEYBOARD_LAYOUT, Cue, Engine, splitVoice
+from .library import Library
+from .updateScheduler import UpdateScheduler
+from .waveform import PeakPyramid, WaveformCache
+from .waveView import drawPeaks, peakLines
 
 log = logging.getLogger(__name__)
 
 
-KEYBOARD_LAYOUT = [
-    ["1", "2", "3", "4", "5", "6", "7", "8", "9", "0"],
-    ["q", "w", "e", "r", "t", "z", "u", "i", "o", "p", "ü", ],
-    ["a", "s", "d", "f", "g", "h", "j", "k", "l", "ö", "ä", ],
-    [None, "y", "x", "c", "v", "b", "n", "m", ",", ".", "-"],
-]
-
-
 
 # ########################################
 #               KEYBUTTON
 # ########################################
 class KeyButton:
+    """
+    Shows a cue as button and triggers it by click or shortcut.
+    Changes of the cue reach the button through the update scheduler of the keyboard.
+    """
 
-    END_OF_FILE_TIME = 0.0
-
-    DEFAULT_LABEL = ""
-    DEFAULT_PATH = Path()
-    DEFAULT_START_TIME = 0
-    DEFAULT_STOP_TIME = 0
-    
-
+    # Held while triggering, stops the key with its fade out
+    FADE_STOP_MODIFIER = Qt.ShiftModifier
 
 
     def __init__(
-        self, 
-        parent: QWidget, 
-        key: str,
+        self,
+        parent: QWidget,
+        cue: Cue,
+        waveforms: WaveformCache,
+        updates: UpdateScheduler,
         ) -> None:
-        
-        # UI
+
+        self.cue = cue
+        self._waveforms = waveforms
+        self._updates = updates
+
+        # UI, changed through the update scheduler of the keyboard
         self.ui = PushButton(parent)
         self.ui.setProperty("keyboardButton", True)
-        
-        # Audio Output
-        self._audioOutput = QAudioOutput()
-        self._audioOutput.setVolume(1.0) # TODO
-
-        self._player = QMediaPlayer()
-        self._player.setAudioOutput(self._audioOutput)
-        
-        # Argument parsing
-        self._key = key.lower()
-        
-        # Set attributes
-        self.new()
-        self._can_play = False
+        self.ui.setText(f"{cue.key.upper()}\n{cue.label}")
 
         # Keyboard Shortcut
-        self._shortcut = QShortcut(self.key, parent)
-
-        # Connectors UI
-        self._player.playbackStateChanged.connect(self.ui._updateButtonColor)
+        self._shortcut = QShortcut(cue.key, parent)
+        # Shift turns digits and punctuation into other characters depending on the layout,
+        # e.g. 1 into ! on German keyboards, so only letters fade by shortcut, the others by Shift+click
+        self._fadeShortcut = QShortcut(f"Shift+{cue.key}", parent) if cue.key.isalpha() else None
 
         # Connectors function
-        self.ui.clicked.connect(self.togglePlay)
-        self._shortcut.activated.connect(self.togglePlay)
+        self.ui.clicked.connect(self._triggered)
+        self._shortcut.activated.connect(self._triggered)
+        if self._fadeShortcut is not None:
+            self._fadeShortcut.activated.connect(self._fadeTriggered)
         self.ui.left_duble_click.connect(self._openSettingsDialog)
-        self._player.positionChanged.connect(self._auto_stop)
 
+        cue.view = self
+        if cue.can_play:
+            # Shown for an engine which already has a show
+            self.playableChanged()
 
 
+    #  CUE
+    # -----
+    def labelChanged(self):
+        self._updates.setText(self.ui, f"{self.cue.key.upper()}\n{self.cue.label}")
 
-    #  PROPERTIES
-    # ------------
-    # key
-    @property
-    def key(self) -> str:
-        """
-        The letter of the key stored as string. 
-        This attribute is read only, because the key must be set when initalizing.
-        """
-        return self._key
-
-    # label
-    @property
-    def label(self) -> str:
-        """The label of the key. Stored as string. Defaults to ''."""
-        return self._label
-
-    @label.setter
-    def label(self, new: str):
-        log.debug(f"Setting label of key '{self.key}' to '{new}'")
-        self._label = new
-        self.ui.setText(f"{self.key.upper()}\n{new}")
-
-    # path
-    @property
-    def path(self) -> Path:
-        """
-        The path to the media file. 
-        Accepts any PathLike or string and returns a pathlib.Path. Defaults to Path().
-        """
-        return self._path
-    
-    @path.setter
-    def path(self, new: PathLike | str):
-        new = Path(new)
-        log.debug(f"Setting path of key '{self.key}' to '{new}'")
-        self._path = new
-        if new.is_file():
-            self._can_play = True
-            self._player.setSource(QUrl.fromLocalFile(str(new)))
-        else:
-            self._can_play = False
-            self._player.setSource(QUrl())
-
-    # _can_play
-    @property
-    def _can_play(self) -> bool:
-        """Check, if the file is playable."""
-        return self.__can_play
-    
-    @_can_play.setter
-    def _can_play(self, new: bool):
-        self.__can_play = new
-        self.ui.setCheckable(new)
-        self.ui.setProperty("fileNotPlayable", not new)
-        self.ui.style().unpolish(self.ui)
-        self.ui.style().polish(self.ui)
-
-    # is_plaing
-    @property
-    def is_plaing(self) -> bool:
-        """Returns True, if playing a media file else False."""
-        if self._player.playbackState() == QMediaPlayer.PlaybackState.PlayingState:
-            return True
-        else:
-            False
 
-    # startTime
-    @property
-    def startTime(self) -> int:
-        """
-        Controls where to start on the media file. 
-        Holds the start time in milliseconds. Must be a int greater or equal to 0.
-        Defaults to 0, the start of the media file.
-        """
-        return self._startTime
-
-    @startTime.setter
-    def startTime(self, new: int):
-        if isinstance(new, int):
-            if new >= 0:
-                log.debug(f"Setting start time of key '{self.key}' to '{new}' ms.")
-                self._startTime = new
-            else:
-                log.error(f"Start time must be a positive int.")
-        else:
-            log.error(f"Start time must be a positive int.")
+    def playableChanged(self):
+        # The button is repolished once per refresh, however often this is called
+        self._updates.setPlayable(self.ui, self.cue.can_play)
 
 
-    # stopTime
-    @property
-    def stopTime(self) -> int:
-        """
-        Controls when to stop the playback.
-        Must be a int in milliseconds greater or equal to 0 where 0 means end of file.
-        Defaults to 0.
-        """
-        return self._stopTime
-
-    @stopTime.setter
-    def stopTime(self, new: int):
-        if isinstance(new, int):
-            if new >= 0:
-                log.debug(f"Setting stop time of key '{self.key}' to '{new}' ms.")
-                self._stopTime = new
-            else:
-                log.error(f"Stop time must be a positive int or 0 for end of file.")
-        else:
-            log.error(f"Stop time must be a positive int or 0 for end of file.")
+    def sampleChanged(self):
+        self.updateWaveform()
 
 
+    def bound(self):
+        """The cue shows another bank."""
+        self.labelChanged()
+        self._updates.setChecked(self.ui, self.cue.is_plaing)
+        self.ui.setProgress(None)
+        self.ui.setLevels(None, None)
 
 
     #  METHODES
     # ----------
-    def play(self) -> bool:
-        """Trys to start playing. Returns True and plays when possible, else returns False."""
-        if self._can_play:
-            if not self.is_plaing:
-                log.info(f"Key '{self.key}' starts playing (file: '{self.path}')")
-                self._player.setPosition(self.startTime)
-                self._player.play()
-                return True
-            else:
-                log.warning(f"Key '{self.key}' is already playing")
-        else:
-            log.warning(f"Key '{self.key}' cannot play because no file to play is given")
-            return False
+    def updateWaveform(self):
+        """Shows the peaks of the played part on the button, once they are computed."""
+        cue = self.cue
+        if cue.sample is None:
+            self.ui.setWaveform(None)
+            return
+        self.ui.setWaveform(self._waveforms.get(cue.path), cue.startTime, cue.stopTime)
 
 
-    def stop(self):
-        """Trys to stop playing. Returns True if suceccfull and False, if not."""
-        if self.is_plaing:
-            self._player.stop()
-            log.info(f"Key '{self.key}' stopped playing")
-            return True
-        else:
-            log.warning(f"Key '{self.key}' cannot stop playing, nothing is playing")
-            return False
-
-    def _auto_stop(self, time):
-        """Stops the media, if media position is over stopTime."""
-        if not self.stopTime == KeyButton.END_OF_FILE_TIME:
-            if time >= self.stopTime:
-                self.stop()
+    @Slot()
+    def _triggered(self):
+        """Called by the shortcut and clicks."""
+        fade = bool(QGuiApplication.keyboardModifiers() & KeyButton.FADE_STOP_MODIFIER)
+        self.cue.trigger(fade)
 
 
-    def togglePlay(self):
-        """Toggles playing."""
-        if self.is_plaing:
-            self.stop()
-        else:
-            self.play()
+    @Slot()
+    def _fadeTriggered(self):
+        """Called by the shortcut with the fade modifier."""
+        self.cue.trigger(fade=True)
 
 
-    def updateSettings(
-        self,
-        *,
-        path = DEFAULT_PATH,
-        label = DEFAULT_LABEL,
-        startTime = DEFAULT_START_TIME,
-        stopTime = DEFAULT_STOP_TIME,
-        **kwargs):
-        """
-        Updates the object according to given settings.
-        If settings are not given, uses the defaults.
-        """
-        self.path = path
-        self.label = label
-        self.startTime = startTime
-        self.stopTime = stopTime
-
-
-    def getSettings(self):
-        """Returns attributes changeble by the user as a dict."""
-        return {
-            "path": self.path,
-            "label": self.label,
-            "startTime": self.startTime,
-            "stopTime": self.stopTime
-        }
-
-    def new(self):
-        """Sets everything to default values."""
-        self.path = KeyButton.DEFAULT_PATH
-        self.label = KeyButton.DEFAULT_LABEL
-        self.startTime = KeyButton.DEFAULT_START_TIME
-        self.stopTime = KeyButton.DEFAULT_STOP_TIME
-        
-
     @Slot()
     def _openSettingsDialog(self):
         """Opens the Settings Dialog."""
-        self.ui.openSettingsDialog.emit(self.key, self.getSettings())
+        self.ui.openSettingsDialog.emit(self.cue.key, self.cue.getSettings())
 
 
 
@@ -285,6 +130,21 @@ class PushButton(QPushButton):
         dict,   # settings
     )
 
+    # Colors of the waveform and playhead overlay
+    WAVE_COLOR = QColor(255, 255, 255, 50)
+    PLAYHEAD_COLOR = QColor("#eeeeee")
+
+    # Progress bar along the bottom edge and level meter along the right edge
+    PROGRESS_HEIGHT = 3
+    PROGRESS_COLOR = QColor(255, 255, 255, 120)
+    METER_WIDTH = 4
+    METER_COLOR = QColor(255, 255, 255, 160)
+    PEAK_COLOR = QColor("#eeeeee")
+    CLIP_COLOR = QColor("#e02020")
+    # Lowest level shown by the meter and peak level drawn as clipping, in dBFS
+    METER_FLOOR_DB = -60.0
+    CLIP_DB = -1.0
+
     #  METHODES
     # ----------
     def __init__(self, parent: QWidget) -> None:
@@ -292,11 +152,109 @@ class PushButton(QPushButton):
         
         self.setFocusPolicy(Qt.NoFocus)
 
+        self._pyramid = None
+        self._window = (0, 0)
+        self._lines = None      # peakLines, built again when the waveform or size changes
+        self._progress = None
+        self._levels = None     # (peak, rms) as meter heights between 0.0 and 1.0
+        self._clipping = False
+
+        # Set before the first polish, so unplayable keys need no repolish at startup
+        self.setProperty("fileNotPlayable", True)
+
+
+    def _updateButtonColor(self, playing: bool):
+        self.setChecked(playing)
+
+
+    def setPlayable(self, playable: bool) -> bool:
+        """Shows the button playable or not. Returns True, if it had to be repolished."""
+        if self.property("fileNotPlayable") == (not playable):
+            return False
+        self.setCheckable(playable)
+        self.setProperty("fileNotPlayable", not playable)
+        self.style().unpolish(self)
+        self.style().polish(self)
+        return True
+
+
+    def setWaveform(self, pyramid: PeakPyramid | None, startTime: int = 0, stopTime: int = 0):
+        """Sets the peaks drawn behind the label, None draws nothing."""
+        self._pyramid = pyramid
+        self._window = (startTime, stopTime)
+        self._lines = None
+        self.update()
 
-    def _updateButtonColor(self, newState):
-        self.setChecked(newState == QMediaPlayer.PlaybackState.PlayingState)
+
+    def setProgress(self, progress: float | None):
+        """Sets the playhead position between 0.0 and 1.0, None hides it."""
+        if progress == self._progress:
+            return
+        self._progress = progress
+        self.update()
+
+
+    def setLevels(self, peak: float | None, rms: float | None):
+        """Sets the linear peak and RMS level shown by the meter, None hides it."""
+        if peak is None:
+            levels = None
+        else:
+            # Rounded to the steps the meter can show, unchanged levels cause no repaint
+            levels = (round(PushButton.meterHeight(peak), 2), round(PushButton.meterHeight(rms), 2))
+            self._clipping = peak >= 10 ** (PushButton.CLIP_DB / 20)
+        if levels == self._levels:
+            return
+        self._levels = levels
+        self.update()
+
+
+    @staticmethod
+    def meterHeight(level: float) -> float:
+        """Returns the height of a linear level on the meter between 0.0 and 1.0."""
+        if level <= 0.0:
+            return 0.0
+        db = 20 * math.log10(level)
+        return min(max(1.0 - db / PushButton.METER_FLOOR_DB, 0.0), 1.0)
     
 
+    #  EVENTS
+    # --------
+    def resizeEvent(self, event) -> None:
+        self._lines = None
+        return super().resizeEvent(event)
+
+
+    def paintEvent(self, event: QPaintEvent) -> None:
+        super().paintEvent(event)
+        if self._pyramid is None and self._progress is None and self._levels is None:
+            return
+
+        painter = QPainter(self)
+        rect = QRectF(self.rect()).adjusted(2, 2, -2, -2)
+        if self._pyramid is not None:
+            if self._lines is None:
+                self._lines = peakLines(rect, *self._pyramid.columns(int(rect.width()), *self._window))
+            drawPeaks(painter, self._lines, PushButton.WAVE_COLOR)
+        if self._progress is not None:
+            x = rect.left() + self._progress * rect.width()
+            painter.setPen(PushButton.PLAYHEAD_COLOR)
+            painter.drawLine(QLineF(x, rect.top(), x, rect.bottom()))
+            painter.fillRect(
+                QRectF(rect.left(), rect.bottom() - PushButton.PROGRESS_HEIGHT, x - rect.left(), PushButton.PROGRESS_HEIGHT),
+                PushButton.PROGRESS_COLOR,
+            )
+        if self._levels is not None:
+            peak, rms = self._levels
+            meter = QRectF(rect.right() - PushButton.METER_WIDTH, rect.top(), PushButton.METER_WIDTH, rect.height())
+            painter.fillRect(
+                QRectF(meter.left(), meter.bottom() - rms * meter.height(), meter.width(), rms * meter.height()),
+                PushButton.METER_COLOR,
+            )
+            y = meter.bottom() - peak * meter.height()
+            painter.setPen(PushButton.CLIP_COLOR if self._clipping else PushButton.PEAK_COLOR)
+            painter.drawLine(QLineF(meter.left(), y, meter.right(), y))
+
+
     #  EVENTS
     # --------
     def mouseDoubleClickEvent(self, event: QMouseEvent) -> None:
@@ -305,78 +263,152 @@ class PushButton(QPushButton):
         return super().mouseDoubleClickEvent(event)
 
 
+
 # ########################################
 #               KEYBOARD
 # ########################################
-
 class Keyboard(QFrame):
-    def __init__(self, parent) -> None:
+    """
+    Shows the cues of an engine as a grid of buttons laid out like the keyboard.
+    Switching banks, editing and analyzing are done by the engine.
+    """
+
+    # Refresh interval of the playheads and level meters, about 30 Hz
+    METER_INTERVAL_MS = 33
+
+    # Shortcuts switching banks
+    NEXT_BANK_SHORTCUT = "PgDown"
+    PREVIOUS_BANK_SHORTCUT = "PgUp"
+
+    def __init__(self, parent, offline: bool = False, engine: Engine = None) -> None:
+        """
+        Shows engine, by default a new one. With offline=True the mixer of
+        the new engine has no audio output and is rendered by the caller.
+        """
         super(Keyboard, self).__init__(parent=parent)
+        self.engine = engine if engine is not None else Engine(self, offline=offline)
+
+        # Shared with the engine
+        self.sampleCache = self.engine.sampleCache
+        self.latency = self.engine.latency
+        self.mixer = self.engine.mixer
+        self.loader = self.engine.loader
+        self.bankLoader = self.engine.bankLoader
+        self.loudness = self.engine.loudness
+        self._key_list = self.engine.keys
+
+        # Only needed to show and edit the keys
+        self.waveforms = WaveformCache(self)
+        self.library = Library(self)
+        self.updates = UpdateScheduler(self)
+
+        # One timer moves the playheads and level meters of all playing keys
+        self._meterTimer = QTimer(self)
+        self._meterTimer.setInterval(Keyboard.METER_INTERVAL_MS)
+        self._meterTimer.timeout.connect(self._updateMeters)
 
         # Generate Keyboard
         layout = QGridLayout(self)
-        self._key_list = []
-
-        # Set attributes
-        self._lastDir = Path()
-
         for row_i, row in enumerate(KEYBOARD_LAYOUT):
             for char_i, char in enumerate(row):
                 if char is not None:
-                    setattr(self, f'key_{char}', KeyButton(self, char))
-                    key: KeyButton = getattr(self, f'key_{char}')
+                    key = KeyButton(self, self.engine.cue(char), self.waveforms, self.updates)
+                    setattr(self, f'key_{char}', key)
                     layout.addWidget(key.ui, row_i, char_i)
-                    self._key_list.append(char)
 
                     # KeySettingsDialog
                     key.ui.openSettingsDialog.connect(self.openSettingsDialog)
 
         self.setLayout(layout)
 
+        self.mixer.voiceStateChanged.connect(self._voiceStateChanged)
+        self.engine.bankChanged.connect(self._bankChanged)
+        self.waveforms.peaksReady.connect(self._peaksReady)
+
+        self._nextBankShortcut = QShortcut(Keyboard.NEXT_BANK_SHORTCUT, self)
+        self._nextBankShortcut.activated.connect(self.engine.nextBank)
+        self._previousBankShortcut = QShortcut(Keyboard.PREVIOUS_BANK_SHORTCUT, self)
+        self._previousBankShortcut.activated.connect(self.engine.previousBank)
+
+
+    @Slot(str, bool)
+    def _voiceStateChanged(self, voice, playing):
+        """Updates the button of the voice, when the mixer starts or ends it."""
+        if playing and not self._meterTimer.isActive():
+            self._meterTimer.start()
+        key, bank = splitVoice(voice)
+        if bank != self.engine.bank:
+            # Played from another bank, its button shows other settings now
+            return
+        button = getattr(self, f'key_{key}').ui
+        self.updates.setChecked(button, playing)
+        if not playing:
+            button.setProgress(None)
+            button.setLevels(None, None)
 
-    def getSettings(self):
-        return {key: getattr(self, f'key_{key}').getSettings() for key in self._key_list}
+
+    @Slot()
+    def _updateMeters(self):
+        """Moves the playheads and level meters of all playing keys of the current bank."""
+        if self.mixer.voiceCount == 0:
+            self._meterTimer.stop()
+            return
+        for voice, (progress, peak, rms) in self.mixer.meters().items():
+            key, bank = splitVoice(voice)
+            if bank != self.engine.bank:
+                continue
+            button = getattr(self, f'key_{key}').ui
+            button.setProgress(progress)
+            if peak is not None:
+                button.setLevels(peak, rms)
+
+
+    @Slot(int, int)
+    def _bankChanged(self, bank, count):
+        # Waveforms follow, once the switch is shown
+        QTimer.singleShot(0, self._updateWaveforms)
+
+
+    def _updateWaveforms(self):
+        for k in self._key_list:
+            getattr(self, f'key_{k}').updateWaveform()
+
+
+    @Slot(str)
+    def _peaksReady(self, path):
+        """Hands computed peaks to every key playing the file."""
+        for k in self._key_list:
+            key: KeyButton = getattr(self, f'key_{k}')
+            if str(key.cue.path) == path:
+                key.updateWaveform()
+
+
+    def setShowPath(self, showPath):
+        """Stores waveform peaks and loudness next to the show file at showPath."""
+        self.waveforms.setShowPath(showPath)
+        self.engine.setShowPath(showPath)
 
 
     @Slot(str, dict)
     @Slot(str, dict, dict)
     @Slot(dict)
     def updateSettings(self, key=None, values=None, **kwargs):
-        """Updates the settings accordingly"""
-        for k, v in kwargs.items():
-            getattr(self, f'key_{k}').updateSettings(**v)
-            try:
-                path = Path(v["path"])
-                if not path == Path():
-                    self._lastDir = path.parent
-            except KeyError:
-                pass
-        if key is not None:
-            if values is not None:
-                getattr(self, f'key_{key}').updateSettings(**values)
-                try:
-                    path = Path(values["path"])
-                    if not path == Path():
-                        self._lastDir = path.parent
-                except KeyError:
-                    pass
-            else:
-                raise SyntaxError("Setting key and value without the other is not allowed")
-
-
-    def new(self):
-        """Sets everything to default values."""
-        for k in self._key_list:
-            getattr(self, f'key_{k}').new()
+        """Updates the settings of the engine, see Engine.updateSettings."""
+        self.engine.updateSettings(key, values, **kwargs)
 
 
     @Slot(str, dict)
     def openSettingsDialog(self, key, settings):
         """Opens the Settings Dialog."""
+        # Imported on first use, the dialog and its library picker are not needed at startup
+        from .keySettings import KeySettingsDialog
+
         dlg = KeySettingsDialog(
             self, 
             key,
-            self._lastDir,
+            self.engine.lastDir,
+            self.waveforms,
+            self.library,
             **settings
         )
 
@@ -0,0 +1,172 @@
+# Measures the time from a key trigger until its audio is queued.
+# Author 9qUmV4
+
+import csv
+import io
+import json
+import logging
+import time
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+# Stages measured after the trigger, in the order they happen
+STAGES = (
+    "play",     # KeyButton.play entered
+    "started",  # Mixer started the voice, the button turns to playing
+    "queued",   # First block with the voice handed to the audio output
+)
+PERCENTILES = (50, 95, 99)
+
+GLOBAL = "*"
+
+
+
+# ########################################
+#               LATENCYRING
+# ########################################
+class LatencyRing:
+    """Fixed size ring buffer of latencies in milliseconds."""
+
+    def __init__(self, size: int) -> None:
+        self._values = np.zeros(size, dtype=np.float64)
+        self._index = 0
+        self._count = 0
+
+
+    @property
+    def count(self) -> int:
+        """Number of values held, at most the ring size."""
+        return self._count
+
+
+    def append(self, value: float):
+        self._values[self._index] = value
+        self._index = (self._index + 1) % len(self._values)
+        self._count = min(self._count + 1, len(self._values))
+
+
+    def values(self) -> np.ndarray:
+        """Returns the held values, oldest first."""
+        if self._count < len(self._values):
+            return self._values[:self._count].copy()
+        return np.roll(self._values, -self._index)
+
+
+    def summary(self) -> dict:
+        """Returns count, percentiles and max of the held values."""
+        values = self._values[:self._count]
+        if self._count == 0:
+            return {"count": 0, **{f"p{p}": None for p in PERCENTILES}, "max": None}
+        p = np.percentile(values, PERCENTILES)
+        return {
+            "count": self._count,
+            **{f"p{q}": round(float(v), 4) for q, v in zip(PERCENTILES, p)},
+            "max": round(float(values.max()), 4),
+        }
+
+
+
+# ########################################
+#               LATENCYTRACKER
+# ########################################
+class LatencyTracker:
+    """
+    Keeps the trigger timestamp of every key until its audio is queued
+    and collects the latency of each stage per key and for all keys.
+    """
+
+    RING_SIZE = 1024
+
+
+    def __init__(self, size: int = RING_SIZE) -> None:
+        self._size = size
+        self._pending: dict[str, int] = {}
+        self._rings: dict[tuple[str, str], LatencyRing] = {}
+
+
+    #  METHODES
+    # ----------
+    def trigger(self, key: str):
+        """Marks the moment key was triggered by the shortcut or a click."""
+        self._pending[key] = time.perf_counter_ns()
+
+
+    def mark(self, key: str, stage: str, at: int = None):
+        """
+        Records the latency of stage for key since its trigger.
+        at is the perf_counter_ns the stage happened at, now by default,
+        e.g. stages reported later from the audio thread.
+        Play without a trigger, e.g. called from code, starts the measurement.
+        """
+        now = time.perf_counter_ns() if at is None else at
+        triggered = self._pending.get(key)
+        if triggered is None:
+            if stage != "play":
+                return
+            self._pending[key] = triggered = now
+        elif now < triggered:
+            # Reported late, the key was triggered again meanwhile
+            return
+
+        latency = (now - triggered) / 1e6
+        self._ring(key, stage).append(latency)
+        self._ring(GLOBAL, stage).append(latency)
+        if stage == STAGES[-1]:
+            del self._pending[key]
+
+
+    def cancel(self, key: str):
+        """Drops the trigger of key, e.g. when the trigger stopped playback."""
+        self._pending.pop(key, None)
+
+
+    def reset(self):
+        """Drops all measurements."""
+        self._pending.clear()
+        self._rings.clear()
+
+
+    def _ring(self, key: str, stage: str) -> LatencyRing:
+        ring = self._rings.get((key, stage))
+        if ring is None:
+            ring = self._rings[(key, stage)] = LatencyRing(self._size)
+        return ring
+
+
+    def keys(self) -> list[str]:
+        """Returns all keys with measurements, the global statistics first."""
+        keys = sorted({key for key, _ in self._rings} - {GLOBAL})
+        return [GLOBAL] + keys
+
+
+    def summary(self) -> dict:
+        """Returns {key: {stage: summary}} with GLOBAL holding all keys."""
+        return {
+            key: {
+                stage: self._rings[(key, stage)].summary() if (key, stage) in self._rings
+                else LatencyRing(1).summary()
+                for stage in STAGES
+            }
+            for key in self.keys()
+        }
+
+
+    def toJson(self) -> str:
+        """Returns the summary as JSON."""
+        return json.dumps({"unit": "ms", "stages": self.summary()}, indent=4)
+
+
+    def toCsv(self) -> str:
+        """Returns the summary as CSV, one row per key and stage."""
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(["key", "stage", "count"] + [f"p{p}_ms" for p in PERCENTILES] + ["max_ms"])
+        for key, stages in self.summary().items():
+            for stage, s in stages.items():
+                writer.writerow(
+                    [key, stage, s["count"]] + [s[f"p{p}"] for p in PERCENTILES] + [s["max"]]
+                )
+        return out.getvalue()
@@ -0,0 +1,112 @@
+# Debug panel showing the trigger latency statistics.
+# Author 9qUmV4
+
+import logging
+from pathlib import Path
+
+from PySide6.QtCore import QTimer, Slot
+from PySide6.QtWidgets import (QDialog, QFileDialog, QHBoxLayout, QPushButton,
+                               QTableWidget, QTableWidgetItem, QVBoxLayout,
+                               QWidget)
+
+from .latency import GLOBAL, PERCENTILES, STAGES, LatencyTracker
+
+log = logging.getLogger(__name__)
+
+
+class LatencyDialog(QDialog):
+    """Shows p50/p95/p99 of every stage per key and for all keys."""
+
+    REFRESH_INTERVAL_MS = 1000
+
+
+    def __init__(self, parent: QWidget, latency: LatencyTracker) -> None:
+        super().__init__(parent)
+        self._latency = latency
+
+        self.setWindowTitle("Latency Statistics (ms since trigger)")
+        self.resize(760, 480)
+
+        # Table
+        self._columns = [
+            (stage, f"p{p}") for stage in STAGES for p in PERCENTILES
+        ]
+        self.table = QTableWidget(self)
+        self.table.setColumnCount(1 + len(self._columns))
+        self.table.setHorizontalHeaderLabels(
+            ["count"] + [f"{stage}\n{p}" for stage, p in self._columns]
+        )
+
+        # Buttons
+        self.resetButton = QPushButton("Reset", self)
+        self.exportCsvButton = QPushButton("Export CSV", self)
+        self.exportJsonButton = QPushButton("Export JSON", self)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.resetButton)
+        buttons.addStretch()
+        buttons.addWidget(self.exportCsvButton)
+        buttons.addWidget(self.exportJsonButton)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+
+        # Connectors
+        self.resetButton.clicked.connect(self.reset)
+        self.exportCsvButton.clicked.connect(self.exportCsv)
+        self.exportJsonButton.clicked.connect(self.exportJson)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(LatencyDialog.REFRESH_INTERVAL_MS)
+        self._timer.timeout.connect(self.refresh)
+        self._timer.start()
+        self.refresh()
+
+
+    @Slot()
+    def refresh(self):
+        """Fills the table with the current statistics."""
+        summary = self._latency.summary()
+        self.table.setRowCount(len(summary))
+        self.table.setVerticalHeaderLabels(
+            ["all" if key == GLOBAL else key.upper() for key in summary]
+        )
+        for row, stages in enumerate(summary.values()):
+            self.table.setItem(row, 0, QTableWidgetItem(str(stages[STAGES[-1]]["count"])))
+            for column, (stage, p) in enumerate(self._columns, start=1):
+                value = stages[stage][p]
+                text = "-" if value is None else f"{value:.2f}"
+                self.table.setItem(row, column, QTableWidgetItem(text))
+
+
+    @Slot()
+    def reset(self):
+        self._latency.reset()
+        self.refresh()
+
+
+    @Slot()
+    def exportCsv(self):
+        self._export("CSV File (*.csv)", ".csv", self._latency.toCsv)
+
+
+    @Slot()
+    def exportJson(self):
+        self._export("JSON File (*.json)", ".json", self._latency.toJson)
+
+
+    def _export(self, filter: str, suffix: str, content):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            caption="Export Latency Statistics",
+            dir=f"latency{suffix}",
+            filter=filter,
+        )
+        if file_path == "":
+            log.info("File dialog 'Export Latency Statistics' canceled by user")
+            return None
+        file_path = Path(file_path)
+        with file_path.open('w', newline='') as f_export:
+            f_export.write(content())
+        log.info(f"Exported latency statistics to '{file_path}'")
@@ -0,0 +1,466 @@
+# Index of the audio files in the library folders, kept in a local SQLite database.
+# Author 9qUmV4
+
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+from functools import partial
+from os import PathLike
+from pathlib import Path
+
+from PySide6.QtCore import QObject, QStandardPaths, QThread, QThreadPool, Signal
+
+log = logging.getLogger(__name__)
+
+
+# Files indexed, the same the file dialog offers
+AUDIO_SUFFIXES = (".wav", ".mp3")
+
+# Results returned by one search at most
+SEARCH_LIMIT = 500
+
+# Seconds after which refresh scans the library folders again
+RESCAN_INTERVAL = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    path TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    relative TEXT NOT NULL,
+    duration REAL,
+    sampleRate INTEGER,
+    channels INTEGER,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_folder ON files (folder);
+DROP INDEX IF EXISTS files_relative;
+"""
+
+# Trigram index of the relative paths, needs SQLite 3.34 with FTS5
+_SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS files_search USING fts5 (
+    relative, content='files', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS files_insert AFTER INSERT ON files BEGIN
+    INSERT INTO files_search (rowid, relative) VALUES (new.rowid, new.relative);
+END;
+CREATE TRIGGER IF NOT EXISTS files_delete AFTER DELETE ON files BEGIN
+    INSERT INTO files_search (files_search, rowid, relative) VALUES ('delete', old.rowid, old.relative);
+END;
+CREATE TRIGGER IF NOT EXISTS files_update AFTER UPDATE ON files BEGIN
+    INSERT INTO files_search (files_search, rowid, relative) VALUES ('delete', old.rowid, old.relative);
+    INSERT INTO files_search (rowid, relative) VALUES (new.rowid, new.relative);
+END;
+SELECT rowid FROM files_search LIMIT 0;
+"""
+
+# Without the index scans must not touch it, it is rebuilt once it can be kept again
+_DROP_SEARCH_TRIGGERS = """
+DROP TRIGGER IF EXISTS files_insert;
+DROP TRIGGER IF EXISTS files_delete;
+DROP TRIGGER IF EXISTS files_update;
+"""
+
+# Words shorter than the trigrams of the search index are matched by scanning
+_TRIGRAM = 3
+
+
+
+# ########################################
+#               PROBING
+# ########################################
+# kbit/s by version (1 = MPEG 1, 2 = MPEG 2 and 2.5) and layer
+_MP3_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Hz by version bits of the frame header
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _probeWave(f_audio, size: int) -> tuple:
+    """Reads the fmt and data chunks of a RIFF wave file, PCM or not."""
+    header = f_audio.read(12)
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:] != b"WAVE":
+        return None
+    channels = sampleRate = blockAlign = None
+    while True:
+        chunk = f_audio.read(8)
+        if len(chunk) < 8:
+            return None
+        name, length = struct.unpack("<4sI", chunk)
+        if name == b"fmt ":
+            _, channels, sampleRate, _, blockAlign = struct.unpack("<HHIIH", f_audio.read(14))
+            f_audio.seek(length - 14 + length % 2, os.SEEK_CUR)
+        elif name == b"data":
+            if not (channels and sampleRate and blockAlign):
+                return None
+            # Files cut off while recording state more data than they hold
+            length = min(length, size - f_audio.tell())
+            return (length // blockAlign / sampleRate, sampleRate, channels)
+        else:
+            f_audio.seek(length + length % 2, os.SEEK_CUR)
+
+
+def _probeMp3(f_audio, size: int) -> tuple:
+    """Reads the first frame header and the Xing or VBRI header of an MPEG audio file."""
+    offset = 0
+    head = f_audio.read(10)
+    if head[:3] == b"ID3" and len(head) == 10:
+        offset = 10 + ((head[6] & 0x7f) << 21 | (head[7] & 0x7f) << 14 | (head[8] & 0x7f) << 7 | head[9] & 0x7f)
+        if head[5] & 0x10:
+            offset += 10
+    f_audio.seek(offset)
+    data = f_audio.read(2**16)
+
+    position = data.find(b"\xff")
+    while 0 <= position < len(data) - 4:
+        b1, b2, b3 = data[position + 1], data[position + 2], data[position + 3]
+        versionBits, layerBits = (b1 >> 3) & 3, (b1 >> 1) & 3
+        bitrateIndex, rateIndex = b2 >> 4, (b2 >> 2) & 3
+        if (b1 & 0xe0) == 0xe0 and versionBits != 1 and layerBits != 0 and 0 < bitrateIndex < 15 and rateIndex < 3:
+            break
+        position = data.find(b"\xff", position + 1)
+    else:
+        return None
+
+    version = 1 if versionBits == 3 else 2
+    layer = 4 - layerBits
+    sampleRate = _MP3_SAMPLE_RATES[versionBits][rateIndex]
+    channels = 1 if b3 >> 6 == 3 else 2
+    frameSamples = 384 if layer == 1 else 1152 if layer == 2 or version == 1 else 576
+
+    # VBR files count their frames in a header inside the first frame
+    frames = None
+    if layer == 3:
+        sideInfo = (32 if channels == 2 else 17) if version == 1 else (17 if channels == 2 else 9)
+        xing = position + 4 + sideInfo
+        if data[xing:xing + 4] in (b"Xing", b"Info") and struct.unpack(">I", data[xing + 4:xing + 8])[0] & 1:
+            frames = struct.unpack(">I", data[xing + 8:xing + 12])[0]
+        elif data[position + 36:position + 40] == b"VBRI":
+            frames = struct.unpack(">I", data[position + 50:position + 54])[0]
+    if frames is not None:
+        duration = frames * frameSamples / sampleRate
+    else:
+        duration = (size - offset - position) * 8 / (_MP3_BITRATES[version, layer][bitrateIndex] * 1000)
+    return (duration, sampleRate, channels)
+
+
+def probe(path: PathLike | str, size: int = None) -> tuple:
+    """
+    Returns (duration in s, sample rate, channels) of the audio file at path
+    from its headers, without decoding. Unknown values are None.
+    """
+    path = Path(path)
+    if size is None:
+        size = path.stat().st_size
+    prober = _probeWave if path.suffix.lower() == ".wav" else _probeMp3
+    try:
+        with path.open('rb') as f_audio:
+            info = prober(f_audio, size)
+    except (OSError, struct.error) as e:
+        log.debug(f"Cannot probe '{path}': {e}")
+        info = None
+    return info or (None, None, None)
+
+
+
+# ########################################
+#               SCAN
+# ########################################
+class _Scan:
+    """State of scanning one library folder, shared by its directory jobs."""
+
+    def __init__(self, folder: str, known: dict) -> None:
+        self.folder = folder
+        self.known = known      # path: (size, mtime) in the index
+        self.seen = set()
+        self.pending = 0
+        self.changed = 0
+        self.lock = threading.Lock()
+
+
+
+# ########################################
+#               LIBRARY
+# ########################################
+class Library(QObject):
+    """
+    Index of the audio files in the library folders, searched by name while typing.
+    Scans run in a thread pool, one job per directory. They are incremental,
+    only new and changed files are probed, files gone are dropped.
+    """
+
+    # Signals, emitted from the pool
+    changed = Signal()
+    progress = Signal(
+        int,    # files scanned
+    )
+    finished = Signal()
+    searched = Signal(
+        int,    # serial returned by startSearch
+        list,   # files
+    )
+
+
+    def __init__(self, parent: QObject = None, path: PathLike | str = None) -> None:
+        super().__init__(parent)
+
+        self._path = Path(path) if path is not None else Library.defaultPath()
+        # The database is opened on first use, one connection per thread
+        self._local = threading.local()
+        self._scans = 0
+        self._scanned = 0
+        self._lastScan = None
+        self._lock = threading.Lock()
+        self._searchSerial = 0
+        # False once SQLite cannot keep the trigram index, every word is scanned for then
+        self._trigram = True
+
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(QThread.idealThreadCount())
+        # Searches run one after another, not queued behind the directories of a scan
+        self._searchPool = QThreadPool(self)
+        self._searchPool.setMaxThreadCount(1)
+
+
+    #  PROPERTIES
+    # ------------
+    @property
+    def path(self) -> Path:
+        """Path of the database file."""
+        return self._path
+
+    @property
+    def is_scanning(self) -> bool:
+        return self._scans > 0
+
+
+    #  METHODES
+    # ----------
+    @staticmethod
+    def defaultPath() -> Path:
+        """Returns the path of the database shared by all shows of the user."""
+        location = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.GenericDataLocation)
+        return Path(location) / "SoundKey2" / "library.sqlite"
+
+
+    def _connection(self) -> sqlite3.Connection:
+        """Returns the connection of the calling thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=30.0)
+            # Readers are not blocked by the scan writing
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            # INSERT OR REPLACE of a scan fires the delete trigger of the replaced row only with this
+            connection.execute("PRAGMA recursive_triggers=ON")
+            connection.executescript(_SCHEMA)
+            indexed = connection.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name = 'files_insert'"
+            ).fetchone()[0]
+            try:
+                connection.executescript(_SEARCH_SCHEMA)
+            except sqlite3.OperationalError as e:
+                if self._trigram:
+                    log.warning(f"Library searched without index, SQLite {sqlite3.sqlite_version} cannot create it: {e}")
+                self._trigram = False
+                connection.executescript(_DROP_SEARCH_TRIGGERS)
+            else:
+                if not indexed:
+                    # Index created after the files, by an older version or SQLite
+                    with connection:
+                        connection.execute("INSERT INTO files_search (files_search) VALUES ('rebuild')")
+            self._local.connection = connection
+        return connection
+
+
+    def folders(self) -> list[Path]:
+        """Returns the library folders."""
+        return [Path(path) for path, in self._connection().execute("SELECT path FROM folders ORDER BY path")]
+
+
+    def addFolder(self, folder: PathLike | str):
+        """Adds folder to the library and scans it."""
+        folder = Path(folder).resolve()
+        with self._connection() as connection:
+            connection.execute("INSERT OR IGNORE INTO folders VALUES (?)", (str(folder),))
+        log.info(f"Added library folder '{folder}'")
+        self.scan([folder])
+
+
+    def removeFolder(self, folder: PathLike | str):
+        """Removes folder and its files from the library."""
+        folder = str(Path(folder).resolve())
+        with self._connection() as connection:
+            connection.execute("DELETE FROM folders WHERE path = ?", (folder,))
+            connection.execute("DELETE FROM files WHERE folder = ?", (folder,))
+        log.info(f"Removed library folder '{folder}'")
+        self.changed.emit()
+
+
+    def count(self) -> int:
+        """Returns the number of indexed files."""
+        return self._connection().execute("SELECT count(*) FROM files").fetchone()[0]
+
+
+    def search(self, text: str, limit: int = SEARCH_LIMIT) -> list[dict]:
+        """
+        Returns the files whose path inside their library folder contains every word of text,
+        ignoring case, sorted by that path. Each file is a dict with the columns of the index.
+        Words of three characters and more are looked up in the trigram index, if SQLite has one.
+        """
+        connection = self._connection()
+        words = text.split()
+        indexed = [word for word in words if self._trigram and len(word) >= _TRIGRAM]
+        short = [word for word in words if word not in indexed]
+        query = "SELECT path, relative, duration, sampleRate, channels, size, mtime FROM files"
+        conditions = []
+        parameters = []
+        if indexed:
+            conditions.append("rowid IN (SELECT rowid FROM files_search WHERE files_search MATCH ?)")
+            parameters.append(" AND ".join('"' + word.replace('"', '""') + '"' for word in indexed))
+        for word in short:
+            conditions.append("relative LIKE ? ESCAPE '\\'")
+            parameters.append("%" + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY relative LIMIT ?"
+        columns = ("path", "relative", "duration", "sampleRate", "channels", "size", "mtime")
+        return [dict(zip(columns, row)) for row in connection.execute(query, (*parameters, limit))]
+
+
+    def startSearch(self, text: str) -> int:
+        """Searches text in the background. Returns the serial the results are emitted with by searched."""
+        self._searchSerial += 1
+        self._searchPool.start(partial(self._search, self._searchSerial, text))
+        return self._searchSerial
+
+
+    def _search(self, serial: int, text: str):
+        """Runs in the search pool. Skips searches superseded while they were queued."""
+        if serial != self._searchSerial:
+            return
+        self.searched.emit(serial, self.search(text))
+
+
+    def refresh(self):
+        """Scans all library folders, unless they are scanned or were scanned within RESCAN_INTERVAL."""
+        if self.is_scanning or (self._lastScan is not None and time.monotonic() - self._lastScan < RESCAN_INTERVAL):
+            return
+        self.scan()
+
+
+    def scan(self, folders: list = None):
+        """Updates the index of folders, all library folders by default, in the background."""
+        folders = self.folders() if folders is None else [Path(folder).resolve() for folder in folders]
+        self._lastScan = time.monotonic()
+        for folder in folders:
+            with self._lock:
+                self._scans += 1
+            self._pool.start(partial(self._scanFolder, folder))
+
+
+    def _scanFolder(self, folder: Path):
+        """Runs in the pool. Reads what the index holds for folder and starts scanning it."""
+        known = {
+            path: (size, mtime) for path, size, mtime in self._connection().execute(
+                "SELECT path, size, mtime FROM files WHERE folder = ?", (str(folder),)
+            )
+        }
+        log.info(f"Scanning library folder '{folder}' ({len(known)} files indexed)")
+        self._startDirectory(_Scan(str(folder), known), folder)
+
+
+    def _startDirectory(self, scan: _Scan, directory: Path):
+        with scan.lock:
+            scan.pending += 1
+        self._pool.start(partial(self._scanDirectory, scan, directory))
+
+
+    def _scanDirectory(self, scan: _Scan, directory: Path):
+        """Runs in the pool. Indexes the files of directory and starts a job for every subdirectory."""
+        rows = []
+        seen = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        self._startDirectory(scan, Path(entry.path))
+                        continue
+                    if not entry.name.lower().endswith(AUDIO_SUFFIXES) or not entry.is_file():
+                        continue
+                    info = entry.stat()
+                    seen.append(entry.path)
+                    if scan.known.get(entry.path) == (info.st_size, info.st_mtime_ns):
+                        continue
+                    rows.append((
+                        entry.path, scan.folder, os.path.relpath(entry.path, scan.folder),
+                        *probe(entry.path, info.st_size), info.st_size, info.st_mtime_ns,
+                    ))
+        except OSError as e:
+            log.warning(f"Cannot scan '{directory}': {e}")
+
+        if rows:
+            with self._connection() as connection:
+                connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+        with scan.lock:
+            scan.seen.update(seen)
+            scan.changed += len(rows)
+            scan.pending -= 1
+            done = scan.pending == 0
+        with self._lock:
+            self._scanned += len(seen)
+            scanned = self._scanned
+        if rows:
+            self.changed.emit()
+        self.progress.emit(scanned)
+        if done:
+            self._finishScan(scan)
+
+
+    def _finishScan(self, scan: _Scan):
+        """Runs in the pool, once every directory of scan is done. Drops the files gone."""
+        gone = [(path,) for path in scan.known.keys() - scan.seen]
+        if gone:
+            with self._connection() as connection:
+                connection.executemany("DELETE FROM files WHERE path = ?", gone)
+            self.changed.emit()
+        log.info(
+            f"Scanned library folder '{scan.folder}': {len(scan.seen)} files, "
+            f"{scan.changed} new or changed, {len(gone)} gone"
+        )
+        with self._lock:
+            self._scans -= 1
+            finished = self._scans == 0
+            if finished:
+                self._scanned = 0
+        if finished:
+            self.finished.emit()
+
+
+    def waitForDone(self):
+        """Blocks until all scans and searches are done."""
+        self._pool.waitForDone()
+        self._searchPool.waitForDone()
+
+
+    def close(self):
+        """Closes the connection of the calling thread to the index."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
@@ -0,0 +1,222 @@
+# Search-as-you-type picker for the files of the library.
+# Author 9qUmV4
+
+import logging
+from pathlib import Path
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, QTimer, Signal, Slot
+from PySide6.QtWidgets import (
+    QAbstractItemView, QFileDialog, QHBoxLayout, QHeaderView, QLabel, QLineEdit, QPushButton, QTableView,
+    QVBoxLayout, QWidget,
+)
+
+from .library import Library
+
+log = logging.getLogger(__name__)
+
+
+
+def formatDuration(seconds: float | None) -> str:
+    if seconds is None:
+        return ""
+    minutes, seconds = divmod(seconds, 60)
+    return f"{int(minutes)}:{seconds:04.1f}"
+
+
+def formatAudio(file: dict) -> str:
+    """Returns e.g. 'WAV 48 kHz stereo' for a file of the library."""
+    text = Path(file["path"]).suffix[1:].upper()
+    if file["sampleRate"]:
+        text += f" {file['sampleRate'] / 1000:g} kHz"
+    if file["channels"]:
+        text += " " + {1: "mono", 2: "stereo"}.get(file["channels"], f"{file['channels']} ch")
+    return text
+
+
+def formatSize(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+
+# ########################################
+#               LIBRARYMODEL
+# ########################################
+class LibraryModel(QAbstractTableModel):
+    """Table of the files found by a library search."""
+
+    COLUMNS = ("Name", "Duration", "Format", "Size", "Folder")
+
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self._files: list[dict] = []
+
+
+    def setFiles(self, files: list[dict]):
+        self.beginResetModel()
+        self._files = files
+        self.endResetModel()
+
+
+    def file(self, row: int) -> dict:
+        return self._files[row]
+
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._files)
+
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(LibraryModel.COLUMNS)
+
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return LibraryModel.COLUMNS[section]
+        return None
+
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        file = self._files[index.row()]
+        if role == Qt.DisplayRole:
+            relative = Path(file["relative"])
+            return (
+                relative.name,
+                formatDuration(file["duration"]),
+                formatAudio(file),
+                formatSize(file["size"]),
+                str(relative.parent) if relative.parent != Path() else "",
+            )[index.column()]
+        if role == Qt.ToolTipRole:
+            return file["path"]
+        if role == Qt.TextAlignmentRole and index.column() in (1, 3):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+
+
+# ########################################
+#               LIBRARYPICKER
+# ########################################
+class LibraryPicker(QWidget):
+    """
+    Searches the library in the background while typing. Every word typed must appear
+    in the path of a file inside its library folder. Activating a file emits fileSelected.
+    """
+
+    # Refresh of the results while a scan adds files
+    RESCAN_REFRESH_MS = 300
+    # Pause in typing before searching
+    SEARCH_DELAY_MS = 150
+
+    # Signals
+    fileSelected = Signal(
+        str,    # path
+    )
+
+
+    def __init__(self, parent: QWidget, library: Library) -> None:
+        super().__init__(parent)
+        self._library = library
+        self._searchSerial = None
+        self._shownSerial = None
+
+        self.searchLineEdit = QLineEdit(self)
+        self.searchLineEdit.setPlaceholderText("Search the library")
+        self.searchLineEdit.setClearButtonEnabled(True)
+        self.addFolderButton = QPushButton("Add Folder", self)
+        self.addFolderButton.setToolTip("Add a folder to the library")
+        self.statusLabel = QLabel(self)
+
+        self.model = LibraryModel(self)
+        self.view = QTableView(self)
+        self.view.setModel(self.model)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.view.verticalHeader().hide()
+        self.view.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+
+        top = QHBoxLayout()
+        top.addWidget(self.searchLineEdit)
+        top.addWidget(self.addFolderButton)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(top)
+        layout.addWidget(self.view)
+        layout.addWidget(self.statusLabel)
+
+        self._refreshTimer = QTimer(self)
+        self._refreshTimer.setSingleShot(True)
+        self._refreshTimer.setInterval(LibraryPicker.RESCAN_REFRESH_MS)
+        self._refreshTimer.timeout.connect(self.search)
+
+        self._searchTimer = QTimer(self)
+        self._searchTimer.setSingleShot(True)
+        self._searchTimer.setInterval(LibraryPicker.SEARCH_DELAY_MS)
+        self._searchTimer.timeout.connect(self.search)
+
+        self.searchLineEdit.textChanged.connect(self._searchTimer.start)
+        self.searchLineEdit.returnPressed.connect(self._selectFirst)
+        self.view.activated.connect(self._activated)
+        self.addFolderButton.clicked.connect(self.addFolder)
+        self._library.changed.connect(self._refreshTimer.start)
+        self._library.finished.connect(self.search)
+        self._library.searched.connect(self._showFiles)
+
+        # Catch up with changes on disk, the index answers meanwhile
+        self._library.refresh()
+        self.search()
+
+
+    @Slot()
+    def search(self):
+        """Searches the files matching the search text, shown once found."""
+        self._searchTimer.stop()
+        self._searchSerial = self._library.startSearch(self.searchLineEdit.text())
+
+
+    @Slot(int, list)
+    def _showFiles(self, serial: int, files: list):
+        # Results of an earlier text, or of another picker of the library
+        if serial != self._searchSerial:
+            return
+        self._shownSerial = serial
+        self.model.setFiles(files)
+        self.view.resizeColumnsToContents()
+        self.view.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        status = f"{len(files)} files"
+        if self._library.is_scanning:
+            status += ", scanning the library"
+        self.statusLabel.setText(status)
+
+
+    @Slot()
+    def addFolder(self):
+        folder = QFileDialog.getExistingDirectory(self, caption="Add folder to the library")
+        if folder == "":
+            log.info("File dialog 'Add folder to the library' canceled by user")
+            return
+        self._library.addFolder(folder)
+
+
+    @Slot(QModelIndex)
+    def _activated(self, index):
+        self.fileSelected.emit(self.model.file(index.row())["path"])
+
+
+    @Slot()
+    def _selectFirst(self):
+        # Return typed before the results of the text are shown
+        if self._searchTimer.isActive() or self._shownSerial != self._searchSerial:
+            files = self._library.search(self.searchLineEdit.text(), limit=1)
+            if files:
+                self.fileSelected.emit(files[0]["path"])
+        elif self.model.rowCount() > 0:
+            self.fileSelected.emit(self.model.file(0)["path"])
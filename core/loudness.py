@@ -0,0 +1,440 @@
+# Loudness of media files after EBU R128 / ITU-R BS.1770, measured in worker processes.
+# Author 9qUmV4
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from functools import lru_cache, partial
+from os import PathLike
+from pathlib import Path
+
+import numpy as np
+from PySide6.QtCore import QCoreApplication, QObject, Signal, Slot
+
+from .sampleCache import CHANNELS, SampleCache, streamFile
+from .showWriter import atomicWrite
+from .waveform import PEAKS_DIR_SUFFIX
+
+log = logging.getLogger(__name__)
+
+
+# Loudness the normalization gain aims at and the true peak it must not exceed
+TARGET_LOUDNESS = -23.0     # LUFS
+MAX_TRUE_PEAK = -1.0        # dBTP
+
+# Range of the normalization gain in dB
+MIN_GAIN = -60.0
+MAX_GAIN = 24.0
+
+# Gating blocks of 400 ms, moving in steps of 100 ms
+STEP_SECONDS = 0.1
+STEPS_PER_BLOCK = 4
+ABSOLUTE_GATE = -70.0       # LUFS
+RELATIVE_GATE = -10.0       # LU
+
+# True peak is searched at 4 times the sample rate
+OVERSAMPLING = 4
+OVERSAMPLING_TAPS = 12      # per phase
+
+# Frames filtered at once, the K-weighting filter is applied in the frequency domain
+FILTER_FRAMES = 2**16
+
+CACHE_FILE_NAME = "loudness.json"
+_HASH_CHUNK = 2**20
+
+
+
+# ########################################
+#               FUNCTIONS
+# ########################################
+def _biquad(b: tuple, a: tuple, z: np.ndarray) -> np.ndarray:
+    """Returns the response of a biquad at z."""
+    return (b[0] + b[1] / z + b[2] / z**2) / (a[0] + a[1] / z + a[2] / z**2)
+
+
+@lru_cache(maxsize=8)
+def kWeighting(sampleRate: int) -> np.ndarray:
+    """
+    Returns the impulse response of the K-weighting filter at sampleRate,
+    a high shelf for the head followed by a high pass, as FIR taps.
+    The coefficients follow BS.1770 and are recomputed for rates other than 48 kHz.
+    """
+    # High shelf, +4 dB above about 1.7 kHz
+    k = np.tan(np.pi * 1681.974450955533 / sampleRate)
+    q = 0.7071752369554196
+    vh = 10 ** (3.999843853973347 / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k**2
+    shelf = (
+        ((vh + vb * k / q + k**2) / a0, 2 * (k**2 - vh) / a0, (vh - vb * k / q + k**2) / a0),
+        (1.0, 2 * (k**2 - 1) / a0, (1 - k / q + k**2) / a0),
+    )
+    # High pass at 38 Hz
+    k = np.tan(np.pi * 38.13547087602444 / sampleRate)
+    q = 0.5003270373238773
+    a0 = 1 + k / q + k**2
+    highPass = ((1.0, -2.0, 1.0), (1.0, 2 * (k**2 - 1) / a0, (1 - k / q + k**2) / a0))
+
+    # The high pass rings for about 100 ms, the taps cover 160 ms and more
+    taps = 1 << int(np.ceil(np.log2(sampleRate * 0.16)))
+    z = np.exp(1j * np.linspace(0.0, np.pi, 4 * taps + 1))
+    response = _biquad(*shelf, z) * _biquad(*highPass, z)
+    return np.fft.irfft(response, 8 * taps)[:taps]
+
+
+@lru_cache(maxsize=8)
+def _kWeightingSpectrum(sampleRate: int, size: int) -> np.ndarray:
+    return np.fft.rfft(kWeighting(sampleRate), size)[:, None]
+
+
+@lru_cache(maxsize=1)
+def _oversamplingFilter() -> np.ndarray:
+    """Returns the interpolation filter as (OVERSAMPLING_TAPS, OVERSAMPLING) matrix, one column per phase."""
+    length = OVERSAMPLING * OVERSAMPLING_TAPS
+    n = np.arange(length) - (length - 1) / 2
+    h = np.sinc(n / OVERSAMPLING) * np.blackman(length)
+    phases = h.reshape(OVERSAMPLING_TAPS, OVERSAMPLING)
+    return (phases / phases.sum(axis=0)).astype(np.float32)
+
+
+def fileHash(path: PathLike | str) -> str:
+    """Returns the SHA-1 of the content of path, the same file keeps its hash when moved."""
+    digest = hashlib.sha1()
+    with Path(path).open('rb') as f_media:
+        while chunk := f_media.read(_HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def normalizationGain(
+        loudness: dict,
+        target: float = TARGET_LOUDNESS,
+        maxTruePeak: float = MAX_TRUE_PEAK,
+    ) -> float:
+    """
+    Returns the gain in dB bringing a file measured as loudness to target,
+    lowered, so its true peak stays below maxTruePeak. Silent files get 0.0.
+    """
+    integrated = loudness["integrated"]
+    if integrated is None:
+        return 0.0
+    gain = target - integrated
+    if loudness["truePeak"] is not None:
+        gain = min(gain, maxTruePeak - loudness["truePeak"])
+    return round(min(max(gain, MIN_GAIN), MAX_GAIN), 1) + 0.0
+
+
+
+# ########################################
+#               LOUDNESSMETER
+# ########################################
+class LoudnessMeter:
+    """
+    Measures integrated loudness and true peak of audio added chunk by chunk,
+    like PeakBuilder does for the waveform. Measures what the mixer plays:
+    mono is played on both channels, channels after the first CHANNELS are dropped.
+    """
+
+    def __init__(self) -> None:
+        self._sampleRate = None
+        self._channelGain = 1.0
+        self._pending = []
+        self._pendingFrames = 0
+        self._tail = None
+        self._history = None
+        self._squares = None
+        self._steps = []
+        self._peak = 0.0
+
+
+    def add(self, samples: np.ndarray, sampleRate: int):
+        """Adds float32 samples of shape (frames, channels)."""
+        if self._sampleRate is None:
+            self._sampleRate = sampleRate
+            channels = min(samples.shape[1], CHANNELS)
+            # Mono counts for both channels it is played on
+            self._channelGain = CHANNELS / channels
+            self._tail = np.zeros((len(kWeighting(sampleRate)) - 1, channels))
+            self._history = np.zeros((OVERSAMPLING_TAPS - 1, channels), dtype=np.float32)
+            self._squares = np.zeros((0, channels))
+        samples = samples[:, :CHANNELS]
+        self._truePeak(samples)
+        self._pending.append(samples)
+        self._pendingFrames += len(samples)
+        if self._pendingFrames >= FILTER_FRAMES:
+            self._filter()
+
+
+    def finish(self) -> dict:
+        """
+        Returns {"integrated": LUFS, "truePeak": dBTP, "duration": seconds}.
+        Integrated loudness is None for silence, true peak for digital silence.
+        """
+        if self._sampleRate is None:
+            return {"integrated": None, "truePeak": None, "duration": 0.0}
+        self._filter()
+        step = int(round(self._sampleRate * STEP_SECONDS))
+        energy = np.array(self._steps).reshape(-1, self._tail.shape[1])
+        frames = len(energy) * step + len(self._squares)
+
+        # Mean square of every complete 400 ms block, shorter files are one block
+        if len(energy) >= STEPS_PER_BLOCK:
+            sums = np.cumsum(np.vstack([np.zeros((1, energy.shape[1])), energy]), axis=0)
+            blocks = (sums[STEPS_PER_BLOCK:] - sums[:-STEPS_PER_BLOCK]) / (STEPS_PER_BLOCK * step)
+        else:
+            blocks = (energy.sum(axis=0) + self._squares.sum(axis=0))[None, :] / max(frames, 1)
+        power = blocks.sum(axis=1) * self._channelGain
+        with np.errstate(divide='ignore'):
+            loudness = -0.691 + 10 * np.log10(power)
+
+        integrated = None
+        gated = loudness > ABSOLUTE_GATE
+        if gated.any():
+            relative = -0.691 + 10 * np.log10(power[gated].mean()) + RELATIVE_GATE
+            gated &= loudness > relative
+            integrated = float(-0.691 + 10 * np.log10(power[gated].mean()))
+        return {
+            "integrated": integrated,
+            "truePeak": float(20 * np.log10(self._peak)) if self._peak > 0.0 else None,
+            "duration": frames / self._sampleRate,
+        }
+
+
+    def _filter(self):
+        """K-weights the pending samples with overlap-add and sums their squares per 100 ms step."""
+        if not self._pending:
+            return
+        samples = np.concatenate(self._pending).astype(np.float64)
+        self._pending = []
+        self._pendingFrames = 0
+
+        taps = len(self._tail) + 1
+        size = 1 << int(np.ceil(np.log2(len(samples) + taps - 1)))
+        filtered = np.fft.irfft(
+            np.fft.rfft(samples, size, axis=0) * _kWeightingSpectrum(self._sampleRate, size), size, axis=0,
+        )[:len(samples) + taps - 1]
+        filtered[:taps - 1] += self._tail
+        self._tail = filtered[len(samples):].copy()
+
+        squares = np.vstack([self._squares, filtered[:len(samples)] ** 2])
+        step = int(round(self._sampleRate * STEP_SECONDS))
+        complete = len(squares) // step * step
+        self._steps.extend(squares[:complete].reshape(-1, step, squares.shape[1]).sum(axis=1))
+        self._squares = squares[complete:]
+
+
+    def _truePeak(self, samples: np.ndarray):
+        """Interpolates samples OVERSAMPLING times and keeps the highest absolute value."""
+        padded = np.vstack([self._history, samples.astype(np.float32)])
+        self._history = padded[-(OVERSAMPLING_TAPS - 1):]
+        windows = np.lib.stride_tricks.sliding_window_view(padded, OVERSAMPLING_TAPS, axis=0)
+        if len(windows):
+            # (frames, channels, taps) @ (taps, phases)
+            self._peak = max(self._peak, float(np.abs(windows @ _oversamplingFilter()).max()))
+        if len(samples):
+            self._peak = max(self._peak, float(np.abs(samples).max()))
+
+
+
+# ########################################
+#               WORKER
+# ########################################
+def _initWorker():
+    """Runs in every worker process. Decoding with the multimedia backend needs an application."""
+    if QCoreApplication.instance() is None:
+        _initWorker.app = QCoreApplication([])
+
+
+def analyzeFile(path: str, known: frozenset = frozenset()) -> tuple[str, dict | None]:
+    """
+    Runs in a worker process. Returns the hash of the file at path and its loudness,
+    see LoudnessMeter.finish, or None, if the hash is in known.
+    """
+    digest = fileHash(path)
+    if digest in known:
+        return digest, None
+    meter = LoudnessMeter()
+    streamFile(path, meter.add)
+    return digest, meter.finish()
+
+
+
+# ########################################
+#               LOUDNESSANALYZER
+# ########################################
+class LoudnessAnalyzer(QObject):
+    """
+    Measures the loudness of files in a pool of worker processes, one per core.
+    Results are kept by file hash in memory and stored next to the show,
+    like the waveform peaks, so every file is only measured once.
+    """
+
+    # Signals
+    analyzed = Signal(
+        str,    # path
+        dict,   # loudness
+    )
+    progress = Signal(
+        int,    # files done
+        int,    # files total
+    )
+    finished = Signal()
+    # Emitted from the pool, delivered on the GUI thread
+    _computed = Signal(
+        int,    # generation
+        str,    # path
+        object, # fingerprint
+        str,    # hash
+        object, # loudness
+    )
+
+
+    def __init__(self, parent: QObject = None) -> None:
+        super().__init__(parent)
+
+        self._results: dict[str, dict] = {}        # hash: loudness
+        self._hashes: dict[str, tuple] = {}        # path: (fingerprint, hash)
+        self._cachePath = None
+        self._executor = None
+        self._generation = 0
+        self._done = 0
+        self._total = 0
+
+        self._computed.connect(self._storeComputed)
+
+
+    #  PROPERTIES
+    # ------------
+    @property
+    def is_analyzing(self) -> bool:
+        return self._done < self._total
+
+
+    #  METHODES
+    # ----------
+    def setShowPath(self, showPath: PathLike | str):
+        """Stores the results next to the show file from now on and reads those stored there."""
+        showPath = Path(showPath)
+        if showPath == Path():
+            self._cachePath = None
+            return
+        self._cachePath = showPath.with_suffix(PEAKS_DIR_SUFFIX) / CACHE_FILE_NAME
+        if self._cachePath.is_file():
+            try:
+                self._results.update(json.loads(self._cachePath.read_text()))
+            except (OSError, ValueError) as e:
+                log.warning(f"Cannot read stored loudness '{self._cachePath}': {e}")
+
+
+    def get(self, path: PathLike | str) -> dict | None:
+        """Returns the loudness of path, if it was measured and the file is unchanged."""
+        path = Path(path)
+        known = self._hashes.get(str(path))
+        if known is None or known[0] != SampleCache.fingerprint(path):
+            return None
+        return self._results.get(known[1])
+
+
+    def analyze(self, paths):
+        """
+        Measures the loudness of every file in paths, that is not known yet.
+        analyzed is emitted for every file, finished once all are done.
+        """
+        self.cancel()
+        paths = list(dict.fromkeys(Path(path) for path in paths))
+        self._done = 0
+        self._total = len(paths)
+        log.info(f"Analyzing the loudness of {self._total} files")
+        known = frozenset(self._results)
+        for path in paths:
+            fingerprint = SampleCache.fingerprint(path)
+            loudness = self.get(path)
+            if fingerprint is None or loudness is not None:
+                self._storeComputed(self._generation, str(path), fingerprint, "", loudness)
+                continue
+            future = self._submit(path, known)
+            future.add_done_callback(partial(self._finished, self._generation, str(path), fingerprint))
+        if self._total == 0:
+            self.finished.emit()
+
+
+    def _submit(self, path: Path, known: frozenset):
+        """Hands path to a worker, starts the workers first, if there are none."""
+        # Imported here, the process pool is not needed before the first analysis
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+
+        if self._executor is not None:
+            try:
+                return self._executor.submit(analyzeFile, str(path), known)
+            except BrokenProcessPool:
+                # A worker died, e.g. in the decoder of a broken file
+                log.warning("Loudness workers stopped, starting new ones")
+                self._executor.shutdown(wait=False)
+        # Spawned, forking would copy the threads of the GUI process
+        self._executor = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initWorker,
+        )
+        return self._executor.submit(analyzeFile, str(path), known)
+
+
+    def cancel(self):
+        """Drops the results of files still being analyzed."""
+        self._generation += 1
+        self._total = self._done
+
+
+    def shutdown(self):
+        """Stops the worker processes. They are started again by the next analyze."""
+        self.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+    def _finished(self, generation, path, fingerprint, future):
+        """Runs on a thread of the executor."""
+        if future.cancelled():
+            return
+        try:
+            digest, loudness = future.result()
+        except Exception as e:
+            log.error(f"Cannot analyze the loudness of '{path}': {e}")
+            digest, loudness = "", None
+        self._computed.emit(generation, path, fingerprint, digest, loudness)
+
+
+    @Slot(int, str, object, str, object)
+    def _storeComputed(self, generation, path, fingerprint, digest, loudness):
+        if generation != self._generation:
+            return
+        if digest:
+            self._hashes[path] = (fingerprint, digest)
+            if loudness is None:
+                # Same content as a file measured before
+                loudness = self._results.get(digest)
+            else:
+                self._results[digest] = loudness
+        self._done += 1
+        self.progress.emit(self._done, self._total)
+        if loudness is not None:
+            self.analyzed.emit(path, loudness)
+        if self._done == self._total:
+            self._store()
+            log.info("Loudness analysis finished")
+            self.finished.emit()
+
+
+    def _store(self):
+        """Writes the results next to the show."""
+        if self._cachePath is None:
+            return
+        try:
+            self._cachePath.parent.mkdir(parents=True, exist_ok=True)
+            atomicWrite(self._cachePath, json.dumps(self._results).encode('utf-8'))
+        except OSError as e:
+            log.warning(f"Cannot store loudness '{self._cachePath}': {e}")
@@ -0,0 +1,951 @@
+# Software mixer playing all keys through one audio output, rendered on its own thread.
+# Author 9qUmV4
+
+import logging
+import threading
+import time
+import wave
+from collections import deque
+from collections.abc import Callable
+from os import PathLike
+
+import numpy as np
+from PySide6.QtCore import QIODevice, QObject, Qt, QThread, QTimer, Signal, Slot
+
+from .latency import LatencyTracker
+from .sampleCache import CHANNELS, SAMPLE_RATE, StreamReader, StreamSource, toFloat32
+
+log = logging.getLogger(__name__)
+
+
+
+# ########################################
+#               VOICE
+# ########################################
+class Voice:
+    """
+    One slot of the voice pool of the mixer, playing a sample while it has a key.
+    samples is an array or the StreamReader of a streamed file, read the same way.
+    Fades are linear gain ramps in frames: fadeIn at the start, fadeOut at the
+    end of the samples and after release, when the voice is stopped with a fade.
+    gain is a constant linear factor, e.g. the normalization gain of the key.
+    level is the peak of the last rendered block, kept when stealing the quietest voice.
+    metered is the position the level meters were computed up to, see Renderer.meters.
+    """
+
+    __slots__ = ("key", "samples", "position", "fadeIn", "fadeOut", "end", "gain", "serial", "level", "metered")
+
+    def __init__(self) -> None:
+        self.free()
+
+
+    def assign(self, key: str, samples: np.ndarray, fadeIn: int, fadeOut: int, gain: float, serial: int):
+        """Starts playing samples for key from the beginning."""
+        self.key = key
+        self.samples = samples
+        self.position = 0
+        self.fadeIn = fadeIn
+        self.fadeOut = fadeOut
+        self.end = len(samples)
+        self.gain = gain
+        self.serial = serial
+        self.level = 1.0
+        self.metered = 0
+
+
+    def free(self):
+        """Returns the voice to the pool."""
+        self.key = None
+        self.samples = None
+        self.position = 0
+        self.fadeIn = 0
+        self.fadeOut = 0
+        self.end = 0
+        self.gain = 1.0
+        self.serial = 0
+        self.level = 0.0
+        self.metered = 0
+
+    @property
+    def remaining(self) -> int:
+        """Number of frames left to play."""
+        return self.end - self.position
+
+    @property
+    def released(self) -> bool:
+        """Returns True, if the voice is fading out to stop."""
+        return self.samples is not None and self.end < len(self.samples)
+
+
+    def release(self) -> bool:
+        """Starts fading out from the current position. Returns False without fadeOut."""
+        if self.fadeOut <= 0:
+            return False
+        self.end = min(self.end, self.position + self.fadeOut)
+        return True
+
+
+    def envelopeAt(self, position: int) -> float:
+        """Returns the gain of the fades at position, like envelope."""
+        gain = 1.0
+        if position < self.fadeIn:
+            gain = (position + 1.0) / self.fadeIn
+        if self.fadeOut > 0 and self.end - position < self.fadeOut:
+            gain = min(gain, (self.end - position) / self.fadeOut)
+        return min(max(gain, 0.0), 1.0)
+
+
+    def envelope(self, n: int) -> np.ndarray | None:
+        """Returns the gains of the next n frames with shape (n, 1) or None, if all are 1.0."""
+        position = self.position
+        fadingIn = position < self.fadeIn
+        fadingOut = self.fadeOut > 0 and self.end - (position + n) < self.fadeOut
+        if not (fadingIn or fadingOut):
+            return None
+
+        t = np.arange(position, position + n, dtype=np.float32)
+        gain = np.ones(n, dtype=np.float32)
+        if fadingIn:
+            np.minimum(gain, (t + 1.0) / self.fadeIn, out=gain)
+        if fadingOut:
+            # Covers both the end of the samples and a release
+            np.minimum(gain, (self.end - t) / self.fadeOut, out=gain)
+        np.clip(gain, 0.0, 1.0, out=gain)
+        return gain[:, None]
+
+
+
+# ########################################
+#               RENDERER
+# ########################################
+class Renderer:
+    """
+    Owns the voice pool and mixes it, on the audio thread or, without one, on the thread of the caller.
+    The mixer hands it commands through one bounded queue and gets events back through another:
+    voices ending, their first rendered block and meter levels.
+    Both queues are deques, only appended and popped, no lock is ever taken.
+    Commands run right before the next block is rendered.
+    """
+
+    COMMAND_QUEUE_SIZE = 1024
+    # Holds all voices ending and their meters during a long stall of the GUI
+    EVENT_QUEUE_SIZE = 4096
+
+    def __init__(self, trackLatency: bool = False) -> None:
+        self.commands: deque[tuple] = deque()
+        self.events: deque[tuple] = deque()
+        # Called on the audio thread when events wait, signalled until the mixer drains them
+        self.notify = None
+        self.signalled = False
+        # Set when an event was lost to the full queue, the mixer then asks for all playing voices
+        self.overflowed = False
+        # Frames rendered but not played yet, set by the output
+        self.bufferedFrames = lambda: 0
+
+        self._pool: list[Voice] = [Voice() for _ in range(Mixer.DEFAULT_POLYPHONY)]
+        self._playing: dict[str, int] = {}     # key: number of voices
+        self._active = 0
+        self._stealing = Mixer.DEFAULT_STEALING
+        self._trackLatency = trackLatency
+        self.steals = 0
+
+
+    #  COMMANDS
+    # ----------
+    def start(self, key: str, samples: np.ndarray, fadeIn: int, fadeOut: int, overlap: bool, gain: float, serial: int):
+        """Starts a voice for key, see Mixer.start."""
+        voice = None
+        if not overlap and key in self._playing:
+            # Restart the newest voice of key, drop overlapping ones
+            for other in self._pool:
+                if other.key == key and (voice is None or other.serial > voice.serial):
+                    voice = other
+            for other in self._pool:
+                if other.key == key and other is not voice:
+                    self._free(other)
+        if voice is None:
+            voice = self._freeVoice()
+            self._active += 1
+            self._playing[key] = self._playing.get(key, 0) + 1
+        elif type(voice.samples) is StreamReader:
+            voice.samples.close()
+        voice.assign(key, samples, fadeIn, fadeOut, gain, serial)
+
+
+    def stop(self, key: str, fade: bool):
+        """Stops or, with fade, releases all voices of key."""
+        if key not in self._playing:
+            return
+        for voice in self._pool:
+            if voice.key == key and not (fade and voice.release()):
+                self._free(voice)
+
+
+    def stopAll(self):
+        """Stops all voices."""
+        for voice in self._pool:
+            if voice.key is not None:
+                self._free(voice)
+
+
+    def setPolyphony(self, new: int):
+        """Resizes the pool to new voices, steals the voices above it."""
+        while self._active > new:
+            self._steal()
+        # Keep the playing voices, the pool only changes here, never while triggering
+        voices = [voice for voice in self._pool if voice.key is not None]
+        voices += [voice for voice in self._pool if voice.key is None][:new - len(voices)]
+        voices += [Voice() for _ in range(new - len(voices))]
+        self._pool = voices
+
+
+    def setStealing(self, new: str):
+        self._stealing = new
+
+
+    def postMeters(self):
+        """Posts the meters of all playing keys."""
+        self._post(("meters", self.meters(self.bufferedFrames())))
+
+
+    def replaceSamples(self, replace: Callable, serial: int = None, done: threading.Event = None):
+        """Replaces the samples of playing voices by replace(samples), unless it returns None, see Mixer.replaceSamples."""
+        for voice in self._pool:
+            if voice.key is not None:
+                new = replace(voice.samples)
+                if new is not None:
+                    voice.samples = new
+        if serial is not None:
+            # Posted even to a full queue, the mixer closes the old samples only then
+            self.events.append(("replaced", serial))
+            done.set()
+
+
+    def sync(self):
+        """Posts the serials of all playing voices per key, after events were lost."""
+        self.overflowed = False
+        playing: dict[str, set[int]] = {}
+        for voice in self._pool:
+            if voice.key is not None:
+                playing.setdefault(voice.key, set()).add(voice.serial)
+        self._post(("sync", playing))
+
+
+    #  METHODES
+    # ----------
+    def _post(self, event: tuple):
+        if len(self.events) >= Renderer.EVENT_QUEUE_SIZE:
+            self.overflowed = True
+            return
+        self.events.append(event)
+
+
+    def _freeVoice(self) -> Voice:
+        """Returns a voice of the pool not playing, steals one if there is none."""
+        if self._active < len(self._pool):
+            for voice in self._pool:
+                if voice.key is None:
+                    return voice
+        return self._steal()
+
+
+    def _steal(self) -> Voice:
+        """Stops and returns the voice fading out closest to its end, else the oldest or quietest."""
+        victim = None
+        for voice in self._pool:
+            if voice.released and (victim is None or voice.remaining < victim.remaining):
+                victim = voice
+        if victim is None:
+            quietest = self._stealing == Mixer.STEAL_QUIETEST
+            for voice in self._pool:
+                if voice.key is None:
+                    continue
+                if victim is None or (
+                    voice.level < victim.level if quietest else voice.serial < victim.serial
+                ):
+                    victim = voice
+        log.debug(f"Stealing voice of key '{victim.key}'")
+        self.steals += 1
+        self._free(victim)
+        return victim
+
+
+    def _free(self, voice: Voice):
+        """Ends voice and tells the mixer."""
+        key, serial = voice.key, voice.serial
+        if type(voice.samples) is StreamReader:
+            voice.samples.close()
+        voice.free()
+        self._active -= 1
+        count = self._playing[key] - 1
+        if count:
+            self._playing[key] = count
+        else:
+            del self._playing[key]
+        self._post(("ended", key, serial))
+
+
+    def progress(self, key: str, buffered: int) -> float | None:
+        """
+        Returns the audible position of the newest voice of key between 0.0 and 1.0
+        or None, if key is not playing. buffered frames are rendered, but not played yet.
+        """
+        if key not in self._playing:
+            return None
+        voice = None
+        for other in self._pool:
+            if other.key == key and (voice is None or other.serial > voice.serial):
+                voice = other
+        return min(max((voice.position - buffered) / len(voice.samples), 0.0), 1.0)
+
+
+    def meters(self, buffered: int) -> dict[str, tuple[float, float | None, float | None]]:
+        """
+        Returns progress, peak and RMS of every playing key, like progress for the newest voice.
+        The levels are linear and cover the frames rendered since the last call, with gain and fades.
+        They are computed here, at the rate meters are shown, and not while rendering.
+        Voices of one key add up: the highest peak and the RMS of their sum, as if uncorrelated.
+        Peak and RMS are None, if nothing was rendered since the last call.
+        """
+        newest: dict[str, Voice] = {}
+        levels: dict[str, list] = {}     # key: [peak, mean square]
+        for voice in self._pool:
+            key = voice.key
+            if key is None:
+                continue
+            other = newest.get(key)
+            if other is None or voice.serial > other.serial:
+                newest[key] = voice
+            start, end = voice.metered, voice.position
+            if end <= start:
+                continue
+            voice.metered = end
+            # Flattened, the channels of a frame count like frames
+            block = voice.samples[start:end].reshape(-1)
+            if block.dtype == np.int16:
+                # Scaled afterwards, the peak needs no conversion at all
+                scale = 1.0 / 32768.0
+                values = block.astype(np.float32)
+            else:
+                scale = 1.0
+                block = values = toFloat32(block)
+            # Fades are linear, their gain over the block lies between the gains at its ends
+            first, last = voice.envelopeAt(start), voice.envelopeAt(end - 1)
+            gain = voice.gain * scale
+            peak = max(float(block.max()), -float(block.min())) * gain * max(first, last)
+            square = float(np.dot(values, values)) / len(values) * (gain * (first + last) / 2) ** 2
+            level = levels.get(key)
+            if level is None:
+                levels[key] = [peak, square]
+            else:
+                level[0] = max(level[0], peak)
+                level[1] += square
+
+        meters = {}
+        for key, voice in newest.items():
+            progress = min(max((voice.position - buffered) / len(voice.samples), 0.0), 1.0)
+            level = levels.get(key)
+            if level is None:
+                meters[key] = (progress, None, None)
+            else:
+                meters[key] = (progress, level[0], level[1] ** 0.5)
+        return meters
+
+
+    def render(self, frames: int) -> np.ndarray:
+        """
+        Runs the pending commands and mixes the next frames of all voices.
+        Returns float32 samples of shape (frames, CHANNELS).
+        """
+        commands = self.commands
+        while commands:
+            command, args = commands.popleft()
+            command(*args)
+
+        out = np.zeros((frames, CHANNELS), dtype=np.float32)
+        quietest = self._stealing == Mixer.STEAL_QUIETEST
+        for voice in self._pool:
+            if voice.key is None:
+                continue
+            if voice.position == 0 and self._trackLatency:
+                self._post(("queued", voice.key, time.perf_counter_ns()))
+            # A voice ending inside the block leaves the rest of it silent
+            n = min(frames, voice.remaining)
+            block = toFloat32(voice.samples[voice.position:voice.position + n])
+            gain = voice.envelope(n)
+            if gain is not None:
+                block = block * (gain * voice.gain if voice.gain != 1.0 else gain)
+            elif voice.gain != 1.0:
+                block = block * voice.gain
+            out[:n] += block
+            if quietest and n:
+                voice.level = float(np.abs(block).max())
+            voice.position += n
+            if voice.remaining == 0:
+                self._free(voice)
+
+        np.clip(out, -1.0, 1.0, out=out)
+        if self.events and not self.signalled and self.notify is not None:
+            self.signalled = True
+            self.notify()
+        return out
+
+
+    def renderBytes(self, frames: int, int16: bool) -> bytes:
+        """Mixes the next frames and returns them as float32 or int16 samples."""
+        out = self.render(frames)
+        if int16:
+            return (out * 32767.0).astype(np.int16).tobytes()
+        return out.tobytes()
+
+
+
+# ########################################
+#               OUTPUTS
+# ########################################
+class MixerDevice(QIODevice):
+    """Sequential QIODevice the audio sink pulls the mixed blocks from."""
+
+    def __init__(self, renderer: Renderer, bytesPerFrame: int, int16: bool) -> None:
+        super().__init__()
+        self._renderer = renderer
+        self._bytesPerFrame = bytesPerFrame
+        self._int16 = int16
+
+
+    def isSequential(self) -> bool:
+        return True
+
+
+    def bytesAvailable(self) -> int:
+        return Mixer.BLOCK_FRAMES * self._bytesPerFrame + super().bytesAvailable()
+
+
+    def readData(self, maxlen: int) -> bytes:
+        frames = maxlen // self._bytesPerFrame
+        if frames <= 0:
+            return b""
+        return self._renderer.renderBytes(frames, self._int16)
+
+
+    def writeData(self, data) -> int:
+        return -1
+
+
+class SinkOutput(QObject):
+    """Plays the renderer through a QAudioSink pulling from a MixerDevice. Created on the audio thread."""
+
+    def __init__(self, renderer: Renderer, device, audioFormat) -> None:
+        from PySide6.QtMultimedia import QAudio, QAudioFormat, QAudioSink
+
+        # A QObject, connecting a plain method would create a receiver on the GUI thread
+        super().__init__()
+        self._bytesPerFrame = audioFormat.bytesPerFrame()
+        self._device = MixerDevice(
+            renderer, self._bytesPerFrame, audioFormat.sampleFormat() == QAudioFormat.SampleFormat.Int16
+        )
+        self._device.open(QIODevice.ReadOnly)
+        self._underrunError = QAudio.Error.UnderrunError
+        self.underruns = 0
+
+        self._sink = QAudioSink(device, audioFormat)
+        self._sink.setBufferSize(self._bytesPerFrame * SAMPLE_RATE * Mixer.BUFFER_MS // 1000)
+        # Full scale, the gains of the keys are applied by the renderer
+        self._sink.setVolume(1.0)
+        self._sink.stateChanged.connect(self._stateChanged)
+        # The device never runs dry, the sink keeps running until stopped
+        self._sink.start(self._device)
+
+
+    def bufferedFrames(self) -> int:
+        return (self._sink.bufferSize() - self._sink.bytesFree()) // self._bytesPerFrame
+
+
+    def _stateChanged(self, state):
+        if self._sink.error() == self._underrunError:
+            self.underruns += 1
+
+
+    def stop(self):
+        self._sink.stop()
+        self._device.close()
+
+
+def defaultSinkOutput(renderer: Renderer) -> SinkOutput:
+    """Opens a SinkOutput on the default audio device. Called on the audio thread, QtMultimedia is loaded here."""
+    from PySide6.QtMultimedia import QAudioFormat, QMediaDevices
+
+    # Output format, float when the device supports it
+    device = QMediaDevices.defaultAudioOutput()
+    audioFormat = QAudioFormat()
+    audioFormat.setSampleRate(SAMPLE_RATE)
+    audioFormat.setChannelCount(CHANNELS)
+    audioFormat.setSampleFormat(QAudioFormat.SampleFormat.Float)
+    if not device.isFormatSupported(audioFormat):
+        audioFormat.setSampleFormat(QAudioFormat.SampleFormat.Int16)
+    log.info(f"Mixer output: {SAMPLE_RATE} Hz, {CHANNELS} channels, {audioFormat.sampleFormat().name}")
+    return SinkOutput(renderer, device, audioFormat)
+
+
+class NullOutput(QObject):
+    """
+    Plays into nothing by the wall clock, for machines without audio output and for the benchmarks.
+    Holds BUFFER_MS of audio like the sink and refills it every POLL_MS.
+    When the audio thread comes back too late, the buffer has run empty and counts as underrun.
+    With a path the audio is written to a 16 bit wave file.
+    Created on the audio thread.
+    """
+
+    POLL_MS = 5
+
+    def __init__(self, renderer: Renderer, path: PathLike | str = None) -> None:
+        super().__init__()
+        self._renderer = renderer
+        self._wave = None
+        if path is not None:
+            self._wave = wave.open(str(path), 'wb')
+            self._wave.setnchannels(CHANNELS)
+            self._wave.setsampwidth(2)
+            self._wave.setframerate(SAMPLE_RATE)
+        self._capacity = SAMPLE_RATE * Mixer.BUFFER_MS // 1000
+        self._buffered = 0.0
+        self.underruns = 0
+        # Longest time the thread kept the output waiting, in seconds
+        self.longestGap = 0.0
+
+        self._last = time.perf_counter()
+        self._fill()
+        self._timer = QTimer(timerType=Qt.PreciseTimer, interval=NullOutput.POLL_MS)
+        self._timer.timeout.connect(self._pull)
+        self._timer.start()
+
+
+    def bufferedFrames(self) -> int:
+        return int(self._buffered)
+
+
+    @Slot()
+    def _pull(self):
+        """Plays the time passed and refills the buffer block by block."""
+        now = time.perf_counter()
+        gap = now - self._last
+        self.longestGap = max(self.longestGap, gap)
+        self._buffered -= gap * SAMPLE_RATE
+        self._last = now
+        if self._buffered < 0.0:
+            self.underruns += 1
+            self._buffered = 0.0
+        self._fill()
+
+
+    def _fill(self):
+        while self._buffered + Mixer.BLOCK_FRAMES <= self._capacity:
+            block = self._renderer.render(Mixer.BLOCK_FRAMES)
+            if self._wave is not None:
+                self._wave.writeframes((block * 32767.0).astype('<i2').tobytes())
+            self._buffered += Mixer.BLOCK_FRAMES
+
+
+    def stop(self):
+        self._timer.stop()
+        if self._wave is not None:
+            self._wave.close()
+            self._wave = None
+
+
+
+# ########################################
+#               AUDIOTHREAD
+# ########################################
+class AudioThread(QThread):
+    """Runs the output of the mixer in its own event loop, stalls of the GUI never delay it."""
+
+    def __init__(self, renderer: Renderer, output: Callable, parent: QObject = None) -> None:
+        super().__init__(parent)
+        self._renderer = renderer
+        self._createOutput = output
+        # Kept after the thread ended, its statistics stay readable
+        self.output = None
+
+
+    def run(self):
+        try:
+            self.output = self._createOutput(self._renderer)
+        except Exception as e:
+            # Keys keep working and ending in time, only silent
+            log.error(f"Could not open the audio output, playing silently: {e}")
+            self.output = NullOutput(self._renderer)
+        self._renderer.bufferedFrames = self.output.bufferedFrames
+        self.exec()
+        self.output.stop()
+        self._renderer.bufferedFrames = lambda: 0
+
+
+
+# ########################################
+#               MIXER
+# ########################################
+class Mixer(QObject):
+    """
+    Sums all playing voices into a single audio output.
+    Keys start and stop voices, the mixer tells them when their last voice ends.
+    A key plays one voice or, when overlapping, several at once.
+    Voices come from a pool allocated up front, triggering never creates objects.
+    When all voices of the pool play, starting another steals one.
+    Voices end exactly at the last frame of their samples, the
+    start and stop times are already applied by the sample cache.
+
+    The voices are rendered on the audio thread started by prepare. The mixer only posts
+    commands to its renderer and keeps track of which voices play from the events coming back,
+    so a stalled GUI never delays the audio.
+    Before prepare and offline, commands run right away on the calling thread.
+    An offline mixer has no audio output and is rendered by the caller.
+    """
+
+    # Frames rendered per block
+    BLOCK_FRAMES = 512
+    # Size of the sink buffer, keeps the trigger latency low
+    BUFFER_MS = 40
+    # Seconds waitForReplaced waits for the audio thread
+    REPLACE_TIMEOUT = 1.0
+
+    # Voices playing at most
+    DEFAULT_POLYPHONY = 32
+    MAX_POLYPHONY = 256
+
+    # Voice taken when the pool is exhausted. Voices fading out are always taken first.
+    STEAL_OLDEST = "oldest"
+    STEAL_QUIETEST = "quietest"
+    STEALING_MODES = (STEAL_OLDEST, STEAL_QUIETEST)
+    DEFAULT_STEALING = STEAL_OLDEST
+
+    # Signals
+    voiceStateChanged = Signal(
+        str,    # key
+        bool,   # playing
+    )
+    _eventsPosted = Signal()
+
+
+    def __init__(
+            self,
+            parent: QObject = None,
+            offline: bool = False,
+            latency: LatencyTracker = None,
+        ) -> None:
+        super().__init__(parent)
+
+        self._renderer = Renderer(trackLatency=latency is not None)
+        self._playing: dict[str, dict[int, int]] = {}   # key: {serial: fadeOut} of its voices
+        self._serial = 0
+        self._polyphony = Mixer.DEFAULT_POLYPHONY
+        self._stealing = Mixer.DEFAULT_STEALING
+        self._offline = offline
+        self._latency = latency
+        self._meters = {}
+        self._metersRequested = False
+        # Newest serial the renderer reports all voices of, after it lost events
+        self._syncSerial = None
+        # serial: (done, event) of the replacements the audio thread did not report yet
+        self._replacing: dict[int, tuple[Callable, threading.Event]] = {}
+        self._replaceSerial = 0
+        self._eventsPosted.connect(self._drainEvents, Qt.QueuedConnection)
+
+        # The audio thread and output are created by prepare, when the first key gets something to play.
+        # QtMultimedia is only imported on the audio thread, loading its backend slows down the startup.
+        self._output = None
+        self._thread = None
+
+
+    #  PROPERTIES
+    # ------------
+    @property
+    def voiceCount(self) -> int:
+        """Number of playing voices."""
+        return sum(len(voices) for voices in self._playing.values())
+
+    @property
+    def steals(self) -> int:
+        """Number of voices stolen so far."""
+        return self._renderer.steals
+
+    @property
+    def polyphony(self) -> int:
+        """
+        Number of voices in the pool, the most playing at once.
+        Must be an int between 1 and MAX_POLYPHONY. Voices above a lowered limit are stolen.
+        """
+        return self._polyphony
+
+    @polyphony.setter
+    def polyphony(self, new: int):
+        if not (isinstance(new, int) and 1 <= new <= Mixer.MAX_POLYPHONY):
+            log.error(f"Polyphony must be an int between 1 and {Mixer.MAX_POLYPHONY}.")
+            return
+        if self._canPost():
+            self._polyphony = new
+            self._post(self._renderer.setPolyphony, new)
+            log.debug(f"Mixer polyphony set to {new} voices")
+
+    @property
+    def stealing(self) -> str:
+        """Which voice is stolen when the pool is exhausted, one of STEALING_MODES."""
+        return self._stealing
+
+    @stealing.setter
+    def stealing(self, new: str):
+        if new not in Mixer.STEALING_MODES:
+            log.error(f"Voice stealing must be one of {', '.join(Mixer.STEALING_MODES)}.")
+        elif self._canPost():
+            self._stealing = new
+            self._post(self._renderer.setStealing, new)
+
+    @property
+    def is_prepared(self) -> bool:
+        """Returns True, if the audio thread runs."""
+        return self._thread is not None
+
+    @property
+    def output(self):
+        """The output of the audio thread, a SinkOutput or NullOutput, or None before prepare."""
+        return self._thread.output if self._thread is not None else None
+
+
+    #  METHODES
+    # ----------
+    def prepare(self, output: Callable = None):
+        """
+        Starts the audio thread and its output, if they do not run yet.
+        output creates the output from the renderer on the audio thread, e.g. NullOutput
+        to play without sound hardware. Defaults to a SinkOutput on the default audio device.
+        An output failing to open is logged and replaced by a NullOutput.
+        """
+        if self._thread is not None or self._offline:
+            return
+        if output is not None:
+            self._output = output
+        self._renderer.notify = self._eventsPosted.emit
+        self._thread = AudioThread(self._renderer, self._output or defaultSinkOutput, self)
+        self._thread.start(QThread.TimeCriticalPriority)
+
+
+    def release(self):
+        """Stops all voices and the audio thread with its output."""
+        self.stopAll()
+        if self._thread is None:
+            return
+        log.info("Releasing mixer output")
+        self._thread.quit()
+        self._thread.wait()
+        self._thread.deleteLater()
+        self._thread = None
+        self._renderer.notify = None
+        # Commands the thread did not get to run right away now
+        commands = self._renderer.commands
+        while commands:
+            command, args = commands.popleft()
+            command(*args)
+        self._drainEvents()
+
+
+    def start(
+            self,
+            key: str,
+            samples: np.ndarray | StreamSource,
+            fadeIn: int = 0,
+            fadeOut: int = 0,
+            overlap: bool = False,
+            gain: float = 1.0,
+        ) -> bool:
+        """
+        Starts a voice for key. fadeIn and fadeOut are the fade lengths in frames,
+        gain is a linear factor applied while rendering.
+        A voice already playing for key starts over, unless overlap is True,
+        then another voice starts next to the playing ones.
+        Every voice of a StreamSource reads ahead on its own.
+        """
+        if samples is None or len(samples) == 0:
+            return False
+        self.prepare()
+        if not self._canPost():
+            return False
+        if isinstance(samples, StreamSource):
+            # Reads ahead from now on, while the command waits for the audio thread
+            samples = samples.open()
+        self._serial += 1
+        if overlap and key in self._playing:
+            self._playing[key][self._serial] = fadeOut
+        else:
+            self._playing[key] = {self._serial: fadeOut}
+        self._post(self._renderer.start, key, samples, fadeIn, fadeOut, overlap, gain, self._serial)
+        if self._latency is not None:
+            self._latency.mark(key, "started")
+        self.voiceStateChanged.emit(key, True)
+        return True
+
+
+    def stop(self, key: str, fade: bool = False) -> bool:
+        """
+        Stops all voices of key. Returns False, if key is not playing.
+        With fade=True the voices fade out over their fadeOut frames and end afterwards.
+        """
+        voices = self._playing.get(key)
+        if voices is None or not self._canPost():
+            return False
+        if fade:
+            # Voices without fadeOut stop right away
+            for serial in [serial for serial, fadeOut in voices.items() if fadeOut <= 0]:
+                del voices[serial]
+        else:
+            voices.clear()
+        self._post(self._renderer.stop, key, fade)
+        if not voices:
+            self._ended(key)
+        return True
+
+
+    def stopAll(self):
+        """Stops all voices."""
+        if not self._canPost():
+            return
+        self._post(self._renderer.stopAll)
+        for key in list(self._playing):
+            self._ended(key)
+
+
+    def isPlaying(self, key: str) -> bool:
+        """Returns True, if key has a playing voice."""
+        return key in self._playing
+
+
+    def progress(self, key: str) -> float | None:
+        """
+        Returns the audible position of the newest voice of key between 0.0 and 1.0
+        or None, if key is not playing. With the audio thread it is the one of the last meters.
+        """
+        if key not in self._playing:
+            return None
+        if self._thread is None:
+            return self._renderer.progress(key, 0)
+        return self._meters.get(key, (0.0,))[0]
+
+
+    def meters(self) -> dict[str, tuple[float, float | None, float | None]]:
+        """
+        Returns progress, peak and RMS of every playing key, see Renderer.meters.
+        With the audio thread these are the last meters it posted, the call asks for the next ones.
+        """
+        if self._thread is None:
+            return self._renderer.meters(0)
+        if not self._metersRequested and self._canPost():
+            self._metersRequested = True
+            self._post(self._renderer.postMeters)
+        return {key: meter for key, meter in self._meters.items() if key in self._playing}
+
+
+    def render(self, frames: int) -> np.ndarray:
+        """
+        Mixes the next frames of all voices, only for offline mixers.
+        Returns float32 samples of shape (frames, CHANNELS).
+        """
+        out = self._renderer.render(frames)
+        self._drainEvents()
+        return out
+
+
+    def replaceSamples(self, replace: Callable, done: Callable = None):
+        """
+        Replaces the samples of playing voices by replace(samples), unless it returns None,
+        e.g. when their memory is unmapped. The position of the voices is kept.
+        done is called on this thread once the audio thread replaced them, the old samples
+        can be closed then. Without audio thread both happen right away.
+        """
+        if self._thread is None:
+            self._renderer.replaceSamples(replace)
+            if done is not None:
+                done()
+            return
+        self._replaceSerial += 1
+        event = threading.Event()
+        self._replacing[self._replaceSerial] = (done, event)
+        # Posted even to a full queue, the old samples can only be closed afterwards
+        self._renderer.commands.append((self._renderer.replaceSamples, (replace, self._replaceSerial, event)))
+
+
+    def waitForReplaced(self):
+        """
+        Blocks until the audio thread replaced all samples posted, including those posted by their done,
+        at most REPLACE_TIMEOUT seconds each. Only for loading a show over them.
+        """
+        while self._replacing:
+            _, event = self._replacing[min(self._replacing)]
+            if not event.wait(Mixer.REPLACE_TIMEOUT):
+                log.error("The audio thread did not replace the samples in time")
+                return
+            self._drainEvents()
+
+
+    def _canPost(self) -> bool:
+        """Returns False and logs, if the command queue is full."""
+        if self._thread is None or len(self._renderer.commands) < Renderer.COMMAND_QUEUE_SIZE:
+            return True
+        log.error("Mixer command dropped, the audio thread does not keep up")
+        return False
+
+
+    def _post(self, command: Callable, *args):
+        """Runs the command before the audio thread renders its next block, right away without one."""
+        if self._thread is None:
+            command(*args)
+            self._drainEvents()
+        else:
+            self._renderer.commands.append((command, args))
+
+
+    @Slot()
+    def _drainEvents(self):
+        """Handles the events posted by the renderer."""
+        renderer = self._renderer
+        renderer.signalled = False
+        events = renderer.events
+        while events:
+            event = events.popleft()
+            kind = event[0]
+            if kind == "ended":
+                voices = self._playing.get(event[1])
+                # Voices already stopped here are gone
+                if voices is not None and voices.pop(event[2], None) is not None and not voices:
+                    self._ended(event[1])
+            elif kind == "queued":
+                self._latency.mark(event[1], "queued", event[2])
+            elif kind == "meters":
+                self._meters = event[1]
+                self._metersRequested = False
+            elif kind == "sync":
+                self._sync(event[1])
+            elif kind == "replaced":
+                done, _ = self._replacing.pop(event[1])
+                if done is not None:
+                    done()
+        if renderer.overflowed and self._syncSerial is None and self._canPost():
+            log.warning("Mixer events lost, syncing the playing voices")
+            self._syncSerial = self._serial
+            self._post(renderer.sync)
+
+
+    def _sync(self, playing: dict[str, set[int]]):
+        """Ends the voices the renderer does not play anymore, except those started after the sync."""
+        syncSerial, self._syncSerial = self._syncSerial, None
+        for key in list(self._playing):
+            voices = self._playing[key]
+            kept = playing.get(key, ())
+            for serial in [serial for serial in voices if serial <= syncSerial and serial not in kept]:
+                del voices[serial]
+            if not voices:
+                self._ended(key)
+
+
+    def _ended(self, key: str):
+        """Tells the key its last voice ended."""
+        if self._playing.pop(key, None) is not None:
+            self.voiceStateChanged.emit(key, False)
@@ -0,0 +1,693 @@
+# In-memory cache of decoded and trimmed audio samples.
+# Author 9qUmV4
+
+import logging
+import os
+import threading
+import wave
+from collections import OrderedDict
+from collections.abc import Callable
+from os import PathLike
+from pathlib import Path
+
+import numpy as np
+from PySide6.QtCore import QEventLoop, QUrl
+
+from .timeStretch import timeStretch
+
+log = logging.getLogger(__name__)
+
+
+# Format every sample is converted to after decoding
+SAMPLE_RATE = 48000
+CHANNELS = 2
+
+_INT16_SCALE = 1.0 / 32768.0
+
+
+
+# ########################################
+#               FUNCTIONS
+# ########################################
+def msToFrames(ms: int, sampleRate: int = SAMPLE_RATE) -> int:
+    """Converts a time in milliseconds to a number of frames."""
+    return (int(ms) * sampleRate + 500) // 1000
+
+
+def toFloat32(samples: np.ndarray) -> np.ndarray:
+    """Returns the samples as float32 in the range -1.0 to 1.0."""
+    if samples.dtype == np.float32:
+        return samples
+    if samples.dtype == np.int16:
+        return samples.astype(np.float32) * _INT16_SCALE
+    if samples.dtype == np.int32:
+        return (samples.astype(np.float64) * (1.0 / 2147483648.0)).astype(np.float32)
+    if samples.dtype == np.uint8:
+        return (samples.astype(np.float32) - 128.0) * (1.0 / 128.0)
+    return samples.astype(np.float32)
+
+
+def fromFloat32(samples: np.ndarray, dtype) -> np.ndarray:
+    """Converts float32 samples to the given dtype."""
+    if dtype == np.float32:
+        return np.ascontiguousarray(samples, dtype=np.float32)
+    if dtype == np.int16:
+        return np.clip(np.rint(samples * 32767.0), -32768, 32767).astype(np.int16)
+    raise ValueError(f"Unsupported sample dtype '{np.dtype(dtype).name}'")
+
+
+def _toCacheFormat(samples: np.ndarray, sampleRate: int) -> np.ndarray:
+    """Converts float32 samples of shape (frames, channels) to SAMPLE_RATE and CHANNELS."""
+    channels = samples.shape[1]
+    if channels == 1:
+        samples = np.repeat(samples, CHANNELS, axis=1)
+    elif channels > CHANNELS:
+        samples = samples[:, :CHANNELS]
+
+    if sampleRate != SAMPLE_RATE and len(samples) > 1:
+        frames = int(round(len(samples) * SAMPLE_RATE / sampleRate))
+        source_x = np.arange(len(samples), dtype=np.float64)
+        target_x = np.linspace(0.0, len(samples) - 1, frames)
+        samples = np.column_stack(
+            [np.interp(target_x, source_x, samples[:, c]) for c in range(CHANNELS)]
+        ).astype(np.float32)
+
+    return np.ascontiguousarray(samples, dtype=np.float32)
+
+
+def _waveToFloat32(raw: bytes, width: int, channels: int) -> np.ndarray:
+    """Converts raw PCM wave frames to float32 samples of shape (frames, channels)."""
+    if width == 1:
+        samples = np.frombuffer(raw, dtype=np.uint8)
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype='<i2')
+    elif width == 3:
+        # Place the 24 bit samples in the upper bytes of int32
+        packed = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        samples = np.zeros((len(packed), 4), dtype=np.uint8)
+        samples[:, 1:] = packed
+        samples = samples.view('<i4').reshape(-1)
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype='<i4')
+    else:
+        raise wave.Error(f"Unsupported sample width {width}")
+
+    samples = toFloat32(samples.astype(samples.dtype.newbyteorder('=')))
+    return samples.reshape(-1, channels)
+
+
+def _decodeWave(path: Path) -> np.ndarray:
+    """Decodes a PCM wave file with the standard library."""
+    with wave.open(str(path), 'rb') as f_wave:
+        channels = f_wave.getnchannels()
+        width = f_wave.getsampwidth()
+        sampleRate = f_wave.getframerate()
+        raw = f_wave.readframes(f_wave.getnframes())
+
+    return _toCacheFormat(_waveToFloat32(raw, width, channels), sampleRate)
+
+
+def _streamWave(path: Path, callback, chunkFrames: int):
+    """Reads a PCM wave file chunk by chunk with the standard library."""
+    with wave.open(str(path), 'rb') as f_wave:
+        channels = f_wave.getnchannels()
+        width = f_wave.getsampwidth()
+        sampleRate = f_wave.getframerate()
+        while True:
+            raw = f_wave.readframes(chunkFrames)
+            if not raw:
+                break
+            callback(_waveToFloat32(raw, width, channels), sampleRate)
+
+
+def _bufferToArray(buffer) -> np.ndarray:
+    """Converts a QAudioBuffer to float32 samples of shape (frames, channels)."""
+    from PySide6.QtMultimedia import QAudioFormat
+
+    fmt = buffer.format()
+    dtype = {
+        QAudioFormat.SampleFormat.UInt8: np.uint8,
+        QAudioFormat.SampleFormat.Int16: np.int16,
+        QAudioFormat.SampleFormat.Int32: np.int32,
+        QAudioFormat.SampleFormat.Float: np.float32,
+    }[fmt.sampleFormat()]
+    samples = np.frombuffer(buffer.constData(), dtype=dtype, count=buffer.sampleCount())
+    return toFloat32(samples.copy()).reshape(-1, fmt.channelCount())
+
+
+def _streamQt(path: Path, callback):
+    """Decodes any file supported by the multimedia backend with QAudioDecoder."""
+    # Imported on the first file which is not a wave, loading the backend takes a while
+    from PySide6.QtMultimedia import QAudioDecoder, QAudioFormat
+
+    fmt = QAudioFormat()
+    fmt.setSampleRate(SAMPLE_RATE)
+    fmt.setChannelCount(CHANNELS)
+    fmt.setSampleFormat(QAudioFormat.SampleFormat.Float)
+
+    decoder = QAudioDecoder()
+    decoder.setAudioFormat(fmt)
+    decoder.setSource(QUrl.fromLocalFile(str(path)))
+
+    received = False
+    loop = QEventLoop()
+
+    def readBuffer():
+        nonlocal received
+        buffer = decoder.read()
+        if buffer.isValid():
+            received = True
+            callback(_bufferToArray(buffer), buffer.format().sampleRate())
+
+    def decodingChanged(decoding: bool):
+        if not decoding:
+            loop.quit()
+
+    decoder.bufferReady.connect(readBuffer)
+    decoder.isDecodingChanged.connect(decodingChanged)
+    decoder.start()
+    if decoder.isDecoding():
+        loop.exec()
+
+    if decoder.error() != QAudioDecoder.Error.NoError:
+        raise IOError(decoder.errorString())
+    if not received:
+        raise IOError("Decoder returned no audio")
+
+
+def _decodeQt(path: Path) -> np.ndarray:
+    """Decodes a whole file with QAudioDecoder."""
+    chunks = []
+    sampleRate = SAMPLE_RATE
+
+    def collect(chunk, rate):
+        nonlocal sampleRate
+        sampleRate = rate
+        chunks.append(chunk)
+
+    _streamQt(path, collect)
+    return _toCacheFormat(np.concatenate(chunks), sampleRate)
+
+
+def _isWave(path: Path) -> bool:
+    return path.suffix.lower() == ".wav"
+
+
+def decodeFile(path: PathLike | str) -> np.ndarray:
+    """
+    Decodes a whole media file.
+    Returns float32 samples of shape (frames, CHANNELS) at SAMPLE_RATE.
+    """
+    path = Path(path)
+    if _isWave(path):
+        try:
+            return _decodeWave(path)
+        except (wave.Error, EOFError) as e:
+            log.debug(f"Cannot read '{path}' as PCM wave ({e}), using the multimedia backend")
+    return _decodeQt(path)
+
+
+def streamFile(path: PathLike | str, callback, chunkFrames: int = SAMPLE_RATE):
+    """
+    Decodes a media file chunk by chunk without holding it in memory.
+    Calls callback(samples, sampleRate) with float32 samples of shape (frames, channels).
+    Wave files keep their sample rate and channel count.
+    """
+    path = Path(path)
+    if _isWave(path):
+        try:
+            return _streamWave(path, callback, chunkFrames)
+        except (wave.Error, EOFError) as e:
+            log.debug(f"Cannot read '{path}' as PCM wave ({e}), using the multimedia backend")
+    return _streamQt(path, callback)
+
+
+
+# ########################################
+#               STREAMS
+# ########################################
+class StreamSource:
+    """
+    Samples of a long PCM wave file, played straight from disk instead of decoded into memory.
+    Holds only the first prefetch frames, so keys start right away, every voice reads
+    the rest through its own StreamReader. Like the samples array it has a length, dtype and shape.
+    Frames are converted to SAMPLE_RATE and CHANNELS chunk by chunk.
+    """
+
+    # Frames read from the file at once
+    CHUNK_FRAMES = SAMPLE_RATE // 4
+
+    def __init__(self, path: PathLike | str, start: int, stop: int, dtype, prefetch: int) -> None:
+        """start and stop are frames at SAMPLE_RATE, prefetch is the read-ahead in frames."""
+        self.path = Path(path)
+        with wave.open(str(self.path), 'rb') as f_wave:
+            self._channels = f_wave.getnchannels()
+            self._width = f_wave.getsampwidth()
+            self._sampleRate = f_wave.getframerate()
+            self._fileFrames = f_wave.getnframes()
+            self._start = start
+            self.frames = max(stop - start, 0)
+            self.dtype = np.dtype(dtype)
+            self.shape = (self.frames, CHANNELS)
+            self.prefetch = prefetch
+            self.head = self.read(f_wave, 0, min(prefetch, self.frames))
+        self.head.setflags(write=False)
+        # Reads of all voices missing frames not read ahead in time
+        self.underruns = 0
+
+    def __len__(self) -> int:
+        return self.frames
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held in memory, the head."""
+        return self.head.nbytes
+
+
+    def read(self, f_wave: wave.Wave_read, position: int, frames: int) -> np.ndarray:
+        """Reads frames from position on, zero padded past the end of the file."""
+        samples = np.zeros((frames, CHANNELS), dtype=self.dtype)
+        first = self._start + position
+        if self._sampleRate == SAMPLE_RATE:
+            sourceStart, sourceStop = first, min(first + frames, self._fileFrames)
+        else:
+            # Interpolated at absolute source positions, chunks join without a seam
+            x = (first + np.arange(frames)) * (self._sampleRate / SAMPLE_RATE)
+            sourceStart, sourceStop = int(x[0]), min(int(x[-1]) + 2, self._fileFrames)
+        if sourceStart >= sourceStop:
+            return samples
+        f_wave.setpos(sourceStart)
+        chunk = _toCacheFormat(
+            _waveToFloat32(f_wave.readframes(sourceStop - sourceStart), self._width, self._channels), SAMPLE_RATE
+        )
+        if self._sampleRate != SAMPLE_RATE:
+            x = x[x <= sourceStop - 1] - sourceStart
+            source_x = np.arange(len(chunk), dtype=np.float64)
+            chunk = np.column_stack([np.interp(x, source_x, chunk[:, c]) for c in range(CHANNELS)])
+        samples[:len(chunk)] = fromFloat32(chunk[:frames], self.dtype)
+        return samples
+
+
+    def open(self) -> "StreamReader":
+        """Starts reading ahead for a voice."""
+        return StreamReader(self)
+
+
+    def chunks(self):
+        """Yields all frames chunk by chunk, e.g. to write them to a bundle."""
+        with wave.open(str(self.path), 'rb') as f_wave:
+            for position in range(0, self.frames, StreamSource.CHUNK_FRAMES):
+                yield self.read(f_wave, position, min(StreamSource.CHUNK_FRAMES, self.frames - position))
+
+
+class StreamReader:
+    """
+    Plays a StreamSource for one voice and reads like its samples array.
+    A background thread reads ahead of the voice into a ring buffer of prefetch frames,
+    the voice only copies from memory. Frames not read in time play as silence and count as underrun of the source.
+    The ring also keeps HISTORY_FRAMES behind the voice, the meters read them after rendering.
+    """
+
+    HISTORY_FRAMES = SAMPLE_RATE
+
+    def __init__(self, source: StreamSource) -> None:
+        self._source = source
+        self._head = source.head
+        self.dtype = source.dtype
+        self.shape = source.shape
+        self._ring = np.zeros((source.prefetch + StreamReader.HISTORY_FRAMES, CHANNELS), dtype=source.dtype)
+        # Frames read into the ring and frames the voice played, counted from the start
+        self._written = len(self._head)
+        self._consumed = 0
+        self._closed = False
+        self._wake = threading.Event()
+        if self._written < len(source):
+            threading.Thread(target=self._readAhead, name=f"Stream {source.path.name}", daemon=True).start()
+
+    def __len__(self) -> int:
+        return len(self._source)
+
+
+    def __getitem__(self, index: slice) -> np.ndarray:
+        start, stop, _ = index.indices(len(self._source))
+        head = len(self._head)
+        written = self._written
+        if stop > self._consumed:
+            if written < stop:
+                self._source.underruns += 1
+            self._consumed = stop
+            self._wake.set()
+        if stop <= head:
+            return self._head[start:stop]
+
+        out = np.zeros((max(stop - start, 0), CHANNELS), dtype=self.dtype)
+        if start < head:
+            out[:head - start] = self._head[start:]
+        # Older frames are overwritten already
+        first = max(start, head, written - len(self._ring))
+        last = min(stop, written)
+        if first < last:
+            slot = (first - head) % len(self._ring)
+            n = min(last - first, len(self._ring) - slot)
+            out[first - start:first - start + n] = self._ring[slot:slot + n]
+            out[first - start + n:last - start] = self._ring[:last - first - n]
+        return out
+
+
+    def close(self):
+        """Stops reading ahead, called when the voice ends."""
+        self._closed = True
+        self._wake.set()
+
+
+    def _readAhead(self):
+        source = self._source
+        head = len(self._head)
+        ring = len(self._ring)
+        try:
+            with wave.open(str(source.path), 'rb') as f_wave:
+                while not self._closed and self._written < len(source):
+                    frames = min(StreamSource.CHUNK_FRAMES, len(source) - self._written)
+                    if self._written + frames > self._consumed + source.prefetch:
+                        # Full, wait for the voice to play on
+                        self._wake.clear()
+                        if not self._closed and self._written + frames > self._consumed + source.prefetch:
+                            self._wake.wait(0.5)
+                        continue
+                    chunk = source.read(f_wave, self._written, frames)
+                    slot = (self._written - head) % ring
+                    n = min(frames, ring - slot)
+                    self._ring[slot:slot + n] = chunk[:n]
+                    self._ring[:frames - n] = chunk[n:]
+                    self._written += frames
+        except (OSError, wave.Error, EOFError) as e:
+            log.error(f"Cannot stream '{source.path}': {e}")
+
+
+
+# ########################################
+#               SAMPLECACHE
+# ########################################
+class SampleCache:
+    """
+    Holds the decoded audio of the keys in RAM, shared by all keys.
+    Entries are already trimmed to startTime and stopTime and rendered
+    at their playback rate, so playing a key is only a matter of reading memory.
+    Once the entries exceed the byte budget, the least recently used ones are
+    dropped, except pinned entries. Entries of files changed on disk are decoded again.
+    Wave files decoding to more than streamThreshold bytes are not decoded at all,
+    their entry is a StreamSource holding the first prefetch milliseconds.
+    """
+
+    # Default budget in bytes, about 3 hours of stereo int16 audio
+    DEFAULT_BUDGET = 2 * 2**30
+    # Decoded bytes above which wave files are streamed, about 6 minutes of stereo int16 audio
+    STREAM_THRESHOLD = 64 * 2**20
+    # Read-ahead of streamed files in ms
+    DEFAULT_PREFETCH = 4000
+
+
+    def __init__(
+            self,
+            dtype=np.int16,
+            budget: int | None = DEFAULT_BUDGET,
+            streamThreshold: int | None = STREAM_THRESHOLD,
+            prefetch: int = DEFAULT_PREFETCH,
+        ) -> None:
+        """budget None means unbounded, streamThreshold None never streams."""
+        self._dtype = np.dtype(dtype)
+        self._budget = budget
+        self._streamThreshold = streamThreshold
+        self._prefetch = prefetch
+        # Least recently used first
+        self._entries: OrderedDict[tuple, np.ndarray] = OrderedDict()
+        self._fingerprints: dict[tuple, tuple | None] = {}
+        self._pinned: set[tuple] = set()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+
+    #  PROPERTIES
+    # ------------
+    @property
+    def dtype(self) -> np.dtype:
+        """The dtype entries are stored with. Either int16 or float32."""
+        return self._dtype
+
+    @property
+    def bytes_used(self) -> int:
+        """Number of bytes held by all entries."""
+        return self._bytes
+
+    @property
+    def budget(self) -> int | None:
+        """Bytes the entries may use before old ones are dropped. None means unbounded."""
+        return self._budget
+
+    @budget.setter
+    def budget(self, new: int | None):
+        with self._lock:
+            self._budget = new
+            self._evict()
+
+    @property
+    def streamThreshold(self) -> int | None:
+        """Decoded bytes above which wave files are streamed from disk. None never streams."""
+        return self._streamThreshold
+
+    @streamThreshold.setter
+    def streamThreshold(self, new: int | None):
+        self._streamThreshold = new
+
+    @property
+    def prefetch(self) -> int:
+        """Milliseconds read ahead of streaming voices, taking effect for files loaded afterwards."""
+        return self._prefetch
+
+    @prefetch.setter
+    def prefetch(self, new: int):
+        self._prefetch = max(int(new), 1)
+
+
+    #  METHODES
+    # ----------
+    @staticmethod
+    def entryKey(path: PathLike | str, startTime: int, stopTime: int, playbackRate: float = 1.0) -> tuple:
+        """Returns the key an entry is stored with."""
+        return (str(Path(path)), int(startTime), int(stopTime), float(playbackRate))
+
+
+    @staticmethod
+    def fingerprint(path: PathLike | str) -> tuple | None:
+        """Returns modification time and size of path or None, if it cannot be read."""
+        try:
+            info = os.stat(path)
+        except OSError:
+            return None
+        return (info.st_mtime_ns, info.st_size)
+
+
+    def get(
+            self,
+            path: PathLike | str,
+            startTime: int = 0,
+            stopTime: int = 0,
+            playbackRate: float = 1.0,
+        ) -> np.ndarray | StreamSource | None:
+        """
+        Returns the samples of path between startTime and stopTime (0 means end of file)
+        played at playbackRate with unchanged pitch.
+        Decodes and stretches the file on a miss. Returns None if the file cannot be decoded.
+        Long wave files played at their rate are streamed, a StreamSource is returned instead.
+        """
+        key = SampleCache.entryKey(path, startTime, stopTime, playbackRate)
+        with self._lock:
+            samples = self._entries.get(key)
+            known = self._fingerprints.get(key)
+        if samples is not None:
+            # Entries without fingerprint, e.g. from a bundle, and of missing files stay valid
+            current = SampleCache.fingerprint(path) if known is not None else None
+            if current is None or current == known:
+                with self._lock:
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+                    self._hits += 1
+                return samples
+            log.info(f"'{key[0]}' changed on disk, decoding it again")
+            with self._lock:
+                self._invalidations += 1
+                self._remove(key)
+
+        with self._lock:
+            self._misses += 1
+
+        log.debug(f"Sample cache miss for '{key[0]}' ({startTime} ms - {stopTime} ms)")
+        fingerprint = SampleCache.fingerprint(path)
+        if playbackRate == 1.0:
+            source = self._openStream(path, startTime, stopTime)
+            if source is not None:
+                with self._lock:
+                    self._store(key, source, fingerprint)
+                return source
+        try:
+            decoded = decodeFile(path)
+        except Exception as e:
+            log.error(f"Cannot decode '{path}': {e}")
+            return None
+
+        start = min(msToFrames(startTime), len(decoded))
+        stop = len(decoded) if stopTime == 0 else min(max(msToFrames(stopTime), start), len(decoded))
+        samples = decoded[start:stop]
+        if playbackRate != 1.0:
+            samples = timeStretch(samples, playbackRate)
+        samples = fromFloat32(samples, self._dtype)
+        samples.setflags(write=False)
+
+        with self._lock:
+            self._store(key, samples, fingerprint)
+        return samples
+
+
+    def _openStream(self, path: PathLike | str, startTime: int, stopTime: int) -> StreamSource | None:
+        """Returns a StreamSource, if path is a wave file decoding to more than streamThreshold bytes."""
+        path = Path(path)
+        if self._streamThreshold is None or not _isWave(path):
+            return None
+        try:
+            with wave.open(str(path), 'rb') as f_wave:
+                frames = f_wave.getnframes() * SAMPLE_RATE // f_wave.getframerate()
+        except (OSError, wave.Error, EOFError):
+            return None
+        start = min(msToFrames(startTime), frames)
+        stop = frames if stopTime == 0 else min(max(msToFrames(stopTime), start), frames)
+        if (stop - start) * CHANNELS * self._dtype.itemsize <= self._streamThreshold:
+            return None
+
+        log.info(f"Streaming '{path}' ({(stop - start) / SAMPLE_RATE / 60:.0f} min) from disk")
+        try:
+            return StreamSource(path, start, stop, self._dtype, msToFrames(self._prefetch))
+        except (OSError, wave.Error, EOFError) as e:
+            log.error(f"Cannot stream '{path}': {e}")
+            return None
+
+
+    def insert(
+            self,
+            path: PathLike | str,
+            startTime: int,
+            stopTime: int,
+            playbackRate: float,
+            samples: np.ndarray,
+        ) -> None:
+        """
+        Stores samples created elsewhere, e.g. mapped from a show bundle.
+        Samples with the cache dtype are stored without a copy.
+        They are not checked against the file, it may not even exist.
+        """
+        if samples.dtype != self._dtype:
+            samples = fromFloat32(toFloat32(samples), self._dtype)
+        elif samples.flags.writeable:
+            samples = samples.view()
+        samples.setflags(write=False)
+        with self._lock:
+            self._store(SampleCache.entryKey(path, startTime, stopTime, playbackRate), samples, None)
+
+
+    def _store(self, key: tuple, samples: np.ndarray, fingerprint: tuple | None):
+        """Adds an entry and drops old ones beyond the budget. Call with the lock held."""
+        self._remove(key)
+        self._entries[key] = samples
+        self._fingerprints[key] = fingerprint
+        self._bytes += samples.nbytes
+        self._evict()
+
+
+    def _remove(self, key: tuple):
+        """Drops an entry. Call with the lock held."""
+        samples = self._entries.pop(key, None)
+        if samples is not None:
+            self._bytes -= samples.nbytes
+            del self._fingerprints[key]
+
+
+    def _evict(self):
+        """Drops least recently used entries, until the budget is met. Call with the lock held."""
+        if self._budget is None or self._bytes <= self._budget:
+            return
+        for key in list(self._entries):
+            if self._bytes <= self._budget:
+                return
+            if key not in self._pinned:
+                self._remove(key)
+                self._evictions += 1
+        log.warning(f"Pinned samples use {self._bytes} bytes, more than the budget of {self._budget} bytes")
+
+
+    def contains(
+            self,
+            path: PathLike | str,
+            startTime: int = 0,
+            stopTime: int = 0,
+            playbackRate: float = 1.0,
+        ) -> bool:
+        """Returns True if the samples are cached."""
+        with self._lock:
+            return SampleCache.entryKey(path, startTime, stopTime, playbackRate) in self._entries
+
+
+    def pin(self, keys) -> None:
+        """
+        Replaces the pinned entries by keys. Pinned entries are never dropped for the budget,
+        keys not cached yet are pinned once they are stored.
+        """
+        with self._lock:
+            self._pinned = {key for key in keys if key is not None}
+            self._evict()
+
+
+    def retain(self, keys) -> None:
+        """Drops every entry whose key is not in keys."""
+        keys = set(keys)
+        with self._lock:
+            for key in list(self._entries):
+                if key not in keys:
+                    self._remove(key)
+
+
+    def replace(self, replace: Callable) -> None:
+        """Replaces the samples of every entry by replace(samples), unless it returns None."""
+        with self._lock:
+            for key, samples in self._entries.items():
+                new = replace(samples)
+                if new is not None:
+                    self._bytes += new.nbytes - samples.nbytes
+                    self._entries[key] = new
+
+
+    def clear(self) -> None:
+        """Drops all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._fingerprints.clear()
+            self._bytes = 0
+
+
+    def report(self) -> dict:
+        """Returns the counters and memory usage."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else None,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "bytes_used": self._bytes,
+                "bytes_pinned": sum(self._entries[key].nbytes for key in self._pinned if key in self._entries),
+                "budget": self._budget,
+            }
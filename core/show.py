@@ -1,55 +1,183 @@
 # Show class to hold settings for one show.
 # Author 9qUmV4
 
-SHOW_SAVE_FILE_VERSION = "0.1.0"
+SHOW_SAVE_FILE_VERSION = "0.2.0"
 
 import json
 import logging
+import os
+from collections import deque
+from functools import partial
 from os import PathLike
 from pathlib import Path
 from typing import Any
 
 from PySide6.QtCore import Slot
-from PySide6.QtWidgets import QFileDialog
 
-from .keyboard import Keyboard
+from .bundle import BUNDLE_SUFFIX, Bundle, DetachedSamples, isBundle
+from .engine import Engine, splitVoice
+from .mixer import Mixer
+from .sampleCache import SampleCache
+from .showWriter import ShowWriter, readJournal
 
 log = logging.getLogger(__name__)
 
+# Suffixes shows are saved with, a show file or a bundle with the audio
+SHOW_SUFFIX = ".SoundKey"
+SAVE_SUFFIXES = (SHOW_SUFFIX, BUNDLE_SUFFIX)
+
+# Windows cannot rename a file over one mapped into memory
+_REPLACE_MAPPED = os.name != "nt"
+
 class Show:
 
+    # Journal entries after which the show is saved and the journal dropped
+    COMPACT_JOURNAL_ENTRIES = 100
+
 
-    def __init__(self, keyboard_parent) -> None:
+    def __init__(self, keyboard_parent=None, offline: bool = False, journal: bool = True) -> None:
+        """
+        The show is played by engine and shown by keyboard, a Keyboard in keyboard_parent.
+        Without keyboard_parent it runs headless, keyboard is None and no widget is created.
+        With journal=True changes of single keys are appended to a journal
+        next to the show file, until the show is saved the next time.
+        """
         self._show = {}
         self._path = Path()      # Path to save file
+        self._journal = journal
+        self._journalEntries = 0
+        # Bundle of the loaded show, its samples are views of the mapping
+        self._bundle = None
+        # (path, tmp, journal size) of bundles waiting to replace the mapped one
+        self._writtenBundles = deque()
+        self._replacing = False
         
-        self.keyboard = Keyboard(keyboard_parent)
+        self.engine = Engine(keyboard_parent, offline=offline)
+        self.keyboard = None
+        if keyboard_parent is not None:
+            # Imported here, headless the widget modules are not loaded
+            from .keyboard import Keyboard
+            self.keyboard = Keyboard(keyboard_parent, engine=self.engine)
+        self.writer = ShowWriter(self.engine)
+        self.writer.bundleWritten.connect(self._replaceBundles)
 
+        self.engine.settingsChanged.connect(self._journalChange)
 
-    def load(self, path: PathLike):
+
+    def load(self, path: PathLike, asynchronous: bool = False):
+        """
+        Loads the show file at path.
+        With asynchronous=True the audio files are checked and decoded in the background,
+        progress is reported by engine.loader.
+        Bundles are always loaded right away, their audio is only mapped into memory.
+        Changes in the journal of the show are applied on top.
+        """
+        # A save still running may be writing this file
+        self.writer.waitForDone()
+        self._replaceBundles()
+        self.engine.mixer.waitForReplaced()
         self._path = Path(path)
         log.info(f"Loading Show file '{self._path}'")
-        with self._path.open('r') as f_show:
-            show = json.load(f_show)
+        if isBundle(self._path):
+            self._loadBundle()
+        else:
+            self._bundle = None
+            with self._path.open('r') as f_show:
+                self._show = json.load(f_show)
+            self._readBanks()
+            self._replayJournal()
+            self._applyMixerSettings()
+
+            banks = self._show["banks"]
+            self.engine.setBanks(banks)
+            self._setShowPath()
+            if asynchronous:
+                self.engine.updateSettingsAsync(**banks[0])
+            else:
+                self.engine.updateSettings(**banks[0])
+            self.engine.preloadBanks()
+
+        if self._journalEntries and self._can_save:
+            # Fold the journal into the show file
+            self.save()
+
+
+    def _readBanks(self):
+        """Converts shows of version 0.1.0, holding one keyboard, to a list of banks."""
+        if "banks" not in self._show:
+            self._show["banks"] = [self._show.pop("keyboard", {})]
+
+
+    def _replayJournal(self):
+        """Applies the changes stored in the journal to the loaded show."""
+        changes = readJournal(self._path) if self._journal else []
+        banks = self._show["banks"]
+        for bank, key, settings in changes:
+            while len(banks) <= bank:
+                banks.append({})
+            banks[bank][key] = settings
+        self._journalEntries = len(changes)
+        if changes:
+            log.info(f"Replayed {len(changes)} changes from the journal")
+
 
-        self._show = show
-        self.keyboard.updateSettings(**show["keyboard"])
+    def _applyMixerSettings(self):
+        """Sets polyphony and voice stealing of the mixer, shows without them use the defaults."""
+        mixer = self.engine.mixer
+        settings = self._show.get("mixer", {})
+        mixer.polyphony = settings.get("polyphony", Mixer.DEFAULT_POLYPHONY)
+        mixer.stealing = settings.get("stealing", Mixer.DEFAULT_STEALING)
+
+
+    def _loadBundle(self):
+        """Maps the bundle at _path and hands its samples to the sample cache without copying."""
+        bundle = self._bundle = Bundle(self._path)
+        self._show = bundle.show
+        self._readBanks()
+        self._replayJournal()
+        self._applyMixerSettings()
+        self.engine.loader.cancel()
+        samples = {voice: (bundle.settings(voice), bundle.samples(voice)) for voice in bundle.keys()}
+        for settings, sample in samples.values():
+            # Cached as well, so editing other settings of a key keeps its audio
+            self.engine.sampleCache.insert(*settings, sample)
+
+        banks = self._show["banks"]
+        self.engine.setBanks(banks, samples)
+        self._setShowPath()
+        firstBank = {splitVoice(voice)[0]: s for voice, s in samples.items() if splitVoice(voice)[1] == 0}
+        self.engine.updateSettingsWithSamples(firstBank, **banks[0])
+        self.engine.preloadBanks()
 
 
     def new(self):
         log.info("Loading new Show")
         self._show = {}
         self._path = Path()
-        self.keyboard.new()
+        self._journalEntries = 0
+        self._bundle = None
+        self.engine.new()
+        self._applyMixerSettings()
+        self._setShowPath()
         log.info("Suceccfully loaded new Show")
 
 
+    def _setShowPath(self):
+        """Stores loudness and, with a keyboard, waveform peaks next to the show file."""
+        if self.keyboard is not None:
+            self.keyboard.setShowPath(self._path)
+        else:
+            self.engine.setShowPath(self._path)
+
+
     @Slot()
     def load_gui(self):
+        from PySide6.QtWidgets import QFileDialog
+
         file_path, _ = QFileDialog.getOpenFileName(
             caption="Open Show",
             dir=str(self._path.parent),
-            filter="SoundKey File (*.SoundKey);;Any (*)",
+            filter=f"SoundKey File (*.SoundKey *{BUNDLE_SUFFIX});;Any (*)",
         )
         if file_path == "":
             log.info("File dialog 'Open Show' canceled by user")
@@ -57,24 +185,36 @@ class Show:
         else:
             file_path = Path(file_path)
             log.debug(f"File dialog 'Open Show' closed returning '{file_path}'")
-            self.load(file_path)
+            self.load(file_path, asynchronous=True)
 
 
     def save(
         self,
         ):
+        """
+        Saves the show in the background. The file is replaced atomically
+        and the journal is dropped once the new file is on disk.
+        """
         if self._can_save:
             self._show["version"] = SHOW_SAVE_FILE_VERSION
-            self._show["keyboard"] = self.keyboard.getSettings()
-
-            log.info(f"Creating SoundKey file: '{self._path}'")
-            with self._path.open('w') as f_show:
-                log.info(f"Creating json")
-                d_show = ShowEncoder().encode(self._show)
-                log.info(f"Writing data to file")
-                f_show.write(d_show)
+            self._show["banks"] = self.engine.getBanks()
+            self._show["mixer"] = {
+                "polyphony": self.engine.mixer.polyphony,
+                "stealing": self.engine.mixer.stealing,
+            }
+            self._setShowPath()
 
-            log.info(f"Saved show suceccfully")
+            log.info(f"Creating json")
+            d_show = ShowEncoder().encode(self._show)
+            if self._path.suffix == BUNDLE_SUFFIX:
+                log.info(f"Creating SoundKey bundle: '{self._path}'")
+                mapped = self._bundle is not None and self._bundle.path == self._path
+                # Decoded by the writer, only settings and mapped samples are handed over
+                self.writer.saveBundle(self._path, d_show, self.engine.getSamples(), self.engine.sampleCache, mapped)
+            else:
+                log.info(f"Creating SoundKey file: '{self._path}'")
+                self.writer.saveShow(self._path, d_show)
+            self._journalEntries = 0
         
         else:
             log.warning("Can not save, no save path exists")
@@ -83,10 +223,13 @@ class Show:
         
 
     def save_gui(self, **kwargs):
-        file_path, _ = QFileDialog.getSaveFileName(
+        from PySide6.QtWidgets import QFileDialog
+
+        bundleFilter = f"SoundKey Bundle with audio (*{BUNDLE_SUFFIX})"
+        file_path, selectedFilter = QFileDialog.getSaveFileName(
             caption="Save Show",
             dir=str(self._path.parent),
-            filter="SoundKey File (*.SoundKey);;Any (*)",
+            filter=f"SoundKey File (*{SHOW_SUFFIX});;{bundleFilter};;Any (*)",
         )
         if file_path == "":
             log.info("File dialog 'Open Show' canceled by user")
@@ -94,13 +237,118 @@ class Show:
         else:
             file_path = Path(file_path)
             log.debug(f"File dialog 'Open Show' closed returning '{file_path}'")
-        # TODO Check filepath
-        self._path = Path(file_path)
+        if file_path.suffix == "":
+            # Named without suffix, saved as the type of file chosen
+            file_path = file_path.with_name(
+                file_path.name + (BUNDLE_SUFFIX if selectedFilter == bundleFilter else SHOW_SUFFIX)
+            )
+        elif file_path.suffix not in SAVE_SUFFIXES:
+            log.error(f"Cannot save show as '{file_path}', the file name must end with {' or '.join(SAVE_SUFFIXES)}")
+            return None
+        self._path = file_path
         self.save(**kwargs)
 
 
+    @Slot()
+    def _replaceBundles(self):
+        """Replaces the mapped bundle by the bundles the writer wrote next to it, one after another."""
+        self._writtenBundles.extend(self.writer.takeWrittenBundles())
+        if not self._replacing:
+            self._replaceNextBundle()
+
+
+    def _replaceNextBundle(self):
+        """
+        Replaces the mapped bundle by the next one the writer wrote next to it and maps the new file.
+        The keys, the sample cache and the playing voices move to the new mapping,
+        the old one is closed once the audio thread let go of it.
+        """
+        if not self._writtenBundles:
+            return
+        path, tmp, journalSize = self._writtenBundles.popleft()
+        old = self._bundle
+        if old is None or old.path != path:
+            # Not mapped anymore
+            self.writer.replaceBundle(path, tmp, journalSize)
+            self._replaceNextBundle()
+            return
+        self._replacing = True
+        if _REPLACE_MAPPED:
+            if not self.writer.replaceBundle(path, tmp, journalSize):
+                self._bundleReplaced()
+                return
+            self._bundle = Bundle(path)
+            self._remapBundle(old, self._bundle, partial(self._bundleReplaced, old))
+        else:
+            # The mapping is closed first, meanwhile its samples read as silence
+            self.engine.replaceSamples(
+                partial(Show._detach, old), partial(self._bundleDetached, old, path, tmp, journalSize)
+            )
+
+
+    def _bundleDetached(self, old: Bundle, path: Path, tmp: Path, journalSize: int):
+        """The audio thread let go of old. Closes it and maps the bundle written to tmp in its place."""
+        if not self._closeBundle(old):
+            self.writer.discardBundle(path, tmp, f"The samples of '{path}' are still in use")
+            self._remapBundle(old, old, self._bundleReplaced)
+            return
+        # Mapped again, even if the old file stays
+        self.writer.replaceBundle(path, tmp, journalSize)
+        self._bundle = Bundle(path)
+        self._remapBundle(old, self._bundle, self._bundleReplaced)
+
+
+    def _bundleReplaced(self, old: Bundle = None):
+        """Closes old, once the audio thread plays the new mapping, and replaces the next bundle."""
+        if old is not None:
+            self._closeBundle(old)
+        self._replacing = False
+        self._replaceNextBundle()
+
+
+    @staticmethod
+    def _detach(bundle: Bundle, samples):
+        settings = bundle.settingsOf(samples)
+        return None if settings is None else DetachedSamples(settings, samples)
+
+
+    def _remapBundle(self, old: Bundle, new: Bundle, done=None):
+        """
+        Replaces every view of old and every DetachedSamples by the samples of new with the same settings.
+        done is called once the audio thread plays them.
+        """
+        views = {SampleCache.entryKey(*new.settings(voice)): new.samples(voice) for voice in new.keys()}
+
+        def remap(samples):
+            settings = samples.settings if isinstance(samples, DetachedSamples) else old.settingsOf(samples)
+            return None if settings is None else views.get(SampleCache.entryKey(*settings))
+
+        self.engine.replaceSamples(remap, done)
+
+
+    @staticmethod
+    def _closeBundle(bundle: Bundle) -> bool:
+        """Closes the mapping of bundle. Returns False, if a view of it is still used."""
+        try:
+            bundle.close()
+        except BufferError:
+            log.warning(f"Samples of '{bundle.path}' are still in use, the mapping stays open")
+            return False
+        return True
+
+
     #  PROPERTIES
     # ------------
+    @property
+    def path(self) -> Path:
+        """Path of the show file, empty for a new show."""
+        return self.__path
+
+    @property
+    def can_save(self) -> bool:
+        """Returns True, if the show has a path it can be saved to."""
+        return self._can_save
+
     @property
     def _path(self) -> Path:
         return self.__path
@@ -110,7 +358,22 @@ class Show:
         new = Path(new)
         log.info(f"New save path: '{new}'")
         self.__path = new
-        self._can_save = new.suffix == ".SoundKey"
+        self._can_save = new.suffix in SAVE_SUFFIXES
+
+
+    #  SLOTS
+    # -------
+    @Slot(int, str, dict)
+    def _journalChange(self, bank: int, key: str, settings: dict):
+        """Appends the changed settings of key to the journal, saves the show once it grows too long."""
+        if not (self._journal and self._can_save):
+            return
+        self.writer.appendJournal(
+            self._path, ShowEncoder().encode({"bank": bank, "key": key, "settings": settings})
+        )
+        self._journalEntries += 1
+        if self._journalEntries >= Show.COMPACT_JOURNAL_ENTRIES:
+            self.save()
 
 
 class ShowEncoder(json.JSONEncoder):
@@ -0,0 +1,121 @@
+# Loads the audio of a show in the background.
+# Author 9qUmV4
+
+import logging
+import queue
+from functools import partial
+from pathlib import Path
+
+from PySide6.QtCore import QObject, QThread, QThreadPool, QTimer, Signal
+
+from .sampleCache import SampleCache
+
+log = logging.getLogger(__name__)
+
+
+class ShowLoader(QObject):
+    """
+    Checks the files of many keys and decodes them into the sample cache
+    using a thread pool. Results are collected and handed back to the
+    GUI thread in batches, so keys become playable while the rest is loading.
+    """
+
+    # Interval the finished keys are applied in
+    BATCH_INTERVAL_MS = 50
+
+    # Signals
+    batchLoaded = Signal(
+        list,   # [(request key, (path, startTime, stopTime, playbackRate), sample or None), ...]
+    )
+    progress = Signal(
+        int,    # done
+        int,    # total
+    )
+    finished = Signal()
+
+
+    def __init__(self, sampleCache: SampleCache, parent: QObject = None) -> None:
+        super().__init__(parent)
+
+        self._sampleCache = sampleCache
+        self._results = queue.SimpleQueue()
+        self._generation = 0
+        self._done = 0
+        self._total = 0
+
+        # Many files may sit on slow network shares, so use more threads than cores
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max(4, QThread.idealThreadCount()))
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(ShowLoader.BATCH_INTERVAL_MS)
+        self._timer.timeout.connect(self._applyResults)
+
+
+    #  PROPERTIES
+    # ------------
+    @property
+    def is_loading(self) -> bool:
+        """Returns True while files are loaded."""
+        return self._done < self._total
+
+
+    #  METHODES
+    # ----------
+    def load(self, requests: dict):
+        """
+        Starts loading. requests maps any key to a tuple (path, startTime, stopTime, playbackRate)
+        as taken by SampleCache.get. A load still running is canceled.
+        """
+        self.cancel()
+        self._total = len(requests)
+        log.info(f"Loading {self._total} files in the background")
+        for key, settings in requests.items():
+            self._pool.start(partial(self._prepare, self._generation, key, tuple(settings)))
+        self.progress.emit(0, self._total)
+        if self._total == 0:
+            self.finished.emit()
+        else:
+            self._timer.start()
+
+
+    def cancel(self):
+        """Cancels a running load. Results still arriving are dropped."""
+        self._generation += 1
+        self._pool.clear()
+        self._timer.stop()
+        self._done = 0
+        self._total = 0
+
+
+    def _prepare(self, generation, key, settings):
+        """Runs in the thread pool. Checks, decodes and stretches one file."""
+        if generation != self._generation:
+            return
+        sample = None
+        # Cached samples, e.g. from a show bundle, load even if the file is gone
+        if Path(settings[0]).is_file() or self._sampleCache.contains(*settings):
+            sample = self._sampleCache.get(*settings)
+        self._results.put((generation, (key, settings, sample)))
+
+
+    def _applyResults(self):
+        """Runs on the GUI thread. Hands all finished keys over in one batch."""
+        batch = []
+        while True:
+            try:
+                generation, result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if generation == self._generation:
+                batch.append(result)
+
+        if not batch:
+            return
+        self._done += len(batch)
+        self.batchLoaded.emit(batch)
+        self.progress.emit(self._done, self._total)
+        if self._done >= self._total:
+            self._timer.stop()
+            log.info(f"Finished loading {self._total} files")
+            self.finished.emit()
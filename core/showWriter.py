@@ -0,0 +1,253 @@
+# Writes show files in the background, atomically, and keeps a journal of small changes.
+# Author 9qUmV4
+
+import itertools
+import json
+import logging
+import os
+from collections import deque
+from functools import partial
+from os import PathLike
+from pathlib import Path
+
+from PySide6.QtCore import QObject, QThreadPool, Signal
+
+from .bundle import writeBundle
+from .sampleCache import SampleCache
+
+log = logging.getLogger(__name__)
+
+
+JOURNAL_SUFFIX = ".SoundKeyJournal"
+
+
+
+# ########################################
+#               FUNCTIONS
+# ########################################
+def syncDirectory(path: Path):
+    """Makes a rename inside the directory path durable. Does nothing where not supported."""
+    if os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomicWrite(path: PathLike | str, data: bytes):
+    """
+    Writes data to a temporary file next to path, syncs it to disk and renames it over path.
+    A crash at any point leaves either the old or the new file, never a truncated one.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open('wb') as f_tmp:
+        f_tmp.write(data)
+        f_tmp.flush()
+        os.fsync(f_tmp.fileno())
+    replaceFile(tmp, path)
+
+
+def replaceFile(tmp: PathLike | str, path: PathLike | str):
+    """Renames tmp, already synced to disk, over path and makes the rename durable."""
+    path = Path(path)
+    os.replace(tmp, path)
+    syncDirectory(path.parent)
+
+
+def journalPath(showPath: PathLike | str) -> Path:
+    """Returns the path of the journal belonging to a show file."""
+    showPath = Path(showPath)
+    return showPath.with_name(showPath.name + JOURNAL_SUFFIX)
+
+
+def readJournal(showPath: PathLike | str) -> list[tuple[int, str, dict]]:
+    """
+    Returns the changes stored in the journal of a show as [(bank, key, settings), ...], oldest first.
+    A line cut off by a crash ends the journal.
+    """
+    path = journalPath(showPath)
+    if not path.is_file():
+        return []
+    changes = []
+    with path.open('r', encoding='utf-8') as f_journal:
+        for line in f_journal:
+            try:
+                entry = json.loads(line)
+                changes.append((entry.get("bank", 0), entry["key"], entry["settings"]))
+            except (ValueError, KeyError):
+                log.warning(f"Journal '{path}' ends with a broken entry, ignoring it")
+                break
+    return changes
+
+
+
+# ########################################
+#               SHOWWRITER
+# ########################################
+class ShowWriter(QObject):
+    """
+    Does all disk writes of a show on one worker thread, in the order they were requested.
+    Full saves are atomic and drop the journal, changes in between are appended to the journal.
+    """
+
+    # Signals, emitted from the worker thread
+    saved = Signal(
+        str,    # path
+    )
+    failed = Signal(
+        str,    # path
+        str,    # error
+    )
+    # A bundle replacing a mapped one was written, see takeWrittenBundles
+    bundleWritten = Signal()
+
+
+    def __init__(self, parent: QObject = None) -> None:
+        super().__init__(parent)
+
+        # One thread keeps the writes in order
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        # (path, tmp) of bundles written next to their mapped file
+        self._written = deque()
+        self._tmpSerial = itertools.count()
+
+
+    #  METHODES
+    # ----------
+    def saveShow(self, path: PathLike | str, data: str):
+        """Writes the encoded show to path."""
+        self._pool.start(partial(self._save, Path(path), partial(atomicWrite, path, data.encode('utf-8'))))
+
+
+    def saveBundle(self, path: PathLike | str, data: str, samples: dict, sampleCache: SampleCache, mapped: bool = False):
+        """
+        Writes the encoded show and samples as bundle to path, see writeBundle.
+        samples are {voice: (settings, samples)} like Engine.getSamples, samples being None
+        are taken from sampleCache on the worker, decoding them there.
+        With mapped=True the bundle at path is mapped into memory and cannot be replaced by the worker.
+        The new bundle is only written next to it, bundleWritten asks to replace it with replaceBundle.
+        """
+        path = Path(path)
+        # Unique, a later save must not overwrite a bundle still waiting to replace the mapped one
+        tmp = path.with_name(f"{path.name}.{next(self._tmpSerial)}.tmp")
+        self._pool.start(partial(self._saveBundle, path, tmp, data, samples, sampleCache, mapped))
+
+
+    def takeWrittenBundles(self) -> list[tuple[Path, Path, int]]:
+        """
+        Returns (path, tmp, journal size) of the bundles written next to their mapped file since the last call.
+        The journal size is the length of the journal the bundle contains.
+        """
+        written = []
+        while self._written:
+            written.append(self._written.popleft())
+        return written
+
+
+    def replaceBundle(self, path: Path, tmp: Path, journalSize: int) -> bool:
+        """
+        Renames the bundle written to tmp over path, once its mapping is closed. Runs on the calling thread.
+        The first journalSize bytes of the journal, contained in the bundle, are dropped by the worker
+        after the writes requested before. Returns False, if it failed, tmp is removed then.
+        """
+        try:
+            replaceFile(tmp, path)
+        except OSError as e:
+            self.discardBundle(path, tmp, str(e))
+            return False
+        self._pool.start(partial(self._dropJournal, journalPath(path), journalSize))
+        log.info(f"Saved show '{path}'")
+        self.saved.emit(str(path))
+        return True
+
+
+    def discardBundle(self, path: Path, tmp: Path, error: str):
+        """Removes the bundle written to tmp, which cannot replace path, and reports error."""
+        log.error(f"Cannot save show '{path}': {error}")
+        tmp.unlink(missing_ok=True)
+        self.failed.emit(str(path), error)
+
+
+    def appendJournal(self, showPath: PathLike | str, line: str):
+        """Appends one encoded change to the journal of the show at showPath."""
+        self._pool.start(partial(self._append, journalPath(showPath), line))
+
+
+    def waitForDone(self):
+        """Blocks until every requested write is done."""
+        self._pool.waitForDone()
+
+
+    def _save(self, path: Path, write):
+        """Runs on the worker. Writes the file and drops the journal it contains now."""
+        try:
+            write()
+            journalPath(path).unlink(missing_ok=True)
+        except OSError as e:
+            log.error(f"Cannot save show '{path}': {e}")
+            self.failed.emit(str(path), str(e))
+            return
+        log.info(f"Saved show '{path}'")
+        self.saved.emit(str(path))
+
+
+    def _saveBundle(self, path: Path, tmp: Path, data: str, samples: dict, sampleCache: SampleCache, mapped: bool):
+        """Runs on the worker. Decodes missing samples, writes the bundle to tmp and replaces path, unless it is mapped."""
+        loaded = {}
+        for voice, (settings, sample) in samples.items():
+            if sample is None:
+                sample = sampleCache.get(*settings)
+            if sample is not None:
+                loaded[voice] = (settings, sample)
+        try:
+            writeBundle(tmp, data, loaded)
+        except OSError as e:
+            self.discardBundle(path, tmp, str(e))
+            return
+        if mapped:
+            # Changes appended from now on are not in the bundle and must stay in the journal
+            journal = journalPath(path)
+            self._written.append((path, tmp, journal.stat().st_size if journal.is_file() else 0))
+            self.bundleWritten.emit()
+            return
+        try:
+            replaceFile(tmp, path)
+            journalPath(path).unlink(missing_ok=True)
+        except OSError as e:
+            self.discardBundle(path, tmp, str(e))
+            return
+        log.info(f"Saved show '{path}'")
+        self.saved.emit(str(path))
+
+
+    def _dropJournal(self, path: Path, size: int):
+        """Runs on the worker. Removes the first size bytes of the journal at path, keeping the changes after them."""
+        try:
+            with path.open('rb') as f_journal:
+                f_journal.seek(size)
+                rest = f_journal.read()
+            if rest:
+                atomicWrite(path, rest)
+            else:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log.error(f"Cannot write journal '{path}': {e}")
+            self.failed.emit(str(path), str(e))
+
+
+    def _append(self, path: Path, line: str):
+        """Runs on the worker. Appends line and syncs it to disk."""
+        try:
+            with path.open('a', encoding='utf-8') as f_journal:
+                f_journal.write(line + "\n")
+                f_journal.flush()
+                os.fsync(f_journal.fileno())
+        except OSError as e:
+            log.error(f"Cannot write journal '{path}': {e}")
+            self.failed.emit(str(path), str(e))
@@ -0,0 +1,68 @@
+# Measures the phases of the application startup.
+# Author 9qUmV4
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+
+
+# ########################################
+#               STARTUPPROFILE
+# ########################################
+class StartupProfile:
+    """
+    Collects the duration of every startup phase and the time of milestones,
+    e.g. the first paint, since start, the perf_counter value the process started at.
+    """
+
+    def __init__(self, start: float) -> None:
+        self._start = start
+        self.phases: dict[str, float] = {}      # name: seconds
+        self.milestones: dict[str, float] = {}  # name: seconds since start
+
+
+    #  METHODES
+    # ----------
+    @contextmanager
+    def phase(self, name: str):
+        """Measures the time spent inside the with block as phase name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addPhase(name, start)
+
+
+    def addPhase(self, name: str, start: float):
+        """Adds the time from start until now to phase name."""
+        self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+
+    def milestone(self, name: str):
+        """Records the time since start, the first time a milestone is reached."""
+        if name not in self.milestones:
+            self.milestones[name] = time.perf_counter() - self._start
+            log.info(f"Startup: {name} after {self.milestones[name] * 1000:.0f} ms")
+
+
+    def report(self) -> dict:
+        """Returns phases and milestones in milliseconds."""
+        return {
+            "phases": {name: round(seconds * 1000, 2) for name, seconds in self.phases.items()},
+            "milestones": {name: round(seconds * 1000, 2) for name, seconds in self.milestones.items()},
+        }
+
+
+    def format(self) -> str:
+        """Returns the report as a table followed by a line of json."""
+        report = self.report()
+        lines = [f"{'phase':24}{'time':>12}"]
+        lines += [f"{name:24}{ms:>9.1f} ms" for name, ms in report["phases"].items()]
+        lines += [f"{'milestone':24}{'after':>12}"]
+        lines += [f"{name:24}{ms:>9.1f} ms" for name, ms in report["milestones"].items()]
+        lines.append(json.dumps(report))
+        return "\n".join(lines)
@@ -0,0 +1,78 @@
+# Changes the playback rate of samples while keeping the pitch.
+# Author 9qUmV4
+
+import numpy as np
+
+# WSOLA settings at 48 kHz: 21 ms segments overlapping by half,
+# each segment may move 5 ms to line up with the previous one
+FRAME = 1024
+HOP = FRAME // 2
+TOLERANCE = 256
+
+# Correlation is computed on every DECIMATION-th sample only
+DECIMATION = 4
+
+# Segments windowed and overlap-added at once, bounds the memory to about 2 MB per block
+BLOCK_SEGMENTS = 256
+
+MIN_RATE = 0.25
+MAX_RATE = 4.0
+
+# Periodic hann window, sums to 1 at half overlap
+_WINDOW = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(FRAME) / FRAME)).astype(np.float32)
+
+
+
+def stretchedFrames(frames: int, rate: float) -> int:
+    """Returns the number of frames playing frames at rate results in."""
+    return int(round(frames / rate))
+
+
+def timeStretch(samples: np.ndarray, rate: float) -> np.ndarray:
+    """
+    Returns samples of shape (frames, channels) played at rate with unchanged pitch.
+    Uses WSOLA (waveform similarity overlap-add): input segments are taken every
+    HOP * rate frames, shifted by up to TOLERANCE frames to match the waveform
+    already written and overlap-added every HOP frames.
+    """
+    if not MIN_RATE <= rate <= MAX_RATE:
+        raise ValueError(f"Playback rate must be between {MIN_RATE} and {MAX_RATE}, got {rate}")
+    if rate == 1.0 or len(samples) == 0:
+        return np.asarray(samples, dtype=np.float32)
+
+    frames = stretchedFrames(len(samples), rate)
+    count = -(-frames // HOP) + 1
+
+    # Frame i covers the output from (i - 1) * HOP to (i + 1) * HOP.
+    # Padding keeps every searched position inside the array.
+    lead = HOP + TOLERANCE
+    tail = FRAME + 2 * TOLERANCE + int(HOP * rate) + 1
+    # Converted to float32 while padding, no other copy of the input is made
+    channels = samples.shape[1]
+    padded = np.zeros((lead + len(samples) + tail, channels), dtype=np.float32)
+    padded[lead:lead + len(samples)] = samples
+    mono = padded.mean(axis=1)
+    nominal = lead - HOP + np.rint(np.arange(count) * HOP * rate).astype(np.int64)
+
+    positions = np.empty(count, dtype=np.int64)
+    positions[0] = nominal[0]
+    offsets = slice(0, FRAME, DECIMATION)
+    for i in range(1, count):
+        # Continue the previous segment naturally and search the nominal position
+        # for the best matching waveform
+        natural = positions[i - 1] + HOP
+        template = mono[natural:natural + FRAME][offsets]
+        low = nominal[i] - TOLERANCE
+        region = mono[low:low + FRAME + 2 * TOLERANCE][::DECIMATION]
+        score = np.correlate(region, template, mode='valid')
+        positions[i] = low + int(np.argmax(score)) * DECIMATION
+
+    # Gather the segments block by block and overlap-add both halves
+    out = np.zeros(((count + 1) * HOP, channels), dtype=np.float32)
+    for first in range(0, count, BLOCK_SEGMENTS):
+        last = min(first + BLOCK_SEGMENTS, count)
+        segments = padded[positions[first:last, None] + np.arange(FRAME)]
+        segments *= _WINDOW[None, :, None]
+        out[first * HOP:last * HOP] += segments[:, :HOP].reshape(-1, channels)
+        out[(first + 1) * HOP:(last + 1) * HOP] += segments[:, HOP:].reshape(-1, channels)
+    return out[HOP:HOP + frames]
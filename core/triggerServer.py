@@ -0,0 +1,490 @@
+# Fires, stops and queries keys over the network: OSC over UDP and a line protocol over TCP.
+# Author 9qUmV4
+
+import asyncio
+import logging
+import struct
+import sys
+import threading
+import time
+from functools import partial
+
+from PySide6.QtCore import QObject, Qt, Signal, Slot
+
+from .engine import Engine, splitVoice
+from .latency import LatencyRing
+
+log = logging.getLogger(__name__)
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_OSC_PORT = 9000
+DEFAULT_TCP_PORT = 9001
+
+# Commands taking a key as first argument and commands without one
+KEY_COMMANDS = ("play", "stop", "toggle", "set", "query")
+COMMANDS = KEY_COMMANDS + ("bank", "stopall", "ping")
+SUBSCRIBE_COMMANDS = ("subscribe", "unsubscribe")
+
+# Reply of commands without a result, not sent over OSC
+OK = ("ok",)
+
+
+
+# ########################################
+#               OSC
+# ########################################
+def _oscString(text: str) -> bytes:
+    data = text.encode() + b"\0"
+    return data + b"\0" * (-len(data) % 4)
+
+
+def _readOscString(data: bytes, offset: int) -> tuple[str, int]:
+    end = data.find(b"\0", offset)
+    if end < 0:
+        raise ValueError("Unterminated OSC string")
+    return data[offset:end].decode(), offset + ((end - offset) // 4 + 1) * 4
+
+
+def oscMessage(address: str, *args) -> bytes:
+    """Encodes an OSC message. Arguments are sent as int, float, bool or string."""
+    tags = ","
+    payload = b""
+    for arg in args:
+        if isinstance(arg, bool):
+            tags += "T" if arg else "F"
+        elif isinstance(arg, int):
+            tags += "i"
+            payload += struct.pack(">i", arg)
+        elif isinstance(arg, float):
+            tags += "f"
+            payload += struct.pack(">f", arg)
+        else:
+            tags += "s"
+            payload += _oscString(str(arg))
+    return _oscString(address) + _oscString(tags) + payload
+
+
+def parseOsc(data: bytes) -> list[tuple[str, list]]:
+    """
+    Returns [(address, arguments), ...] of an OSC message or bundle.
+    The time tags of bundles are ignored, everything is executed right away.
+    Raises ValueError or struct.error for malformed packets.
+    """
+    if data.startswith(b"#bundle\0"):
+        messages = []
+        offset = 16     # '#bundle' and the time tag
+        while offset < len(data):
+            size, = struct.unpack_from(">i", data, offset)
+            offset += 4
+            messages += parseOsc(data[offset:offset + size])
+            offset += size
+        return messages
+
+    address, offset = _readOscString(data, 0)
+    if not address.startswith("/"):
+        raise ValueError(f"Invalid OSC address '{address}'")
+    args = []
+    if offset < len(data):
+        tags, offset = _readOscString(data, offset)
+        for tag in tags[1:]:
+            if tag in "if":
+                args.append(struct.unpack_from(f">{tag}", data, offset)[0])
+                offset += 4
+            elif tag in "dh":
+                args.append(struct.unpack_from(">d" if tag == "d" else ">q", data, offset)[0])
+                offset += 8
+            elif tag in "sS":
+                value, offset = _readOscString(data, offset)
+                args.append(value)
+            elif tag in "TFN":
+                args.append({"T": True, "F": False, "N": None}[tag])
+            else:
+                raise ValueError(f"Unsupported OSC type tag '{tag}'")
+    return [(address, args)]
+
+
+def _convert(current, value):
+    """Converts value received over the network to the type of the current setting."""
+    if isinstance(current, int):
+        return int(value)
+    if isinstance(current, float):
+        return float(value)
+    return str(value)
+
+
+
+# ########################################
+#               TRIGGERSERVER
+# ########################################
+class TriggerServer(QObject):
+    """
+    Lets desks fire, stop and query the cues of the current bank of an engine over the network.
+    An asyncio loop on its own thread receives the commands and hands them to the main thread
+    through a queued signal, where they run like a click on the key. Replies and the playback
+    state broadcast to subscribers are sent from the asyncio thread again.
+
+    OSC over UDP:
+        /key/<key>/play, /key/<key>/stop [fade], /key/<key>/toggle [fade],
+        /key/<key>/set <name> <value>, /key/<key>/query, /bank [bank], /stopall, /ping [...],
+        /subscribe, /unsubscribe
+    Replies go to the sender, e.g. /key/<key>/state <playing> <bank> <label>, /error <message>.
+
+    TCP, one command per line, the same commands with spaces: 'play q', 'set q label Intro'.
+    Every command is answered with one line: 'ok', 'state q 1 0 Intro', 'error ...'.
+    Subscribers get 'state <key> <playing> <bank>' lines or /key/<key>/state messages.
+    The same lines can be read from stdin, see readStdin.
+    """
+
+    DISPATCH_RING_SIZE = 4096
+
+    # Commands received on the asyncio thread, executed on the main thread
+    _command = Signal(object)
+
+    # 'quit' was read from stdin
+    quitRequested = Signal()
+
+
+    def __init__(self, engine: Engine, parent: QObject = None) -> None:
+        super().__init__(parent)
+        self._engine = engine
+        self._thread = None
+        self._loop = None
+        self._error = None
+        self._transport = None
+        self._tcpServer = None
+        self._writers = set()
+        self._oscSubscribers = set()
+        self._tcpSubscribers = set()
+        self._subscribed = 0
+        self.oscPort = None
+        self.tcpPort = None
+
+        # Time from receiving a command until it ran on the main thread, in ms
+        self.dispatch = LatencyRing(TriggerServer.DISPATCH_RING_SIZE)
+
+        self._command.connect(self._execute, Qt.QueuedConnection)
+        self._engine.mixer.voiceStateChanged.connect(self._voiceStateChanged)
+
+
+    #  PROPERTIES
+    # ------------
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None
+
+
+    #  METHODES
+    # ----------
+    def start(self, host: str = DEFAULT_HOST, oscPort: int | None = DEFAULT_OSC_PORT,
+              tcpPort: int | None = DEFAULT_TCP_PORT) -> tuple:
+        """
+        Starts listening on host. A port of None disables the protocol, 0 picks a free port.
+        Returns the bound (oscPort, tcpPort). Raises OSError, if a port can not be bound.
+        """
+        if self._thread is not None:
+            return self.oscPort, self.tcpPort
+        ready = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._serve, args=(host, oscPort, tcpPort, ready), name="TriggerServer", daemon=True,
+        )
+        self._thread.start()
+        ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            self._thread = None
+            raise self._error
+        log.info(f"Trigger server listening on {host}, OSC port {self.oscPort}, TCP port {self.tcpPort}")
+        return self.oscPort, self.tcpPort
+
+
+    def readStdin(self, stream=None, output=None):
+        """
+        Executes the lines read from stream, by default stdin, like TCP lines.
+        Replies go to output, by default stdout. 'quit' emits quitRequested.
+        Needs a started server, its ports may be disabled.
+        """
+        stream = stream if stream is not None else sys.stdin.buffer
+        writer = _StreamWriter(output if output is not None else sys.stdout.buffer)
+        threading.Thread(
+            target=self._readStream, args=(stream, writer), name="TriggerServerStdin", daemon=True,
+        ).start()
+
+
+    def stop(self):
+        """Closes all sockets and stops the asyncio thread."""
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+        self._loop = None
+        self.oscPort = self.tcpPort = None
+        log.info("Trigger server stopped")
+
+
+    #  ASYNCIO THREAD
+    # ----------------
+    def _serve(self, host, oscPort, tcpPort, ready):
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._open(loop, host, oscPort, tcpPort))
+        except OSError as e:
+            self._error = e
+            loop.run_until_complete(self._close())
+            loop.close()
+            ready.set()
+            return
+        self._loop = loop
+        ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(self._close())
+            loop.close()
+
+
+    async def _open(self, loop, host, oscPort, tcpPort):
+        if oscPort is not None:
+            self._transport, _ = await loop.create_datagram_endpoint(
+                partial(_OscProtocol, self), local_addr=(host, oscPort),
+            )
+            self.oscPort = self._transport.get_extra_info("sockname")[1]
+        if tcpPort is not None:
+            self._tcpServer = await asyncio.start_server(self._handleClient, host, tcpPort)
+            self.tcpPort = self._tcpServer.sockets[0].getsockname()[1]
+
+
+    async def _close(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        for writer in list(self._writers):
+            writer.close()
+        if self._tcpServer is not None:
+            self._tcpServer.close()
+            await self._tcpServer.wait_closed()
+            self._tcpServer = None
+        self._oscSubscribers.clear()
+        self._tcpSubscribers.clear()
+        self._subscribed = 0
+
+
+    def _receivedOsc(self, data: bytes, address):
+        received = time.perf_counter()
+        try:
+            messages = parseOsc(data)
+        except (ValueError, struct.error, UnicodeDecodeError) as e:
+            log.warning(f"Dropping malformed OSC packet from {address}: {e}")
+            return
+        reply = partial(self._replyOsc, address)
+        for path, args in messages:
+            parts = path.strip("/").split("/")
+            if len(parts) == 3 and parts[0] == "key":
+                command, key = parts[2], parts[1]
+            elif len(parts) == 1:
+                command, key = parts[0], None
+            else:
+                reply(("error", f"Unknown address '{path}'"))
+                continue
+            if command in SUBSCRIBE_COMMANDS:
+                self._subscribe(self._oscSubscribers, address, command == "subscribe")
+                continue
+            self._submit(command, key, args, received, reply)
+
+
+    async def _handleClient(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while line := await reader.readline():
+                self._receivedLine(line, writer, time.perf_counter())
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            self._subscribe(self._tcpSubscribers, writer, False)
+            writer.close()
+
+
+    def _receivedLine(self, line: bytes, writer, received: float):
+        reply = partial(self._replyLine, writer)
+        words = line.decode(errors="replace").strip().split(maxsplit=3)
+        if not words:
+            return
+        command = words[0].lower()
+        if command in SUBSCRIBE_COMMANDS:
+            self._subscribe(self._tcpSubscribers, writer, command == "subscribe")
+            self._submit(command, None, [], received, reply)
+        elif command in KEY_COMMANDS:
+            self._submit(command, words[1] if len(words) > 1 else None, words[2:], received, reply)
+        else:
+            self._submit(command, None, words[1:], received, reply)
+
+
+    def _readStream(self, stream, writer):
+        """Runs on its own thread, a blocking read of stdin works on every platform."""
+        for line in iter(stream.readline, b""):
+            loop = self._loop
+            if loop is None:
+                return
+            try:
+                if line.strip().lower() == b"quit":
+                    # After the commands before it
+                    loop.call_soon_threadsafe(self.quitRequested.emit)
+                    return
+                loop.call_soon_threadsafe(self._receivedLine, line, writer, time.perf_counter())
+            except RuntimeError:
+                # Stopped in the meantime
+                return
+        log.info("Stdin closed, no more commands are read from it")
+
+
+    def _subscribe(self, subscribers: set, subscriber, subscribe: bool):
+        if subscribe:
+            subscribers.add(subscriber)
+        else:
+            subscribers.discard(subscriber)
+        self._subscribed = len(self._oscSubscribers) + len(self._tcpSubscribers)
+
+
+    def _submit(self, command: str, key: str | None, args: list, received: float, reply):
+        """Hands the command to the main thread. Every reply is sent from there, so they keep their order."""
+        self._command.emit((command, key, args, received, reply))
+
+
+    def _replyOsc(self, address, response: tuple):
+        if response == OK or self._transport is None:
+            return
+        kind, *values = response
+        if kind == "state":
+            key, *values = values
+            message = oscMessage(f"/key/{key}/state", *values)
+        else:
+            message = oscMessage(f"/{kind}", *values)
+        self._transport.sendto(message, address)
+
+
+    def _replyLine(self, writer, response: tuple):
+        if writer.is_closing():
+            return
+        text = " ".join(str(int(value)) if isinstance(value, bool) else str(value) for value in response)
+        writer.write(text.replace("\n", " ").encode() + b"\n")
+
+
+    def _broadcast(self, key: str, bank: int, playing: bool):
+        for address in self._oscSubscribers:
+            self._replyOsc(address, ("state", key, playing, bank))
+        for writer in self._tcpSubscribers:
+            self._replyLine(writer, ("state", key, playing, bank))
+
+
+    #  MAIN THREAD
+    # ------------
+    @Slot(object)
+    def _execute(self, request):
+        command, key, args, received, reply = request
+        try:
+            response = self._run(command, key, args)
+        except (ValueError, TypeError, IndexError) as e:
+            response = ("error", str(e))
+        self.dispatch.append((time.perf_counter() - received) * 1000)
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(reply, response)
+            except RuntimeError:
+                # Stopped in the meantime
+                pass
+
+
+    def _run(self, command: str, key: str | None, args: list) -> tuple:
+        """Runs a command like the keys do on a click. Returns the response."""
+        engine = self._engine
+        if command in SUBSCRIBE_COMMANDS:
+            # Already registered by the asyncio thread
+            return OK
+        if command not in COMMANDS:
+            raise ValueError(f"Unknown command '{command}'")
+        if command in KEY_COMMANDS and key is None:
+            raise ValueError(f"Command '{command}' needs a key")
+        if command == "ping":
+            return ("pong", *args)
+        if command == "stopall":
+            engine.mixer.stopAll()
+            return OK
+        if command == "bank":
+            if args:
+                bank = int(args[0])
+                # At most one new bank after the last one, like Page Down
+                if not 0 <= bank <= engine.bankCount:
+                    return ("error", f"Bank {bank} out of range 0 to {engine.bankCount}")
+                engine.setBank(bank)
+            return ("bank", engine.bank, engine.bankCount)
+
+        key = key.lower()
+        if key not in engine.keys:
+            raise ValueError(f"Unknown key '{key}'")
+        cue = engine.cue(key)
+        if command == "play":
+            engine.latency.trigger(cue.voice)
+            return OK if cue.play() else ("error", f"Key '{key}' did not start")
+        fade = command in ("stop", "toggle") and bool(args) and bool(int(args[0]))
+        if command == "stop":
+            return OK if cue.stop(fade) else ("error", f"Key '{key}' is not playing")
+        if command == "toggle":
+            cue.trigger(fade)
+            return OK
+        if command == "set":
+            name, value = args
+            settings = cue.getSettings()
+            if name not in settings:
+                raise ValueError(f"Unknown setting '{name}'")
+            settings[name] = _convert(settings[name], value)
+            engine.updateSettings(key, settings)
+            return OK
+        return ("state", key, cue.is_plaing, engine.bank, cue.label)
+
+
+    @Slot(str, bool)
+    def _voiceStateChanged(self, voice, playing):
+        """Sends the new state of a voice to all subscribers."""
+        if self._subscribed == 0 or self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._broadcast, *splitVoice(voice), playing)
+        except RuntimeError:
+            pass
+
+
+
+class _OscProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, server: TriggerServer) -> None:
+        self._server = server
+
+
+    def datagram_received(self, data, address):
+        self._server._receivedOsc(data, address)
+
+
+    def error_received(self, exc):
+        # E.g. a subscriber which is gone
+        log.warning(f"OSC socket error: {exc}")
+
+
+
+class _StreamWriter:
+    """Writes replies to a binary stream, like the writer of a TCP client."""
+
+    def __init__(self, stream) -> None:
+        self._stream = stream
+
+
+    def write(self, data: bytes):
+        self._stream.write(data)
+        self._stream.flush()
+
+
+    def is_closing(self) -> bool:
+        return self._stream.closed
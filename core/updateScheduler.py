@@ -0,0 +1,105 @@
+# Collects visual changes of the key buttons and applies them once per event loop tick.
+# Author 9qUmV4
+
+import logging
+
+from PySide6.QtCore import QEvent, QObject, QTimer, Slot
+from PySide6.QtWidgets import QWidget
+
+log = logging.getLogger(__name__)
+
+
+
+# ########################################
+#               UPDATESCHEDULER
+# ########################################
+class UpdateScheduler(QObject):
+    """
+    Marks buttons dirty instead of changing them right away. All changes made
+    until control returns to the event loop are applied in one pass, a value set
+    several times is applied once and only buttons whose playable state really
+    changed are repolished. Bulk changes, like loading a show, refresh once.
+    The buttons need setText, setPlayable and _updateButtonColor, see PushButton.
+    stats counts the changes marked and what the passes did, last holds the
+    counts of the latest pass. Layouts are the layout requests the parent got
+    since the pass before.
+    """
+
+    def __init__(self, parent: QWidget) -> None:
+        super().__init__(parent)
+        self._pending: dict[QWidget, dict] = {}     # button: {change: value}
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self.flush)
+
+        self._layouts = 0
+        self.stats = {"changes": 0, "passes": 0, "buttons": 0, "repolishes": 0, "layouts": 0}
+        self.last = {"buttons": 0, "repolishes": 0, "layouts": 0}
+        parent.installEventFilter(self)
+
+
+    #  METHODES
+    # ----------
+    def setText(self, button: QWidget, text: str):
+        self._mark(button, "text", text)
+
+
+    def setPlayable(self, button: QWidget, playable: bool):
+        self._mark(button, "playable", playable)
+
+
+    def setChecked(self, button: QWidget, checked: bool):
+        self._mark(button, "checked", checked)
+
+
+    def _mark(self, button: QWidget, change: str, value):
+        pending = self._pending.get(button)
+        if pending is None:
+            pending = self._pending[button] = {}
+        pending[change] = value
+        self.stats["changes"] += 1
+        if not self._timer.isActive():
+            self._timer.start()
+
+
+    @Slot()
+    def flush(self):
+        """Applies all pending changes now."""
+        self._timer.stop()
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        repolishes = 0
+        for button, changes in pending.items():
+            # Playable first, unplayable buttons can not be checked
+            if "playable" in changes and button.setPlayable(changes["playable"]):
+                repolishes += 1
+            if "text" in changes:
+                button.setText(changes["text"])
+            if "checked" in changes:
+                button._updateButtonColor(changes["checked"])
+
+        self.last = {"buttons": len(pending), "repolishes": repolishes, "layouts": self._layouts}
+        self._layouts = 0
+        self.stats["passes"] += 1
+        for name, count in self.last.items():
+            self.stats[name] += count
+        if len(pending) > 1:
+            log.debug(
+                f"Keyboard refresh: {len(pending)} buttons, {repolishes} repolished, "
+                f"{self.last['layouts']} layouts"
+            )
+
+
+    def resetStats(self):
+        self.stats = dict.fromkeys(self.stats, 0)
+
+
+    #  EVENTS
+    # --------
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if event.type() == QEvent.LayoutRequest:
+            self._layouts += 1
+        return False
@@ -0,0 +1,87 @@
+# Widgets and helpers drawing waveform peaks.
+# Author 9qUmV4
+
+import numpy as np
+from PySide6.QtCore import QLineF, QRectF, Qt
+from PySide6.QtGui import QColor, QPainter, QPaintEvent
+from PySide6.QtWidgets import QWidget
+
+from .waveform import PeakPyramid
+
+WAVE_COLOR = QColor("#00bd0d")
+OUTSIDE_COLOR = QColor(0, 0, 0, 140)
+TEXT_COLOR = QColor("#7f7f7f")
+
+
+def peakLines(rect: QRectF, mins: np.ndarray, maxs: np.ndarray) -> list[QLineF]:
+    """Returns one vertical line per column from min to max. Built once per size, drawPeaks draws them."""
+    mid = rect.center().y()
+    half = rect.height() / 2
+    x = rect.left() + np.arange(len(mins)) + 0.5
+    top = mid - maxs.astype(np.float32) * half
+    bottom = mid - mins.astype(np.float32) * half
+    return [QLineF(*line) for line in zip(x.tolist(), top.tolist(), x.tolist(), bottom.tolist())]
+
+
+def drawPeaks(painter: QPainter, lines: list[QLineF], color: QColor):
+    """Draws the lines returned by peakLines."""
+    if not lines:
+        return
+    painter.setPen(color)
+    painter.drawLines(lines)
+
+
+
+# ########################################
+#               WAVEVIEW
+# ########################################
+class WaveView(QWidget):
+    """Shows the waveform of a whole file and greys out everything outside startTime and stopTime."""
+
+    def __init__(self, parent: QWidget = None) -> None:
+        super().__init__(parent)
+        self.setMinimumHeight(80)
+
+        self._pyramid = None
+        self._lines = None      # peakLines, built again when the pyramid or size changes
+        self._startTime = 0
+        self._stopTime = 0
+
+
+    def setPyramid(self, pyramid: PeakPyramid | None):
+        self._pyramid = pyramid
+        self._lines = None
+        self.update()
+
+
+    def setWindow(self, startTime: int, stopTime: int):
+        """Sets the played part in milliseconds, stopTime 0 means end of file."""
+        self._startTime = startTime
+        self._stopTime = stopTime
+        self.update()
+
+
+    def resizeEvent(self, event):
+        self._lines = None
+        return super().resizeEvent(event)
+
+
+    def paintEvent(self, event: QPaintEvent) -> None:
+        painter = QPainter(self)
+        rect = QRectF(self.rect())
+
+        if self._pyramid is None:
+            painter.setPen(TEXT_COLOR)
+            painter.drawText(rect, Qt.AlignCenter, "No waveform")
+            return
+
+        if self._lines is None:
+            self._lines = peakLines(rect, *self._pyramid.columns(self.width()))
+        drawPeaks(painter, self._lines, WAVE_COLOR)
+
+        # Grey out the parts not played
+        duration = max(self._pyramid.duration, 1)
+        start = self._startTime / duration * rect.width()
+        stop = rect.width() if self._stopTime == 0 else min(self._stopTime / duration, 1.0) * rect.width()
+        painter.fillRect(QRectF(0, 0, start, rect.height()), OUTSIDE_COLOR)
+        painter.fillRect(QRectF(stop, 0, rect.width() - stop, rect.height()), OUTSIDE_COLOR)
@@ -0,0 +1,296 @@
+# Waveform peaks of media files, computed in the background and cached on disk.
+# Author 9qUmV4
+
+import hashlib
+import logging
+import stat
+import threading
+from os import PathLike
+from pathlib import Path
+
+import numpy as np
+from PySide6.QtCore import QObject, QThreadPool, Signal, Slot
+
+from .sampleCache import msToFrames, streamFile
+
+log = logging.getLogger(__name__)
+
+
+# Frames per bucket of the finest level, every further level combines LEVEL_FACTOR buckets
+BASE_BUCKET = 256
+LEVEL_FACTOR = 4
+LEVEL_COUNT = 6
+
+PEAK_DTYPE = np.float16
+PEAKS_DIR_SUFFIX = ".SoundKeyPeaks"
+
+
+
+# ########################################
+#               PEAKPYRAMID
+# ########################################
+class PeakPyramid:
+    """
+    Min and max of a media file per bucket at several zoom levels.
+    Level 0 holds BASE_BUCKET frames per bucket, each further level LEVEL_FACTOR times more.
+    """
+
+    def __init__(self, sampleRate: int, frames: int, mins: list, maxs: list) -> None:
+        self.sampleRate = sampleRate
+        self.frames = frames
+        self.mins = mins
+        self.maxs = maxs
+
+
+    @property
+    def duration(self) -> int:
+        """Duration in milliseconds."""
+        return self.frames * 1000 // self.sampleRate
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self.mins) + sum(a.nbytes for a in self.maxs)
+
+
+    @staticmethod
+    def bucketFrames(level: int) -> int:
+        return BASE_BUCKET * LEVEL_FACTOR ** level
+
+
+    def columns(self, width: int, startTime: int = 0, stopTime: int = 0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns min and max for width pixel columns between startTime and stopTime (0 means end).
+        Uses the coarsest level that still has at least one bucket per column.
+        """
+        start = min(msToFrames(startTime, self.sampleRate), self.frames)
+        stop = self.frames if stopTime == 0 else min(msToFrames(stopTime, self.sampleRate), self.frames)
+        if width <= 0 or stop <= start:
+            return np.zeros(0, PEAK_DTYPE), np.zeros(0, PEAK_DTYPE)
+
+        framesPerColumn = (stop - start) / width
+        level = 0
+        while level + 1 < len(self.mins) and PeakPyramid.bucketFrames(level + 1) <= framesPerColumn:
+            level += 1
+
+        bucket = PeakPyramid.bucketFrames(level)
+        first = start // bucket
+        last = max(-(-stop // bucket), first + 1)
+        mins = self.mins[level][first:last]
+        maxs = self.maxs[level][first:last]
+        if len(mins) == 0:
+            return np.zeros(0, PEAK_DTYPE), np.zeros(0, PEAK_DTYPE)
+
+        # Bucket index every column starts at, columns narrower than a bucket repeat it
+        edges = np.minimum((np.arange(width) * len(mins)) // width, len(mins) - 1)
+        if len(mins) > width:
+            return np.minimum.reduceat(mins, edges), np.maximum.reduceat(maxs, edges)
+        return mins[edges], maxs[edges]
+
+
+    def save(self, path: Path):
+        """Stores the pyramid as uncompressed npz file."""
+        arrays = {"meta": np.array([self.sampleRate, self.frames, BASE_BUCKET, LEVEL_FACTOR], dtype=np.int64)}
+        for level, (mins, maxs) in enumerate(zip(self.mins, self.maxs)):
+            arrays[f"mins_{level}"] = mins
+            arrays[f"maxs_{level}"] = maxs
+        # Write to a temporary file first, a reader never sees a half written file
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open('wb') as f_peaks:
+            np.savez(f_peaks, **arrays)
+        tmp.replace(path)
+
+
+    @staticmethod
+    def load(path: Path) -> "PeakPyramid | None":
+        """Loads a stored pyramid. Returns None, if it was stored with other settings."""
+        with np.load(path) as data:
+            sampleRate, frames, base, factor = (int(v) for v in data["meta"])
+            if base != BASE_BUCKET or factor != LEVEL_FACTOR:
+                return None
+            levels = len([name for name in data.files if name.startswith("mins_")])
+            mins = [data[f"mins_{level}"] for level in range(levels)]
+            maxs = [data[f"maxs_{level}"] for level in range(levels)]
+        return PeakPyramid(sampleRate, frames, mins, maxs)
+
+
+
+# ########################################
+#               PEAKBUILDER
+# ########################################
+class PeakBuilder:
+    """Builds a PeakPyramid from decoded chunks without keeping the samples."""
+
+    def __init__(self) -> None:
+        self._sampleRate = None
+        self._frames = 0
+        self._restMin = np.zeros(0, np.float32)
+        self._restMax = np.zeros(0, np.float32)
+        self._mins = []
+        self._maxs = []
+
+
+    def add(self, samples: np.ndarray, sampleRate: int):
+        """Adds float32 samples of shape (frames, channels)."""
+        self._sampleRate = sampleRate
+        self._frames += len(samples)
+
+        # Peaks over all channels, completed buckets are reduced right away
+        lo = np.concatenate((self._restMin, samples.min(axis=1)))
+        hi = np.concatenate((self._restMax, samples.max(axis=1)))
+        full = len(lo) - len(lo) % BASE_BUCKET
+        if full:
+            self._mins.append(lo[:full].reshape(-1, BASE_BUCKET).min(axis=1).astype(PEAK_DTYPE))
+            self._maxs.append(hi[:full].reshape(-1, BASE_BUCKET).max(axis=1).astype(PEAK_DTYPE))
+        self._restMin = lo[full:]
+        self._restMax = hi[full:]
+
+
+    def finish(self) -> PeakPyramid:
+        """Returns the pyramid of all added samples."""
+        mins, maxs = list(self._mins), list(self._maxs)
+        if len(self._restMin):
+            mins.append(np.array([self._restMin.min()], PEAK_DTYPE))
+            maxs.append(np.array([self._restMax.max()], PEAK_DTYPE))
+        level_mins = [np.concatenate(mins) if mins else np.zeros(0, PEAK_DTYPE)]
+        level_maxs = [np.concatenate(maxs) if maxs else np.zeros(0, PEAK_DTYPE)]
+
+        for _ in range(1, LEVEL_COUNT):
+            lo, hi = level_mins[-1], level_maxs[-1]
+            if len(lo) <= 1:
+                break
+            # Pad with the last bucket, it does not change min or max
+            pad = -len(lo) % LEVEL_FACTOR
+            lo = np.pad(lo, (0, pad), mode='edge')
+            hi = np.pad(hi, (0, pad), mode='edge')
+            level_mins.append(lo.reshape(-1, LEVEL_FACTOR).min(axis=1))
+            level_maxs.append(hi.reshape(-1, LEVEL_FACTOR).max(axis=1))
+
+        return PeakPyramid(self._sampleRate or 1, self._frames, level_mins, level_maxs)
+
+
+
+# ########################################
+#               WAVEFORMCACHE
+# ########################################
+class WaveformCache(QObject):
+    """
+    Computes peak pyramids in a background thread pool.
+    Pyramids are kept in memory and stored in a directory next to the show,
+    keyed by file path, size and modification time.
+    """
+
+    # Signals
+    peaksReady = Signal(
+        str,    # path
+    )
+    # Emitted from the pool, delivered on the GUI thread
+    _computed = Signal(
+        str,    # path
+        str,    # fingerprint
+        object, # PeakPyramid
+    )
+
+
+    def __init__(self, parent: QObject = None) -> None:
+        super().__init__(parent)
+
+        self._pyramids: dict[str, PeakPyramid] = {}
+        self._fingerprints: dict[str, str] = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._directory = None
+
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+
+        self._computed.connect(self._storeComputed)
+
+
+    #  METHODES
+    # ----------
+    def setShowPath(self, showPath: PathLike | str):
+        """Stores the peaks next to the show file from now on."""
+        showPath = Path(showPath)
+        self._directory = None if showPath == Path() else showPath.with_suffix(PEAKS_DIR_SUFFIX)
+
+
+    @staticmethod
+    def fingerprint(path: Path) -> str | None:
+        """Returns a key for path, its size and modification time or None, if it is no file."""
+        try:
+            info = path.stat()
+        except OSError:
+            return None
+        if not stat.S_ISREG(info.st_mode):
+            return None
+        data = f"{path.resolve()}|{info.st_size}|{info.st_mtime_ns}"
+        return hashlib.sha1(data.encode()).hexdigest()
+
+
+    def get(self, path: PathLike | str) -> PeakPyramid | None:
+        """
+        Returns the peaks of path, if they are ready. Otherwise starts
+        computing them and emits peaksReady(path) when done.
+        """
+        path = Path(path)
+        name = str(path)
+        fingerprint = WaveformCache.fingerprint(path)
+        if fingerprint is None:
+            return None
+
+        with self._lock:
+            if self._fingerprints.get(name) == fingerprint:
+                return self._pyramids[name]
+            if (name, fingerprint) in self._pending:
+                return None
+            self._pending.add((name, fingerprint))
+
+        self._pool.start(lambda: self._compute(path, fingerprint, self._directory))
+        return None
+
+
+    def _compute(self, path: Path, fingerprint: str, directory: Path | None):
+        """Runs in the thread pool. Loads stored peaks or decodes the file."""
+        stored = None if directory is None else directory / f"{fingerprint}.npz"
+        pyramid = None
+        if stored is not None and stored.is_file():
+            try:
+                pyramid = PeakPyramid.load(stored)
+            except (OSError, ValueError, KeyError) as e:
+                log.warning(f"Cannot read stored peaks '{stored}': {e}")
+
+        if pyramid is None:
+            builder = PeakBuilder()
+            try:
+                streamFile(path, builder.add)
+            except Exception as e:
+                log.error(f"Cannot compute peaks of '{path}': {e}")
+                with self._lock:
+                    self._pending.discard((str(path), fingerprint))
+                return
+            pyramid = builder.finish()
+            log.debug(f"Computed peaks of '{path}' ({pyramid.nbytes} bytes)")
+            if stored is not None:
+                try:
+                    stored.parent.mkdir(parents=True, exist_ok=True)
+                    pyramid.save(stored)
+                except OSError as e:
+                    log.warning(f"Cannot store peaks '{stored}': {e}")
+
+        self._computed.emit(str(path), fingerprint, pyramid)
+
+
+    @Slot(str, str, object)
+    def _storeComputed(self, name, fingerprint, pyramid):
+        with self._lock:
+            self._pending.discard((name, fingerprint))
+            self._pyramids[name] = pyramid
+            self._fingerprints[name] = fingerprint
+        self.peaksReady.emit(name)
+
+
+    def clear(self):
+        """Drops the peaks held in memory."""
+        with self._lock:
+            self._pyramids.clear()
+            self._fingerprints.clear()
@@ -0,0 +1,44 @@
+# Checks that keys play exactly the frames between startTime and stopTime,
+# the cases of benchmarks.stopAccuracy rendered through the Renderer.
+# Run from the repository root:
+#   python -m pytest tests
+# Author 9qUmV4
+
+import numpy as np
+import pytest
+
+from benchmarks.stopAccuracy import WINDOWS, writeRamp
+from core.mixer import Mixer, Renderer
+from core.sampleCache import SAMPLE_RATE, SampleCache, msToFrames
+
+
+@pytest.fixture(scope="module")
+def ramp(tmp_path_factory):
+    """Returns path and frames of a wave file whose samples hold their 1 based frame index."""
+    path = tmp_path_factory.mktemp("stopAccuracy") / "ramp.wav"
+    return path, writeRamp(path, SAMPLE_RATE)
+
+
+def renderVoice(samples: np.ndarray) -> np.ndarray:
+    """Renders one voice until the renderer reports its end and returns the left channel."""
+    renderer = Renderer()
+    renderer.start("check", samples, 0, 0, False, 1.0, 1)
+    blocks = []
+    while ("ended", "check", 1) not in renderer.events:
+        blocks.append(renderer.render(Mixer.BLOCK_FRAMES)[:, 0])
+    return np.concatenate(blocks)
+
+
+@pytest.mark.parametrize("startTime, stopTime", WINDOWS)
+def test_renderedWindow(ramp, startTime, stopTime):
+    path, frames = ramp
+    rendered = renderVoice(SampleCache(dtype=np.float32).get(path, startTime, stopTime))
+    played = rendered[rendered != 0]
+    index = np.rint(played.astype(np.float64) * 2147483648.0 / 1000).astype(np.int64) - 1
+
+    first = msToFrames(startTime)
+    last = frames if stopTime == 0 else msToFrames(stopTime)
+    assert len(played) - (last - first) == 0
+    assert index[0] - first == 0
+    # Nothing skipped or repeated in between
+    assert np.array_equal(index, np.arange(first, last))
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+## Form generated from reading UI file 'keySettingsDialog.ui'
+##
+## Created by: Qt User Interface Compiler version 6.7.3
+##
+## WARNING! All changes made in this file will be lost when recompiling UI file!
+################################################################################
+
+from PySide6.QtCore import (QCoreApplication, QDate, QDateTime, QLocale,
+    QMetaObject, QObject, QPoint, QRect,
+    QSize, QTime, QUrl, Qt)
+from PySide6.QtGui import (QBrush, QColor, QConicalGradient, QCursor,
+    QFont, QFontDatabase, QGradient, QIcon,
+    QImage, QKeySequence, QLinearGradient, QPainter,
+    QPalette, QPixmap, QRadialGradient, QTransform)
+from PySide6.QtWidgets import (QAbstractButton, QApplication, QComboBox, QDialog,
+    QDialogButtonBox, QDoubleSpinBox, QFormLayout, QHBoxLayout,
+    QLabel, QLineEdit, QPushButton, QSizePolicy,
+    QVBoxLayout, QWidget)
+
+class Ui_Dialog(object):
+    def setupUi(self, Dialog):
+        if not Dialog.objectName():
+            Dialog.setObjectName(u"Dialog")
+        Dialog.resize(670, 820)
+        Dialog.setStyleSheet(u"")
+        self.verticalLayout_2 = QVBoxLayout(Dialog)
+        self.verticalLayout_2.setObjectName(u"verticalLayout_2")
+        self.waveViewHolder = QWidget(Dialog)
+        self.waveViewHolder.setObjectName(u"waveViewHolder")
+        sizePolicy = QSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.waveViewHolder.sizePolicy().hasHeightForWidth())
+        self.waveViewHolder.setSizePolicy(sizePolicy)
+
+        self.verticalLayout_2.addWidget(self.waveViewHolder)
+
+        self.formLayout = QFormLayout()
+        self.formLayout.setObjectName(u"formLayout")
+        self.pathLabel = QLabel(Dialog)
+        self.pathLabel.setObjectName(u"pathLabel")
+
+        self.formLayout.setWidget(0, QFormLayout.LabelRole, self.pathLabel)
+
+        self.pathHorizontalLayout = QHBoxLayout()
+        self.pathHorizontalLayout.setObjectName(u"pathHorizontalLayout")
+        self.pathDisplay = QLabel(Dialog)
+        self.pathDisplay.setObjectName(u"pathDisplay")
+        sizePolicy1 = QSizePolicy(QSizePolicy.Policy.MinimumExpanding, QSizePolicy.Policy.Preferred)
+        sizePolicy1.setHorizontalStretch(0)
+        sizePolicy1.setVerticalStretch(0)
+        sizePolicy1.setHeightForWidth(self.pathDisplay.sizePolicy().hasHeightForWidth())
+        self.pathDisplay.setSizePolicy(sizePolicy1)
+
+        self.pathHorizontalLayout.addWidget(self.pathDisplay)
+
+        self.selectFileButton = QPushButton(Dialog)
+        self.selectFileButton.setObjectName(u"selectFileButton")
+
+        self.pathHorizontalLayout.addWidget(self.selectFileButton)
+
+
+        self.formLayout.setLayout(0, QFormLayout.FieldRole, self.pathHorizontalLayout)
+
+        self.labelLabel = QLabel(Dialog)
+        self.labelLabel.setObjectName(u"labelLabel")
+
+        self.formLayout.setWidget(1, QFormLayout.LabelRole, self.labelLabel)
+
+        self.startTimeLabel = QLabel(Dialog)
+        self.startTimeLabel.setObjectName(u"startTimeLabel")
+
+        self.formLayout.setWidget(2, QFormLayout.LabelRole, self.startTimeLabel)
+
+        self.stopTimeLabel = QLabel(Dialog)
+        self.stopTimeLabel.setObjectName(u"stopTimeLabel")
+
+        self.formLayout.setWidget(3, QFormLayout.LabelRole, self.stopTimeLabel)
+
+        self.startTimeDoubleSpinBox = QDoubleSpinBox(Dialog)
+        self.startTimeDoubleSpinBox.setObjectName(u"startTimeDoubleSpinBox")
+
+        self.formLayout.setWidget(2, QFormLayout.FieldRole, self.startTimeDoubleSpinBox)
+
+        self.stopTimeDoubleSpinBox = QDoubleSpinBox(Dialog)
+        self.stopTimeDoubleSpinBox.setObjectName(u"stopTimeDoubleSpinBox")
+
+        self.formLayout.setWidget(3, QFormLayout.FieldRole, self.stopTimeDoubleSpinBox)
+
+        self.labelLineEdit = QLineEdit(Dialog)
+        self.labelLineEdit.setObjectName(u"labelLineEdit")
+
+        self.formLayout.setWidget(1, QFormLayout.FieldRole, self.labelLineEdit)
+
+        self.fadeInLabel = QLabel(Dialog)
+        self.fadeInLabel.setObjectName(u"fadeInLabel")
+
+        self.formLayout.setWidget(4, QFormLayout.LabelRole, self.fadeInLabel)
+
+        self.fadeInDoubleSpinBox = QDoubleSpinBox(Dialog)
+        self.fadeInDoubleSpinBox.setObjectName(u"fadeInDoubleSpinBox")
+
+        self.formLayout.setWidget(4, QFormLayout.FieldRole, self.fadeInDoubleSpinBox)
+
+        self.fadeOutLabel = QLabel(Dialog)
+        self.fadeOutLabel.setObjectName(u"fadeOutLabel")
+
+        self.formLayout.setWidget(5, QFormLayout.LabelRole, self.fadeOutLabel)
+
+        self.fadeOutDoubleSpinBox = QDoubleSpinBox(Dialog)
+        self.fadeOutDoubleSpinBox.setObjectName(u"fadeOutDoubleSpinBox")
+
+        self.formLayout.setWidget(5, QFormLayout.FieldRole, self.fadeOutDoubleSpinBox)
+
+        self.playbackRateLabel = QLabel(Dialog)
+        self.playbackRateLabel.setObjectName(u"playbackRateLabel")
+
+        self.formLayout.setWidget(6, QFormLayout.LabelRole, self.playbackRateLabel)
+
+        self.playbackRateDoubleSpinBox = QDoubleSpinBox(Dialog)
+        self.playbackRateDoubleSpinBox.setObjectName(u"playbackRateDoubleSpinBox")
+
+        self.formLayout.setWidget(6, QFormLayout.FieldRole, self.playbackRateDoubleSpinBox)
+
+        self.retriggerLabel = QLabel(Dialog)
+        self.retriggerLabel.setObjectName(u"retriggerLabel")
+
+        self.formLayout.setWidget(7, QFormLayout.LabelRole, self.retriggerLabel)
+
+        self.retriggerComboBox = QComboBox(Dialog)
+        self.retriggerComboBox.setObjectName(u"retriggerComboBox")
+
+        self.formLayout.setWidget(7, QFormLayout.FieldRole, self.retriggerComboBox)
+
+        self.gainLabel = QLabel(Dialog)
+        self.gainLabel.setObjectName(u"gainLabel")
+
+        self.formLayout.setWidget(8, QFormLayout.LabelRole, self.gainLabel)
+
+        self.gainDoubleSpinBox = QDoubleSpinBox(Dialog)
+        self.gainDoubleSpinBox.setObjectName(u"gainDoubleSpinBox")
+
+        self.formLayout.setWidget(8, QFormLayout.FieldRole, self.gainDoubleSpinBox)
+
+
+        self.verticalLayout_2.addLayout(self.formLayout)
+
+        self.libraryHolder = QWidget(Dialog)
+        self.libraryHolder.setObjectName(u"libraryHolder")
+        sizePolicy2 = QSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        sizePolicy2.setHorizontalStretch(0)
+        sizePolicy2.setVerticalStretch(1)
+        sizePolicy2.setHeightForWidth(self.libraryHolder.sizePolicy().hasHeightForWidth())
+        self.libraryHolder.setSizePolicy(sizePolicy2)
+
+        self.verticalLayout_2.addWidget(self.libraryHolder)
+
+        self.buttonBox = QDialogButtonBox(Dialog)
+        self.buttonBox.setObjectName(u"buttonBox")
+        self.buttonBox.setEnabled(True)
+        self.buttonBox.setOrientation(Qt.Horizontal)
+        self.buttonBox.setStandardButtons(QDialogButtonBox.Cancel|QDialogButtonBox.Ok)
+
+        self.verticalLayout_2.addWidget(self.buttonBox)
+
+        QWidget.setTabOrder(self.selectFileButton, self.labelLineEdit)
+        QWidget.setTabOrder(self.labelLineEdit, self.startTimeDoubleSpinBox)
+        QWidget.setTabOrder(self.startTimeDoubleSpinBox, self.stopTimeDoubleSpinBox)
+        QWidget.setTabOrder(self.stopTimeDoubleSpinBox, self.fadeInDoubleSpinBox)
+        QWidget.setTabOrder(self.fadeInDoubleSpinBox, self.fadeOutDoubleSpinBox)
+        QWidget.setTabOrder(self.fadeOutDoubleSpinBox, self.playbackRateDoubleSpinBox)
+        QWidget.setTabOrder(self.playbackRateDoubleSpinBox, self.retriggerComboBox)
+        QWidget.setTabOrder(self.retriggerComboBox, self.gainDoubleSpinBox)
+
+        self.retranslateUi(Dialog)
+        self.buttonBox.rejected.connect(Dialog.reject)
+        self.buttonBox.accepted.connect(Dialog.accept)
+
+        QMetaObject.connectSlotsByName(Dialog)
+    # setupUi
+
+    def retranslateUi(self, Dialog):
+        Dialog.setWindowTitle(QCoreApplication.translate("Dialog", u"Settings for key %KEY%", None))
+        self.pathLabel.setText(QCoreApplication.translate("Dialog", u"File to play:", None))
+        self.pathDisplay.setText(QCoreApplication.translate("Dialog", u"SPACEHOLDER - PLEASE REPORT", None))
+#if QT_CONFIG(tooltip)
+        self.selectFileButton.setToolTip(QCoreApplication.translate("Dialog", u"<html><head/><body><p>Select a file to play.</p></body></html>", None))
+#endif // QT_CONFIG(tooltip)
+        self.selectFileButton.setText(QCoreApplication.translate("Dialog", u"Select File", None))
+        self.labelLabel.setText(QCoreApplication.translate("Dialog", u"Label:", None))
+        self.startTimeLabel.setText(QCoreApplication.translate("Dialog", u"Start time:", None))
+        self.stopTimeLabel.setText(QCoreApplication.translate("Dialog", u"Stop time:", None))
+        self.fadeInLabel.setText(QCoreApplication.translate("Dialog", u"Fade in:", None))
+        self.fadeOutLabel.setText(QCoreApplication.translate("Dialog", u"Fade out:", None))
+        self.playbackRateLabel.setText(QCoreApplication.translate("Dialog", u"Playback rate:", None))
+        self.retriggerLabel.setText(QCoreApplication.translate("Dialog", u"Retrigger:", None))
+        self.gainLabel.setText(QCoreApplication.translate("Dialog", u"Gain:", None))
+    # retranslateUi
+
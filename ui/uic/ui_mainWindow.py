@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+## Form generated from reading UI file 'mainWindow.ui'
+##
+## Created by: Qt User Interface Compiler version 6.7.3
+##
+## WARNING! All changes made in this file will be lost when recompiling UI file!
+################################################################################
+
+from PySide6.QtCore import (QCoreApplication, QDate, QDateTime, QLocale,
+    QMetaObject, QObject, QPoint, QRect,
+    QSize, QTime, QUrl, Qt)
+from PySide6.QtGui import (QAction, QBrush, QColor, QConicalGradient,
+    QCursor, QFont, QFontDatabase, QGradient,
+    QIcon, QImage, QKeySequence, QLinearGradient,
+    QPainter, QPalette, QPixmap, QRadialGradient,
+    QTransform)
+from PySide6.QtWidgets import (QApplication, QFrame, QGridLayout, QLayout,
+    QMainWindow, QMenu, QMenuBar, QSizePolicy,
+    QStatusBar, QVBoxLayout, QWidget)
+
+class Ui_MainWindow(object):
+    def setupUi(self, MainWindow):
+        if not MainWindow.objectName():
+            MainWindow.setObjectName(u"MainWindow")
+        MainWindow.resize(1098, 542)
+        MainWindow.setStyleSheet(u"")
+        self.actionOpenShow = QAction(MainWindow)
+        self.actionOpenShow.setObjectName(u"actionOpenShow")
+        self.actionSaveShow = QAction(MainWindow)
+        self.actionSaveShow.setObjectName(u"actionSaveShow")
+        self.actionExit = QAction(MainWindow)
+        self.actionExit.setObjectName(u"actionExit")
+        self.actionAbout = QAction(MainWindow)
+        self.actionAbout.setObjectName(u"actionAbout")
+        self.actionSaveShowAs = QAction(MainWindow)
+        self.actionSaveShowAs.setObjectName(u"actionSaveShowAs")
+        self.actionNewShow = QAction(MainWindow)
+        self.actionNewShow.setObjectName(u"actionNewShow")
+        self.actionLatencyStatistics = QAction(MainWindow)
+        self.actionLatencyStatistics.setObjectName(u"actionLatencyStatistics")
+        self.actionNormalizeLoudness = QAction(MainWindow)
+        self.actionNormalizeLoudness.setObjectName(u"actionNormalizeLoudness")
+        self.centralwidget = QWidget(MainWindow)
+        self.centralwidget.setObjectName(u"centralwidget")
+        sizePolicy = QSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.centralwidget.sizePolicy().hasHeightForWidth())
+        self.centralwidget.setSizePolicy(sizePolicy)
+        self.gridLayout = QGridLayout(self.centralwidget)
+        self.gridLayout.setObjectName(u"gridLayout")
+        self.verticalLayout = QVBoxLayout()
+        self.verticalLayout.setObjectName(u"verticalLayout")
+        self.verticalLayout.setSizeConstraint(QLayout.SetDefaultConstraint)
+        self.keyboardHolder = QFrame(self.centralwidget)
+        self.keyboardHolder.setObjectName(u"keyboardHolder")
+        sizePolicy.setHeightForWidth(self.keyboardHolder.sizePolicy().hasHeightForWidth())
+        self.keyboardHolder.setSizePolicy(sizePolicy)
+        self.keyboardHolder.setFrameShape(QFrame.StyledPanel)
+        self.keyboardHolder.setFrameShadow(QFrame.Raised)
+
+        self.verticalLayout.addWidget(self.keyboardHolder)
+
+
+        self.gridLayout.addLayout(self.verticalLayout, 0, 0, 1, 1)
+
+        MainWindow.setCentralWidget(self.centralwidget)
+        self.menubar = QMenuBar(MainWindow)
+        self.menubar.setObjectName(u"menubar")
+        self.menubar.setGeometry(QRect(0, 0, 1098, 22))
+        self.menuFile = QMenu(self.menubar)
+        self.menuFile.setObjectName(u"menuFile")
+        self.menuDebug = QMenu(self.menubar)
+        self.menuDebug.setObjectName(u"menuDebug")
+        self.menuHelp = QMenu(self.menubar)
+        self.menuHelp.setObjectName(u"menuHelp")
+        MainWindow.setMenuBar(self.menubar)
+        self.statusbar = QStatusBar(MainWindow)
+        self.statusbar.setObjectName(u"statusbar")
+        MainWindow.setStatusBar(self.statusbar)
+
+        self.menubar.addAction(self.menuFile.menuAction())
+        self.menubar.addAction(self.menuDebug.menuAction())
+        self.menubar.addAction(self.menuHelp.menuAction())
+        self.menuFile.addAction(self.actionNewShow)
+        self.menuFile.addAction(self.actionOpenShow)
+        self.menuFile.addAction(self.actionSaveShow)
+        self.menuFile.addAction(self.actionSaveShowAs)
+        self.menuFile.addSeparator()
+        self.menuFile.addAction(self.actionNormalizeLoudness)
+        self.menuFile.addSeparator()
+        self.menuFile.addAction(self.actionExit)
+        self.menuDebug.addAction(self.actionLatencyStatistics)
+        self.menuHelp.addAction(self.actionAbout)
+
+        self.retranslateUi(MainWindow)
+
+        QMetaObject.connectSlotsByName(MainWindow)
+    # setupUi
+
+    def retranslateUi(self, MainWindow):
+        MainWindow.setWindowTitle(QCoreApplication.translate("MainWindow", u"SoundKey2", None))
+        self.actionOpenShow.setText(QCoreApplication.translate("MainWindow", u"Open Show", None))
+#if QT_CONFIG(shortcut)
+        self.actionOpenShow.setShortcut(QCoreApplication.translate("MainWindow", u"Ctrl+O", None))
+#endif // QT_CONFIG(shortcut)
+        self.actionSaveShow.setText(QCoreApplication.translate("MainWindow", u"Save Show", None))
+#if QT_CONFIG(shortcut)
+        self.actionSaveShow.setShortcut(QCoreApplication.translate("MainWindow", u"Ctrl+S", None))
+#endif // QT_CONFIG(shortcut)
+        self.actionExit.setText(QCoreApplication.translate("MainWindow", u"Exit", None))
+        self.actionAbout.setText(QCoreApplication.translate("MainWindow", u"About", None))
+        self.actionSaveShowAs.setText(QCoreApplication.translate("MainWindow", u"Save Show As", None))
+#if QT_CONFIG(shortcut)
+        self.actionSaveShowAs.setShortcut(QCoreApplication.translate("MainWindow", u"Ctrl+Shift+S", None))
+#endif // QT_CONFIG(shortcut)
+        self.actionNewShow.setText(QCoreApplication.translate("MainWindow", u"New Show", None))
+#if QT_CONFIG(shortcut)
+        self.actionNewShow.setShortcut(QCoreApplication.translate("MainWindow", u"Ctrl+N", None))
+#endif // QT_CONFIG(shortcut)
+        self.actionLatencyStatistics.setText(QCoreApplication.translate("MainWindow", u"Latency Statistics", None))
+#if QT_CONFIG(shortcut)
+        self.actionLatencyStatistics.setShortcut(QCoreApplication.translate("MainWindow", u"Ctrl+L", None))
+#endif // QT_CONFIG(shortcut)
+        self.actionNormalizeLoudness.setText(QCoreApplication.translate("MainWindow", u"Normalize Loudness", None))
+        self.menuFile.setTitle(QCoreApplication.translate("MainWindow", u"File", None))
+        self.menuDebug.setTitle(QCoreApplication.translate("MainWindow", u"Debug", None))
+        self.menuHelp.setTitle(QCoreApplication.translate("MainWindow", u"Help", None))
+    # retranslateUi
+